@@ -1,4 +1,5 @@
 -- Helixa-One: Database Schema for Supabase
+-- Then run telemetry_partitioning.sql to move telemetry onto daily partitions with rollups.
 
 -- 1. Telemetry Table (Time-series optimized)
 CREATE TABLE IF NOT EXISTS telemetry (
@@ -15,3 +16,29 @@ ALTER PUBLICATION supabase_realtime ADD TABLE telemetry;
 
 -- 3. Index for faster queries on sensor_id and created_at
 CREATE INDEX IF NOT EXISTS idx_telemetry_sensor_time ON telemetry (sensor_id, created_at DESC);
+
+-- 4. Last N readings per sensor, used by the brain to warm its history after a restart.
+-- A recursive skip scan finds each sensor and a LATERAL LIMIT reads its newest rows,
+-- so both steps walk idx_telemetry_sensor_time instead of scanning the table.
+CREATE OR REPLACE FUNCTION telemetry_recent_window(window_size INT, since TIMESTAMPTZ)
+RETURNS TABLE (sensor_id TEXT, created_at TIMESTAMPTZ, value FLOAT8)
+LANGUAGE sql STABLE AS $$
+    WITH RECURSIVE sensors AS (
+        (SELECT t.sensor_id FROM telemetry t ORDER BY t.sensor_id LIMIT 1)
+        UNION ALL
+        SELECT (SELECT t.sensor_id FROM telemetry t WHERE t.sensor_id > s.sensor_id ORDER BY t.sensor_id LIMIT 1)
+        FROM sensors s
+        WHERE s.sensor_id IS NOT NULL
+    )
+    SELECT w.sensor_id, w.created_at, w.value
+    FROM sensors s
+    CROSS JOIN LATERAL (
+        SELECT t.sensor_id, t.created_at, t.value
+        FROM telemetry t
+        WHERE t.sensor_id = s.sensor_id AND t.created_at >= since
+        ORDER BY t.created_at DESC
+        LIMIT window_size
+    ) w
+    WHERE s.sensor_id IS NOT NULL
+    ORDER BY w.sensor_id, w.created_at;
+$$;
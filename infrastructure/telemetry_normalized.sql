@@ -0,0 +1,382 @@
+-- Helixa-One: Normalized (columnar) telemetry schema
+-- Run after telemetry_partitioning.sql, then `python migrate.py --normalize` from services/brain
+-- and set TELEMETRY_SCHEMA=normalized for the brain. Safe to re-run.
+--
+-- Packet-level fields (timestamp, site, device type, mode, version, extra metadata) are stored
+-- once per packet; readings keep only typed columns and dictionary ids of sensor and site.
+
+-- 1. Dictionaries
+CREATE TABLE IF NOT EXISTS sites (
+    id INT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS sensors (
+    id INT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    sensor_key TEXT NOT NULL UNIQUE,
+    type TEXT NOT NULL,
+    unit TEXT NOT NULL,
+    site_id INT REFERENCES sites (id)
+);
+
+-- 2. Packet headers and readings, both on daily partitions (see helixa_ensure_partitions)
+CREATE TABLE IF NOT EXISTS telemetry_packets (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    observed_at TIMESTAMPTZ NOT NULL,
+    site_id INT REFERENCES sites (id),
+    device_type TEXT,
+    mode TEXT,
+    version TEXT,
+    metadata JSONB,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- status indexes ("stable", "optimal", "maintenance_required", "critical_approaching");
+-- action indexes SafetyController.MITIGATION_ACTIONS, NULL when no action was recommended
+CREATE TABLE IF NOT EXISTS telemetry_readings (
+    packet_id BIGINT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL,
+    sensor_id INT NOT NULL REFERENCES sensors (id),
+    value FLOAT8 NOT NULL,
+    z_score REAL NOT NULL,
+    is_anomaly BOOLEAN NOT NULL,
+    status SMALLINT NOT NULL,
+    ttf_minutes REAL,
+    is_safe BOOLEAN NOT NULL,
+    action SMALLINT,
+    FOREIGN KEY (packet_id, created_at) REFERENCES telemetry_packets (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE INDEX IF NOT EXISTS idx_readings_sensor_time ON telemetry_readings (sensor_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_readings_packet ON telemetry_readings (packet_id);
+
+CREATE TABLE IF NOT EXISTS telemetry_packets_default PARTITION OF telemetry_packets DEFAULT;
+CREATE TABLE IF NOT EXISTS telemetry_readings_default PARTITION OF telemetry_readings DEFAULT;
+
+-- 3. Ingestion: one RPC per write-behind batch. Readings travel as parallel JSON arrays so keys
+-- are not repeated per reading; sensors and sites are dictionary-encoded on the way in.
+CREATE OR REPLACE FUNCTION ingest_telemetry(packets JSONB)
+RETURNS INT LANGUAGE plpgsql SECURITY DEFINER AS $$
+DECLARE
+    p JSONB;
+    r JSONB;
+    site INT;
+    new_packet BIGINT;
+    stamp TIMESTAMPTZ := NOW();
+    total INT := 0;
+    written INT;
+BEGIN
+    FOR p IN SELECT * FROM jsonb_array_elements(packets) LOOP
+        r := p -> 'readings';
+        site := NULL;
+        IF p ->> 'site' IS NOT NULL THEN
+            INSERT INTO sites (name) VALUES (p ->> 'site') ON CONFLICT (name) DO NOTHING;
+            SELECT id INTO site FROM sites WHERE name = p ->> 'site';
+        END IF;
+
+        INSERT INTO telemetry_packets (created_at, observed_at, site_id, device_type, mode, version, metadata)
+        VALUES (stamp, to_timestamp((p ->> 'timestamp')::FLOAT8), site, p ->> 'device_type', p ->> 'mode',
+                p ->> 'version', NULLIF(p -> 'metadata', '{}'::JSONB))
+        RETURNING id INTO new_packet;
+
+        CREATE TEMP TABLE IF NOT EXISTS _ingest (
+            sensor_key TEXT, type TEXT, unit TEXT, value FLOAT8, z_score REAL, is_anomaly BOOLEAN,
+            status SMALLINT, ttf_minutes REAL, is_safe BOOLEAN, action SMALLINT
+        ) ON COMMIT DROP;
+        TRUNCATE _ingest;
+        INSERT INTO _ingest
+        SELECT * FROM unnest(
+            ARRAY(SELECT jsonb_array_elements_text(r -> 'sensor_id')),
+            ARRAY(SELECT jsonb_array_elements_text(r -> 'type')),
+            ARRAY(SELECT jsonb_array_elements_text(r -> 'unit')),
+            ARRAY(SELECT jsonb_array_elements_text(r -> 'value')::FLOAT8),
+            ARRAY(SELECT jsonb_array_elements_text(r -> 'z_score')::REAL),
+            ARRAY(SELECT jsonb_array_elements_text(r -> 'is_anomaly')::BOOLEAN),
+            ARRAY(SELECT jsonb_array_elements_text(r -> 'status')::SMALLINT),
+            ARRAY(SELECT jsonb_array_elements_text(r -> 'ttf_minutes')::REAL),
+            ARRAY(SELECT jsonb_array_elements_text(r -> 'is_safe')::BOOLEAN),
+            ARRAY(SELECT jsonb_array_elements_text(r -> 'action')::SMALLINT)
+        );
+
+        INSERT INTO sensors (sensor_key, type, unit, site_id)
+        SELECT DISTINCT ON (sensor_key) sensor_key, type, unit, site FROM _ingest
+        ON CONFLICT (sensor_key) DO NOTHING;
+
+        INSERT INTO telemetry_readings (packet_id, created_at, sensor_id, value, z_score, is_anomaly, status, ttf_minutes, is_safe, action)
+        SELECT new_packet, stamp, s.id, i.value, i.z_score, i.is_anomaly, i.status, i.ttf_minutes, i.is_safe, i.action
+        FROM _ingest i JOIN sensors s ON s.sensor_key = i.sensor_key;
+        GET DIAGNOSTICS written = ROW_COUNT;
+        total := total + written;
+    END LOOP;
+    RETURN total;
+END $$;
+
+-- 4. Flat view with the legacy column names, for ad-hoc queries and dashboards
+CREATE OR REPLACE VIEW telemetry_flat AS
+SELECT r.created_at, s.sensor_key AS sensor_id, s.type, s.unit, r.value, r.z_score, r.is_anomaly,
+       r.status, r.ttf_minutes, r.is_safe, r.action, p.observed_at, st.name AS site, p.device_type, p.mode, p.version
+FROM telemetry_readings r
+JOIN sensors s ON s.id = r.sensor_id
+JOIN telemetry_packets p ON p.id = r.packet_id AND p.created_at = r.created_at
+LEFT JOIN sites st ON st.id = p.site_id;
+
+-- 5. Warm restarts, rollups and retention read both layouts while legacy rows age out
+CREATE OR REPLACE FUNCTION telemetry_recent_window(window_size INT, since TIMESTAMPTZ)
+RETURNS TABLE (sensor_id TEXT, created_at TIMESTAMPTZ, value FLOAT8)
+LANGUAGE sql STABLE AS $$
+    SELECT s.sensor_key, w.created_at, w.value
+    FROM sensors s
+    CROSS JOIN LATERAL (
+        SELECT r.created_at, r.value
+        FROM telemetry_readings r
+        WHERE r.sensor_id = s.id AND r.created_at >= since
+        ORDER BY r.created_at DESC
+        LIMIT window_size
+    ) w
+    UNION ALL
+    SELECT t.sensor_id, t.created_at, t.value
+    FROM (SELECT DISTINCT l.sensor_id FROM telemetry l WHERE l.created_at >= since) k
+    CROSS JOIN LATERAL (
+        SELECT l.sensor_id, l.created_at, l.value
+        FROM telemetry l
+        WHERE l.sensor_id = k.sensor_id AND l.created_at >= since
+        ORDER BY l.created_at DESC
+        LIMIT window_size
+    ) t
+    WHERE NOT EXISTS (SELECT 1 FROM sensors s WHERE s.sensor_key = k.sensor_id)
+    ORDER BY 1, 2;
+$$;
+
+CREATE OR REPLACE FUNCTION telemetry_rollup(until TIMESTAMPTZ)
+RETURNS BIGINT LANGUAGE plpgsql SECURITY DEFINER AS $$
+DECLARE
+    since TIMESTAMPTZ;
+    upto TIMESTAMPTZ := date_trunc('minute', until);
+    written BIGINT;
+BEGIN
+    SELECT watermark INTO since FROM telemetry_rollup_state FOR UPDATE;
+    IF since IS NULL THEN
+        SELECT date_trunc('minute', COALESCE(LEAST(
+            (SELECT MIN(created_at) FROM telemetry), (SELECT MIN(created_at) FROM telemetry_readings)
+        ), upto)) INTO since;
+        INSERT INTO telemetry_rollup_state (watermark) VALUES (since);
+    END IF;
+    IF upto <= since THEN
+        RETURN 0;
+    END IF;
+
+    INSERT INTO telemetry_rollup_1m (sensor_id, type, site, rack, bucket, min, max, avg, count)
+    SELECT sensor_id, MIN(type), MIN(site), MIN(rack), date_trunc('minute', created_at), MIN(value), MAX(value), AVG(value), COUNT(*)
+    FROM (
+        SELECT sensor_id, type, metadata ->> 'site' AS site, helixa_rack(sensor_id, metadata ->> 'rack') AS rack, created_at, value
+        FROM telemetry
+        WHERE created_at >= since AND created_at < upto
+        UNION ALL
+        SELECT s.sensor_key, s.type, st.name, helixa_rack(s.sensor_key, p.metadata ->> 'rack'), r.created_at, r.value
+        FROM telemetry_readings r
+        JOIN sensors s ON s.id = r.sensor_id
+        JOIN telemetry_packets p ON p.id = r.packet_id AND p.created_at = r.created_at
+        LEFT JOIN sites st ON st.id = p.site_id
+        WHERE r.created_at >= since AND r.created_at < upto
+    ) raw
+    GROUP BY sensor_id, date_trunc('minute', created_at)
+    ON CONFLICT (sensor_id, bucket) DO UPDATE
+        SET min = EXCLUDED.min, max = EXCLUDED.max, avg = EXCLUDED.avg, count = EXCLUDED.count,
+            site = EXCLUDED.site, rack = EXCLUDED.rack;
+    GET DIAGNOSTICS written = ROW_COUNT;
+
+    INSERT INTO telemetry_rollup_1h (sensor_id, type, site, rack, bucket, min, max, avg, count)
+    SELECT sensor_id, MIN(type), MIN(site), MIN(rack), date_trunc('hour', bucket),
+           MIN(min), MAX(max), SUM(avg * count) / SUM(count), SUM(count)
+    FROM telemetry_rollup_1m
+    WHERE bucket >= date_trunc('hour', since) AND bucket < upto
+    GROUP BY sensor_id, date_trunc('hour', bucket)
+    ON CONFLICT (sensor_id, bucket) DO UPDATE
+        SET min = EXCLUDED.min, max = EXCLUDED.max, avg = EXCLUDED.avg, count = EXCLUDED.count,
+            site = EXCLUDED.site, rack = EXCLUDED.rack;
+
+    UPDATE telemetry_rollup_state SET watermark = upto;
+    RETURN written;
+END $$;
+
+CREATE OR REPLACE FUNCTION telemetry_apply_retention(raw_days INT, rollup_1m_days INT, rollup_1h_days INT)
+RETURNS SETOF TEXT LANGUAGE plpgsql SECURITY DEFINER AS $$
+DECLARE
+    rolled_up TIMESTAMPTZ := (SELECT watermark FROM telemetry_rollup_state);
+    cutoff TIMESTAMPTZ;
+BEGIN
+    IF rolled_up IS NOT NULL THEN
+        cutoff := LEAST(NOW() - make_interval(days => raw_days), rolled_up);
+        RETURN QUERY SELECT helixa_drop_partitions('telemetry', cutoff);
+        DELETE FROM telemetry_default WHERE created_at < cutoff;
+        -- Readings before their packet headers, which they reference
+        RETURN QUERY SELECT helixa_drop_partitions('telemetry_readings', cutoff);
+        RETURN QUERY SELECT helixa_drop_partitions('telemetry_packets', cutoff);
+        DELETE FROM telemetry_readings_default WHERE created_at < cutoff;
+        DELETE FROM telemetry_packets_default WHERE created_at < cutoff;
+    END IF;
+    RETURN QUERY SELECT helixa_drop_partitions('telemetry_rollup_1m', NOW() - make_interval(days => rollup_1m_days));
+    RETURN QUERY SELECT helixa_drop_partitions('telemetry_rollup_1h', NOW() - make_interval(days => rollup_1h_days));
+END $$;
+
+CREATE OR REPLACE FUNCTION telemetry_range(
+    sensor_filter TEXT[], site_filter TEXT, rack_filter TEXT, since TIMESTAMPTZ, until TIMESTAMPTZ, bucket_seconds INT
+)
+RETURNS TABLE (sensor_id TEXT, bucket TIMESTAMPTZ, min FLOAT8, max FLOAT8, avg FLOAT8, count BIGINT)
+LANGUAGE plpgsql STABLE AS $$
+#variable_conflict use_column
+DECLARE
+    width INTERVAL := make_interval(secs => GREATEST(bucket_seconds, 1));
+    tier TEXT := CASE WHEN bucket_seconds >= 3600 THEN '1h' WHEN bucket_seconds >= 60 THEN '1m' ELSE 'raw' END;
+    rolled_up TIMESTAMPTZ := COALESCE((SELECT watermark FROM telemetry_rollup_state), '-infinity');
+    raw_since TIMESTAMPTZ := CASE WHEN tier = 'raw' THEN since ELSE GREATEST(since, rolled_up) END;
+BEGIN
+    RETURN QUERY
+    SELECT x.sensor_id,
+           CASE WHEN bucket_seconds > 0 THEN date_bin(width, x.at, since) ELSE x.at END AS b,
+           MIN(x.lo), MAX(x.hi), SUM(x.mean * x.n) / SUM(x.n), SUM(x.n)::BIGINT
+    FROM (
+        SELECT r.sensor_id, r.bucket AS at, r.min AS lo, r.max AS hi, r.avg AS mean, r.count AS n
+        FROM telemetry_rollup_1h r
+        WHERE tier = '1h' AND r.bucket >= since AND r.bucket < LEAST(until, rolled_up)
+          AND (sensor_filter IS NULL OR r.sensor_id = ANY (sensor_filter))
+          AND (site_filter IS NULL OR r.site = site_filter)
+          AND (rack_filter IS NULL OR r.rack = rack_filter)
+        UNION ALL
+        SELECT r.sensor_id, r.bucket, r.min, r.max, r.avg, r.count
+        FROM telemetry_rollup_1m r
+        WHERE tier = '1m' AND r.bucket >= since AND r.bucket < LEAST(until, rolled_up)
+          AND (sensor_filter IS NULL OR r.sensor_id = ANY (sensor_filter))
+          AND (site_filter IS NULL OR r.site = site_filter)
+          AND (rack_filter IS NULL OR r.rack = rack_filter)
+        UNION ALL
+        SELECT t.sensor_id, t.created_at, t.value, t.value, t.value, 1
+        FROM telemetry t
+        WHERE t.created_at >= raw_since AND t.created_at < until
+          AND (sensor_filter IS NULL OR t.sensor_id = ANY (sensor_filter))
+          AND (site_filter IS NULL OR t.metadata ->> 'site' = site_filter)
+          AND (rack_filter IS NULL OR helixa_rack(t.sensor_id, t.metadata ->> 'rack') = rack_filter)
+        UNION ALL
+        SELECT s.sensor_key, r.created_at, r.value, r.value, r.value, 1
+        FROM telemetry_readings r
+        JOIN sensors s ON s.id = r.sensor_id
+        JOIN telemetry_packets p ON p.id = r.packet_id AND p.created_at = r.created_at
+        LEFT JOIN sites st ON st.id = p.site_id
+        WHERE r.created_at >= raw_since AND r.created_at < until
+          AND (sensor_filter IS NULL OR s.sensor_key = ANY (sensor_filter))
+          AND (site_filter IS NULL OR st.name = site_filter)
+          AND (rack_filter IS NULL OR helixa_rack(s.sensor_key, p.metadata ->> 'rack') = rack_filter)
+    ) x
+    GROUP BY 1, 2
+    ORDER BY 1, 2;
+END $$;
+
+-- Partitions referenced by a foreign key must be detached (which re-checks it) before the drop
+CREATE OR REPLACE FUNCTION helixa_drop_partitions(parent TEXT, cutoff TIMESTAMPTZ)
+RETURNS SETOF TEXT LANGUAGE plpgsql SECURITY DEFINER AS $$
+DECLARE
+    part RECORD;
+BEGIN
+    FOR part IN
+        SELECT c.relname AS name,
+               (regexp_match(pg_get_expr(c.relpartbound, c.oid), 'TO \(''([^'']+)''\)'))[1]::TIMESTAMPTZ AS upper_bound
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = parent::regclass
+          AND pg_get_expr(c.relpartbound, c.oid) <> 'DEFAULT'
+    LOOP
+        IF part.upper_bound <= cutoff THEN
+            EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', parent, part.name);
+            EXECUTE format('DROP TABLE %I', part.name);
+            RETURN NEXT part.name;
+        END IF;
+    END LOOP;
+END $$;
+
+-- 6. Backfill: copies legacy rows of [since, until) into the normalized tables, one packet per
+-- distinct (created_at, metadata) group; observed_at comes from metadata when the brain stored
+-- it. Called in chunks by `migrate.py --normalize`.
+CREATE OR REPLACE FUNCTION telemetry_backfill_normalized(since TIMESTAMPTZ, until TIMESTAMPTZ)
+RETURNS INT LANGUAGE plpgsql SECURITY DEFINER AS $$
+DECLARE
+    statuses TEXT[] := ARRAY['stable', 'optimal', 'maintenance_required', 'critical_approaching'];
+    actions TEXT[] := ARRAY['INCREASE_COOLING', 'OPTIMIZE_AIRFLOW', 'SHED_LOAD'];
+    written INT;
+BEGIN
+    INSERT INTO sites (name)
+    SELECT DISTINCT metadata ->> 'site' FROM telemetry
+    WHERE created_at >= since AND created_at < until AND metadata ->> 'site' IS NOT NULL
+    ON CONFLICT (name) DO NOTHING;
+
+    INSERT INTO sensors (sensor_key, type, unit, site_id)
+    SELECT DISTINCT ON (t.sensor_id) t.sensor_id, t.type, t.unit, st.id
+    FROM telemetry t LEFT JOIN sites st ON st.name = t.metadata ->> 'site'
+    WHERE t.created_at >= since AND t.created_at < until
+    ON CONFLICT (sensor_key) DO NOTHING;
+
+    WITH groups AS (
+        SELECT DISTINCT created_at, metadata - 'intelligence' - 'recommended_action' - 'is_safe' AS header
+        FROM telemetry WHERE created_at >= since AND created_at < until
+    ), headers AS (
+        INSERT INTO telemetry_packets (created_at, observed_at, site_id, device_type, mode, version, metadata)
+        SELECT g.created_at, COALESCE(to_timestamp((g.header ->> 'observed_at')::FLOAT8), g.created_at), st.id, g.header ->> 'device_type', g.header ->> 'mode', g.header ->> 'version',
+               NULLIF(g.header - 'site' - 'device_type' - 'mode' - 'version', '{}'::JSONB)
+        FROM groups g LEFT JOIN sites st ON st.name = g.header ->> 'site'
+        RETURNING id, created_at, metadata, site_id, device_type, mode, version
+    )
+    INSERT INTO telemetry_readings (packet_id, created_at, sensor_id, value, z_score, is_anomaly, status, ttf_minutes, is_safe, action)
+    SELECT h.id, t.created_at, s.id, t.value,
+           COALESCE((t.metadata #>> '{intelligence,z_score}')::REAL, 0),
+           COALESCE((t.metadata #>> '{intelligence,is_anomaly}')::BOOLEAN, FALSE),
+           COALESCE(array_position(statuses, t.metadata #>> '{intelligence,prediction,status}') - 1, 0),
+           (t.metadata #>> '{intelligence,prediction,ttf_minutes}')::REAL,
+           COALESCE((t.metadata ->> 'is_safe')::BOOLEAN, TRUE),
+           array_position(actions, t.metadata #>> '{recommended_action,action}') - 1
+    FROM telemetry t
+    JOIN sensors s ON s.sensor_key = t.sensor_id
+    JOIN headers h ON h.created_at = t.created_at
+        AND h.site_id IS NOT DISTINCT FROM (SELECT id FROM sites WHERE name = t.metadata ->> 'site')
+        AND h.device_type IS NOT DISTINCT FROM t.metadata ->> 'device_type'
+        AND h.mode IS NOT DISTINCT FROM t.metadata ->> 'mode'
+        AND h.version IS NOT DISTINCT FROM t.metadata ->> 'version'
+        AND h.metadata IS NOT DISTINCT FROM NULLIF(
+            t.metadata - 'intelligence' - 'recommended_action' - 'is_safe' - 'site' - 'device_type' - 'mode' - 'version', '{}'::JSONB)
+    WHERE t.created_at >= since AND t.created_at < until;
+    GET DIAGNOSTICS written = ROW_COUNT;
+    RETURN written;
+END $$;
+
+-- 7. Replay: packets stored in [since, until) after packet `after_id`, in id order, with their
+-- readings as parallel arrays. Paged by `python -m app.engine.replay` to re-score history.
+CREATE OR REPLACE FUNCTION telemetry_replay(since TIMESTAMPTZ, until TIMESTAMPTZ, after_id BIGINT, max_packets INT)
+RETURNS TABLE (
+    id BIGINT, observed_at TIMESTAMPTZ, site TEXT, device_type TEXT, mode TEXT, version TEXT, metadata JSONB,
+    sensor_ids TEXT[], types TEXT[], units TEXT[], vals FLOAT8[]
+)
+LANGUAGE sql STABLE AS $$
+    SELECT p.id, p.observed_at, st.name, p.device_type, p.mode, p.version, p.metadata,
+           r.sensor_ids, r.types, r.units, r.vals
+    FROM (
+        SELECT * FROM telemetry_packets tp
+        WHERE tp.created_at >= since AND tp.created_at < until AND tp.id > after_id
+        ORDER BY tp.id
+        LIMIT max_packets
+    ) p
+    LEFT JOIN sites st ON st.id = p.site_id
+    CROSS JOIN LATERAL (
+        SELECT array_agg(s.sensor_key ORDER BY s.id) AS sensor_ids, array_agg(s.type ORDER BY s.id) AS types,
+               array_agg(s.unit ORDER BY s.id) AS units, array_agg(tr.value ORDER BY s.id) AS vals
+        FROM telemetry_readings tr JOIN sensors s ON s.id = tr.sensor_id
+        WHERE tr.packet_id = p.id AND tr.created_at = p.created_at
+    ) r
+    ORDER BY p.id;
+$$;
+
+REVOKE EXECUTE ON FUNCTION telemetry_backfill_normalized(TIMESTAMPTZ, TIMESTAMPTZ) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION ingest_telemetry(JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION telemetry_backfill_normalized(TIMESTAMPTZ, TIMESTAMPTZ) TO service_role;
+GRANT EXECUTE ON FUNCTION ingest_telemetry(JSONB) TO service_role;
+
+SELECT helixa_ensure_partitions('telemetry_packets', INTERVAL '1 day', 3);
+SELECT helixa_ensure_partitions('telemetry_readings', INTERVAL '1 day', 3);
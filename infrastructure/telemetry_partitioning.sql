@@ -0,0 +1,272 @@
+-- Helixa-One: Time-partitioned telemetry storage, rollups and retention
+-- Run after supabase_setup.sql. Safe to re-run. An existing non-partitioned telemetry table
+-- is renamed to telemetry_legacy and its recent rows are copied into the partitioned table.
+-- The janitor (services/brain/janitor.py) calls the functions below through RPC.
+-- The optional normalized packet/reading layout builds on this file: infrastructure/telemetry_normalized.sql.
+
+-- 1. Partitioned raw telemetry (one partition per day, retention = DROP TABLE)
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_class WHERE relname = 'telemetry' AND relkind = 'r') THEN
+        ALTER TABLE telemetry RENAME TO telemetry_legacy;
+        ALTER INDEX IF EXISTS idx_telemetry_sensor_time RENAME TO idx_telemetry_legacy_sensor_time;
+        ALTER PUBLICATION supabase_realtime DROP TABLE telemetry_legacy;
+    END IF;
+END $$;
+
+CREATE SEQUENCE IF NOT EXISTS telemetry_id_seq AS BIGINT;
+
+CREATE TABLE IF NOT EXISTS telemetry (
+    id BIGINT NOT NULL DEFAULT nextval('telemetry_id_seq'),
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    sensor_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value FLOAT8 NOT NULL,
+    unit TEXT NOT NULL,
+    metadata JSONB,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+ALTER SEQUENCE telemetry_id_seq OWNED BY telemetry.id;
+
+-- Partitioned index: every daily partition gets its own small (sensor_id, created_at) index
+CREATE INDEX IF NOT EXISTS idx_telemetry_sensor_time ON telemetry (sensor_id, created_at DESC);
+
+-- Catches rows outside the pre-created range instead of failing the insert
+CREATE TABLE IF NOT EXISTS telemetry_default PARTITION OF telemetry DEFAULT;
+
+-- Realtime on a partitioned table publishes changes under the parent's name
+ALTER PUBLICATION supabase_realtime SET (publish_via_partition_root = true);
+DO $$
+BEGIN
+    ALTER PUBLICATION supabase_realtime ADD TABLE telemetry;
+EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
+
+-- 2. Rollups (min/max/avg/count per sensor), partitioned the same way
+CREATE TABLE IF NOT EXISTS telemetry_rollup_1m (
+    sensor_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    site TEXT,
+    rack TEXT,
+    bucket TIMESTAMPTZ NOT NULL,
+    min FLOAT8 NOT NULL,
+    max FLOAT8 NOT NULL,
+    avg FLOAT8 NOT NULL,
+    count BIGINT NOT NULL,
+    PRIMARY KEY (sensor_id, bucket)
+) PARTITION BY RANGE (bucket);
+
+CREATE TABLE IF NOT EXISTS telemetry_rollup_1h (
+    sensor_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    site TEXT,
+    rack TEXT,
+    bucket TIMESTAMPTZ NOT NULL,
+    min FLOAT8 NOT NULL,
+    max FLOAT8 NOT NULL,
+    avg FLOAT8 NOT NULL,
+    count BIGINT NOT NULL,
+    PRIMARY KEY (sensor_id, bucket)
+) PARTITION BY RANGE (bucket);
+
+CREATE TABLE IF NOT EXISTS telemetry_rollup_1m_default PARTITION OF telemetry_rollup_1m DEFAULT;
+CREATE TABLE IF NOT EXISTS telemetry_rollup_1h_default PARTITION OF telemetry_rollup_1h DEFAULT;
+
+-- Site and rack labels let the brain's range queries (GET /telemetry/range) select rollups per rack or site
+ALTER TABLE telemetry_rollup_1m ADD COLUMN IF NOT EXISTS site TEXT, ADD COLUMN IF NOT EXISTS rack TEXT;
+ALTER TABLE telemetry_rollup_1h ADD COLUMN IF NOT EXISTS site TEXT, ADD COLUMN IF NOT EXISTS rack TEXT;
+CREATE INDEX IF NOT EXISTS idx_rollup_1m_rack ON telemetry_rollup_1m (rack, bucket);
+CREATE INDEX IF NOT EXISTS idx_rollup_1m_site ON telemetry_rollup_1m (site, bucket);
+CREATE INDEX IF NOT EXISTS idx_rollup_1h_rack ON telemetry_rollup_1h (rack, bucket);
+CREATE INDEX IF NOT EXISTS idx_rollup_1h_site ON telemetry_rollup_1h (site, bucket);
+
+-- Rack of a reading, as app.engine.batch.rack_from_id: metadata `rack`, else parsed from the sensor id
+CREATE OR REPLACE FUNCTION helixa_rack(sensor_id TEXT, meta_rack TEXT)
+RETURNS TEXT LANGUAGE sql IMMUTABLE AS $$
+    SELECT COALESCE(meta_rack, upper((regexp_match(sensor_id, 'RACK-?[A-Za-z0-9]+', 'i'))[1]), 'unassigned');
+$$;
+
+-- Raw data up to `watermark` has been rolled up; partitions are only dropped below it
+CREATE TABLE IF NOT EXISTS telemetry_rollup_state (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    watermark TIMESTAMPTZ NOT NULL
+);
+
+-- 3. Partition management
+-- Creates partitions of `parent` named <parent>_pYYYYMMDD covering [start, start + step),
+-- from `behind` periods in the past up to `ahead` periods in the future.
+CREATE OR REPLACE FUNCTION helixa_ensure_partitions(parent TEXT, step INTERVAL, ahead INT, behind INT DEFAULT 0)
+RETURNS INT LANGUAGE plpgsql SECURITY DEFINER AS $$
+DECLARE
+    unit TEXT := CASE WHEN step >= INTERVAL '1 month' THEN 'month' ELSE 'day' END;
+    period_start TIMESTAMPTZ := date_trunc(unit, NOW()) - step * behind;
+    partition_name TEXT;
+    created INT := 0;
+BEGIN
+    FOR i IN -behind..ahead LOOP
+        partition_name := format('%s_p%s', parent, to_char(period_start, 'YYYYMMDD'));
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                partition_name, parent, period_start, period_start + step
+            );
+            created := created + 1;
+        END IF;
+        period_start := period_start + step;
+    END LOOP;
+    RETURN created;
+END $$;
+
+-- Drops partitions of `parent` whose upper bound is at or before `cutoff`; returns their names
+CREATE OR REPLACE FUNCTION helixa_drop_partitions(parent TEXT, cutoff TIMESTAMPTZ)
+RETURNS SETOF TEXT LANGUAGE plpgsql SECURITY DEFINER AS $$
+DECLARE
+    part RECORD;
+BEGIN
+    FOR part IN
+        SELECT c.relname AS name,
+               (regexp_match(pg_get_expr(c.relpartbound, c.oid), 'TO \(''([^'']+)''\)'))[1]::TIMESTAMPTZ AS upper_bound
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = parent::regclass
+          AND pg_get_expr(c.relpartbound, c.oid) <> 'DEFAULT'
+    LOOP
+        IF part.upper_bound <= cutoff THEN
+            EXECUTE format('DROP TABLE %I', part.name);
+            RETURN NEXT part.name;
+        END IF;
+    END LOOP;
+END $$;
+
+-- 4. Rollups: aggregates raw rows in [watermark, until) into 1-minute buckets and re-derives the
+-- affected 1-hour buckets from them. Idempotent (upserts); returns the number of 1-minute rows written.
+CREATE OR REPLACE FUNCTION telemetry_rollup(until TIMESTAMPTZ)
+RETURNS BIGINT LANGUAGE plpgsql SECURITY DEFINER AS $$
+DECLARE
+    since TIMESTAMPTZ;
+    upto TIMESTAMPTZ := date_trunc('minute', until);
+    written BIGINT;
+BEGIN
+    SELECT watermark INTO since FROM telemetry_rollup_state FOR UPDATE;
+    IF since IS NULL THEN
+        SELECT date_trunc('minute', COALESCE(MIN(created_at), upto)) INTO since FROM telemetry;
+        INSERT INTO telemetry_rollup_state (watermark) VALUES (since);
+    END IF;
+    IF upto <= since THEN
+        RETURN 0;
+    END IF;
+
+    INSERT INTO telemetry_rollup_1m (sensor_id, type, site, rack, bucket, min, max, avg, count)
+    SELECT sensor_id, MIN(type), MIN(metadata ->> 'site'), MIN(helixa_rack(sensor_id, metadata ->> 'rack')),
+           date_trunc('minute', created_at), MIN(value), MAX(value), AVG(value), COUNT(*)
+    FROM telemetry
+    WHERE created_at >= since AND created_at < upto
+    GROUP BY sensor_id, date_trunc('minute', created_at)
+    ON CONFLICT (sensor_id, bucket) DO UPDATE
+        SET min = EXCLUDED.min, max = EXCLUDED.max, avg = EXCLUDED.avg, count = EXCLUDED.count,
+            site = EXCLUDED.site, rack = EXCLUDED.rack;
+    GET DIAGNOSTICS written = ROW_COUNT;
+
+    INSERT INTO telemetry_rollup_1h (sensor_id, type, site, rack, bucket, min, max, avg, count)
+    SELECT sensor_id, MIN(type), MIN(site), MIN(rack), date_trunc('hour', bucket),
+           MIN(min), MAX(max), SUM(avg * count) / SUM(count), SUM(count)
+    FROM telemetry_rollup_1m
+    WHERE bucket >= date_trunc('hour', since) AND bucket < upto
+    GROUP BY sensor_id, date_trunc('hour', bucket)
+    ON CONFLICT (sensor_id, bucket) DO UPDATE
+        SET min = EXCLUDED.min, max = EXCLUDED.max, avg = EXCLUDED.avg, count = EXCLUDED.count,
+            site = EXCLUDED.site, rack = EXCLUDED.rack;
+
+    UPDATE telemetry_rollup_state SET watermark = upto;
+    RETURN written;
+END $$;
+
+-- 5. Retention: drops whole partitions. Raw partitions are only dropped once rolled up.
+CREATE OR REPLACE FUNCTION telemetry_apply_retention(raw_days INT, rollup_1m_days INT, rollup_1h_days INT)
+RETURNS SETOF TEXT LANGUAGE plpgsql SECURITY DEFINER AS $$
+DECLARE
+    rolled_up TIMESTAMPTZ := (SELECT watermark FROM telemetry_rollup_state);
+BEGIN
+    IF rolled_up IS NOT NULL THEN
+        RETURN QUERY SELECT helixa_drop_partitions('telemetry', LEAST(NOW() - make_interval(days => raw_days), rolled_up));
+        -- Stragglers outside any daily partition
+        DELETE FROM telemetry_default WHERE created_at < LEAST(NOW() - make_interval(days => raw_days), rolled_up);
+    END IF;
+    RETURN QUERY SELECT helixa_drop_partitions('telemetry_rollup_1m', NOW() - make_interval(days => rollup_1m_days));
+    RETURN QUERY SELECT helixa_drop_partitions('telemetry_rollup_1h', NOW() - make_interval(days => rollup_1h_days));
+END $$;
+
+-- 6. Range queries for the brain's query API: min/max/avg/count per sensor and time bucket of
+-- `bucket_seconds` (raw readings when 0), filtered by sensor ids, site and/or rack. Buckets of an
+-- hour or more read the 1-hour rollups, of a minute or more the 1-minute rollups, anything finer the
+-- raw partitions; readings past the rollup watermark always come from the raw partitions.
+CREATE OR REPLACE FUNCTION telemetry_range(
+    sensor_filter TEXT[], site_filter TEXT, rack_filter TEXT, since TIMESTAMPTZ, until TIMESTAMPTZ, bucket_seconds INT
+)
+RETURNS TABLE (sensor_id TEXT, bucket TIMESTAMPTZ, min FLOAT8, max FLOAT8, avg FLOAT8, count BIGINT)
+LANGUAGE plpgsql STABLE AS $$
+#variable_conflict use_column
+DECLARE
+    width INTERVAL := make_interval(secs => GREATEST(bucket_seconds, 1));
+    tier TEXT := CASE WHEN bucket_seconds >= 3600 THEN '1h' WHEN bucket_seconds >= 60 THEN '1m' ELSE 'raw' END;
+    rolled_up TIMESTAMPTZ := COALESCE((SELECT watermark FROM telemetry_rollup_state), '-infinity');
+    raw_since TIMESTAMPTZ := CASE WHEN tier = 'raw' THEN since ELSE GREATEST(since, rolled_up) END;
+BEGIN
+    RETURN QUERY
+    SELECT x.sensor_id,
+           CASE WHEN bucket_seconds > 0 THEN date_bin(width, x.at, since) ELSE x.at END AS b,
+           MIN(x.lo), MAX(x.hi), SUM(x.mean * x.n) / SUM(x.n), SUM(x.n)::BIGINT
+    FROM (
+        SELECT r.sensor_id, r.bucket AS at, r.min AS lo, r.max AS hi, r.avg AS mean, r.count AS n
+        FROM telemetry_rollup_1h r
+        WHERE tier = '1h' AND r.bucket >= since AND r.bucket < LEAST(until, rolled_up)
+          AND (sensor_filter IS NULL OR r.sensor_id = ANY (sensor_filter))
+          AND (site_filter IS NULL OR r.site = site_filter)
+          AND (rack_filter IS NULL OR r.rack = rack_filter)
+        UNION ALL
+        SELECT r.sensor_id, r.bucket, r.min, r.max, r.avg, r.count
+        FROM telemetry_rollup_1m r
+        WHERE tier = '1m' AND r.bucket >= since AND r.bucket < LEAST(until, rolled_up)
+          AND (sensor_filter IS NULL OR r.sensor_id = ANY (sensor_filter))
+          AND (site_filter IS NULL OR r.site = site_filter)
+          AND (rack_filter IS NULL OR r.rack = rack_filter)
+        UNION ALL
+        SELECT t.sensor_id, t.created_at, t.value, t.value, t.value, 1
+        FROM telemetry t
+        WHERE t.created_at >= raw_since AND t.created_at < until
+          AND (sensor_filter IS NULL OR t.sensor_id = ANY (sensor_filter))
+          AND (site_filter IS NULL OR t.metadata ->> 'site' = site_filter)
+          AND (rack_filter IS NULL OR helixa_rack(t.sensor_id, t.metadata ->> 'rack') = rack_filter)
+    ) x
+    GROUP BY 1, 2
+    ORDER BY 1, 2;
+END $$;
+
+-- Maintenance functions are for the janitor (service role) only, never for API clients
+REVOKE EXECUTE ON FUNCTION helixa_ensure_partitions(TEXT, INTERVAL, INT, INT) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION helixa_drop_partitions(TEXT, TIMESTAMPTZ) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION telemetry_rollup(TIMESTAMPTZ) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION telemetry_apply_retention(INT, INT, INT) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION helixa_ensure_partitions(TEXT, INTERVAL, INT, INT) TO service_role;
+GRANT EXECUTE ON FUNCTION telemetry_rollup(TIMESTAMPTZ) TO service_role;
+GRANT EXECUTE ON FUNCTION telemetry_apply_retention(INT, INT, INT) TO service_role;
+-- Range queries go through the brain, which owns downsampling and response encoding
+REVOKE EXECUTE ON FUNCTION telemetry_range(TEXT[], TEXT, TEXT, TIMESTAMPTZ, TIMESTAMPTZ, INT) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION telemetry_range(TEXT[], TEXT, TEXT, TIMESTAMPTZ, TIMESTAMPTZ, INT) TO service_role;
+
+-- 7. Initial partitions (including the backfill week) and backfill from a pre-partitioning table
+SELECT helixa_ensure_partitions('telemetry', INTERVAL '1 day', 3, 7);
+SELECT helixa_ensure_partitions('telemetry_rollup_1m', INTERVAL '1 day', 3, 7);
+SELECT helixa_ensure_partitions('telemetry_rollup_1h', INTERVAL '1 month', 1, 1);
+
+DO $$
+BEGIN
+    IF to_regclass('telemetry_legacy') IS NOT NULL AND NOT EXISTS (SELECT 1 FROM telemetry LIMIT 1) THEN
+        -- The last week moves into daily partitions; drop telemetry_legacy once verified
+        INSERT INTO telemetry (created_at, sensor_id, type, value, unit, metadata)
+        SELECT created_at, sensor_id, type, value, unit, to_jsonb(l) -> 'metadata'
+        FROM telemetry_legacy l
+        WHERE created_at >= NOW() - INTERVAL '7 days';
+    END IF;
+END $$;
@@ -0,0 +1,105 @@
+import json
+import asyncio
+import logging
+
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
+
+from app.api.telemetry import INGESTION_COUNT, _admitted, _process, control_hub
+from app.core.admission import AdmissionRejected
+from app.core.metrics import INGEST_LATENCY, STAGES
+from app.engine.batch import TelemetryColumns
+
+logger = logging.getLogger("Helixa-Control")
+router = APIRouter()
+INGEST_CONTROL = INGEST_LATENCY.labels(endpoint="control_channel")
+
+
+async def _telemetry(session, message: dict) -> dict:
+    """Ingests the packets of a telemetry message and returns the receipt for the agent."""
+    seq = message.get("seq")
+    if seq is None:
+        return {"type": "error", "detail": "Telemetry messages need a seq"}
+    try:
+        async with control_hub.ingest_once(session.agent_id, seq) as first:
+            if not first:
+                # A resend of telemetry already ingested: confirm it again without processing it twice
+                return {"type": "receipt", "seq": seq, "duplicate": True}
+            return await _ingest(session, seq, message)
+    except AdmissionRejected as e:
+        # Nothing was ingested, so ingest_once has forgotten the seq and the resend goes through
+        return {"type": "error", "seq": seq, "detail": str(e), "retry": True, "retry_after": e.retry_after}
+
+
+async def _ingest(session, seq, message: dict) -> dict:
+    with INGEST_CONTROL.time():
+        try:
+            with STAGES["decode"].time():
+                columns = TelemetryColumns.from_records(message.get("packets") or [])
+        except (ValueError, TypeError) as e:
+            return {"type": "error", "seq": seq, "detail": f"Malformed telemetry: {str(e)}"}
+        # Claim before analysis so actions decided for this very batch are routed to the agent
+        control_hub.claim(session, columns.ids)
+        async with _admitted(columns, session.agent_id) as ticket:
+            INGESTION_COUNT.inc(columns.packet_count)
+            batch, _ = await _process(ticket.columns)
+    receipt = {
+        "type": "receipt",
+        "seq": seq,
+        "packets_count": columns.packet_count,
+        "sensors_count": len(ticket.columns),
+        "safety_violations": batch.safety_violations(),
+    }
+    if ticket.shed:
+        receipt["shed_readings"] = ticket.shed
+    return receipt
+
+
+@router.websocket("/agents/control")
+async def control_channel(websocket: WebSocket, agent_id: str = Query(..., min_length=1, max_length=128)):
+    """
+    Persistent channel of one nerves agent. Upstream messages are JSON objects with a `type`:
+    "telemetry" (`seq`, unique per agent, and `packets` in the TelemetryData layout, answered by a
+    "receipt" or an "error"; a resent seq is confirmed without being ingested again), "ack" (`id` of an executed action, optional `status`) and "hello" (`sensors` the agent
+    reports). The brain pushes "action" messages the moment a batch decides them.
+    """
+    await websocket.accept()
+    try:
+        session = control_hub.connect(agent_id)
+    except RuntimeError as e:
+        await websocket.close(code=1013, reason=str(e))
+        return
+
+    lock = asyncio.Lock()
+
+    async def send(message: dict):
+        async with lock:
+            await websocket.send_text(json.dumps(message))
+
+    # Actions go through the bounded outbox; replies are awaited so a receipt is never dropped
+    writer = asyncio.create_task(control_hub.pump(session, send))
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+                kind = message.get("type")
+            except (ValueError, AttributeError):
+                await send({"type": "error", "detail": "Messages must be JSON objects"})
+                continue
+            if kind == "telemetry":
+                try:
+                    receipt = await _telemetry(session, message)
+                except Exception as e:
+                    logger.error(f"Control channel ingestion failed for agent {agent_id}: {str(e)}")
+                    receipt = {"type": "error", "seq": message.get("seq"), "detail": f"Internal Intelligence Error: {str(e)}", "retry": True}
+                await send(receipt)
+            elif kind == "ack":
+                control_hub.ack(session, str(message.get("id")), message.get("status", "executed"))
+            elif kind == "hello":
+                control_hub.claim(session, [str(s) for s in message.get("sensors") or []])
+            else:
+                await send({"type": "error", "detail": f"Unknown message type '{kind}'"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        writer.cancel()
+        control_hub.disconnect(session)
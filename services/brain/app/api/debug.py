@@ -0,0 +1,27 @@
+import asyncio
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from app.core.profiler import SamplingProfiler
+
+router = APIRouter()
+profiler = SamplingProfiler.from_env()
+
+
+@router.get("/debug/profile", response_class=PlainTextResponse)
+async def capture_profile(
+    seconds: float = Query(10.0, gt=0, le=120),
+    hz: int = Query(100, ge=1, le=1000)
+):
+    """
+    Captures a sampling profile of the running brain for `seconds` and returns
+    collapsed stacks ready for flamegraph.pl or speedscope. Disabled unless ENABLE_PROFILER is set.
+    """
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="Profiler disabled. Set ENABLE_PROFILER=true to enable it.")
+    if profiler.busy:
+        raise HTTPException(status_code=409, detail="A profile is already being captured")
+    try:
+        # The sampler runs in a worker thread so the event loop keeps serving (and being sampled)
+        return await asyncio.to_thread(profiler.capture, seconds, hz)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
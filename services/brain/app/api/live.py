@@ -0,0 +1,93 @@
+import json
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from app.api.telemetry import live_hub
+
+router = APIRouter()
+
+
+def _subscribe(site, rack, sensor_type, anomalies, fps):
+    return live_hub.subscribe(site=site, rack=rack, sensor_type=sensor_type, anomalies_only=anomalies, fps=fps)
+
+
+@router.websocket("/telemetry/live")
+async def live_websocket(
+    websocket: WebSocket,
+    site: Optional[str] = None,
+    rack: Optional[str] = None,
+    type: Optional[str] = None,
+    anomalies: bool = False,
+    fps: Optional[float] = Query(None, gt=0),
+):
+    """
+    Live analyzed readings over a WebSocket, filtered by site, rack, sensor type and/or
+    anomalies only. Each message is one JSON frame with parallel per-reading arrays holding the
+    latest reading of every sensor that changed since the previous frame.
+    """
+    await websocket.accept()
+    try:
+        sub = _subscribe(site, rack, type, anomalies, fps)
+    except RuntimeError as e:
+        await websocket.close(code=1013, reason=str(e))
+        return
+
+    async def send(frame: dict):
+        await websocket.send_text(json.dumps(frame))
+
+    async def drain():
+        # Nothing is expected from the client; reading only notices the disconnect
+        while True:
+            await websocket.receive_text()
+
+    pump = asyncio.create_task(live_hub.stream(sub, send))
+    listener = asyncio.create_task(drain())
+    try:
+        done, _ = await asyncio.wait((pump, listener), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in (pump, listener):
+            task.cancel()
+        live_hub.unsubscribe(sub)
+    if pump in done and listener not in done:
+        # The hub gave up on this consumer while it is still connected
+        try:
+            await websocket.close(code=1008, reason="Consumer too slow")
+        except (RuntimeError, WebSocketDisconnect):
+            pass
+
+
+@router.get("/telemetry/live/sse")
+async def live_sse(
+    site: Optional[str] = None,
+    rack: Optional[str] = None,
+    type: Optional[str] = None,
+    anomalies: bool = False,
+    fps: Optional[float] = Query(None, gt=0),
+):
+    """The live stream of /telemetry/live as Server-Sent Events, one `data:` frame per update."""
+    try:
+        sub = _subscribe(site, rack, type, anomalies, fps)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    # A one-frame hand-off: if the client stops reading, the hub's send times out and drops it
+    handoff: asyncio.Queue = asyncio.Queue(maxsize=1)
+
+    async def events():
+        pump = asyncio.create_task(live_hub.stream(sub, handoff.put))
+        try:
+            while not pump.done() or not handoff.empty():
+                getter = asyncio.ensure_future(handoff.get())
+                await asyncio.wait((getter, pump), return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    break
+                yield f"data: {json.dumps(getter.result())}\n\n"
+        finally:
+            pump.cancel()
+            live_hub.unsubscribe(sub)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
@@ -0,0 +1,150 @@
+import os
+import json
+import math
+import time
+import asyncio
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from app.api.telemetry import telemetry_writer, msgpack
+from app.core.metrics import QUERY_LATENCY, QUERY_ROWS
+from app.core.storage import RangeTooLarge
+from app.engine.downsample import lttb
+
+router = APIRouter()
+
+MODES = ("lttb", "minmax", "raw")
+FORMATS = ("json", "ndjson", "msgpack")
+QUERY_MAX_POINTS = int(os.getenv("QUERY_MAX_POINTS", 5000))
+QUERY_MAX_SENSORS = int(os.getenv("QUERY_MAX_SENSORS", 500))
+# Raw mode refuses ranges that would return more readings than this
+QUERY_MAX_RAW_ROWS = int(os.getenv("QUERY_MAX_RAW_ROWS", 200000))
+# Downsampled modes refuse ranges that would pull more storage rows (buckets) than this
+QUERY_MAX_ROWS = int(os.getenv("QUERY_MAX_ROWS", 500000))
+# Longest range of a rack/site query, whose sensor count is not bounded by QUERY_MAX_SENSORS
+QUERY_MAX_GROUP_SPAN_HOURS = float(os.getenv("QUERY_MAX_GROUP_SPAN_HOURS", 168))
+# LTTB picks its points from this many storage buckets per output point
+LTTB_OVERSAMPLE = 4
+
+
+def _bucket_seconds(mode: str, span: float, points: int) -> int:
+    """Storage bucket width for a query; 0 reads raw readings."""
+    if mode == "raw":
+        return 0
+    per_point = span / points
+    if mode == "lttb":
+        per_point /= LTTB_OVERSAMPLE
+    return 0 if per_point < 1 else int(math.ceil(per_point))
+
+
+def _series(columns, mode: str, points: int) -> List[dict]:
+    """Splits the storage columns per sensor and applies the downsampling of `mode`."""
+    ids, buckets, mins, maxs, avgs, counts = columns
+    if not ids:
+        return []
+    t = np.asarray(buckets, dtype=np.float64)
+    lo, hi, mean = (np.asarray(c, dtype=np.float64) for c in (mins, maxs, avgs))
+    n = np.asarray(counts, dtype=np.int64)
+    # Rows arrive ordered by sensor, so each sensor is one contiguous slice
+    starts = [0] + [i for i in range(1, len(ids)) if ids[i] != ids[i - 1]] + [len(ids)]
+    series = []
+    for a, b in zip(starts[:-1], starts[1:]):
+        if mode == "minmax":
+            series.append({"sensor_id": ids[a], "t": t[a:b], "min": lo[a:b], "max": hi[a:b], "avg": mean[a:b], "count": n[a:b]})
+        else:
+            keep = lttb(t[a:b], mean[a:b], points) + a if mode == "lttb" else slice(a, b)
+            series.append({"sensor_id": ids[a], "t": t[keep], "v": mean[keep]})
+    return series
+
+
+def _json_ready(series: dict) -> dict:
+    return {k: v.tolist() if isinstance(v, np.ndarray) else v for k, v in series.items()}
+
+
+def _packed(series: dict) -> dict:
+    """msgpack form: little-endian float64 timestamps and float32 values as raw bytes."""
+    packed = {}
+    for key, value in series.items():
+        if key == "t":
+            packed[key] = value.astype("<f8").tobytes()
+        elif key == "count":
+            packed[key] = value.astype("<u4").tobytes()
+        elif isinstance(value, np.ndarray):
+            packed[key] = value.astype("<f4").tobytes()
+        else:
+            packed[key] = value
+    return packed
+
+
+def _ndjson(header: dict, series: List[dict]) -> Iterator[bytes]:
+    yield (json.dumps(header) + "\n").encode()
+    for s in series:
+        yield (json.dumps(_json_ready(s)) + "\n").encode()
+
+
+@router.get("/telemetry/range")
+async def query_range(
+    sensor_id: Optional[List[str]] = Query(None, description="Sensor id; repeat for several sensors"),
+    site: Optional[str] = None,
+    rack: Optional[str] = Query(None, description="Rack label such as RACK-012"),
+    start: Optional[datetime] = Query(None, description="Range start (ISO 8601 or unix seconds); default end - 1h"),
+    end: Optional[datetime] = Query(None, description="Range end (ISO 8601 or unix seconds); default now"),
+    points: int = Query(500, ge=3, le=QUERY_MAX_POINTS, description="Target points (lttb) or buckets (minmax) per sensor"),
+    mode: str = Query("lttb", pattern="^(lttb|minmax|raw)$"),
+    format: str = Query("json", pattern="^(json|ndjson|msgpack)$"),
+):
+    """
+    Historical telemetry per sensor, rack or site with server-side downsampling (CEZI COLA: Efficiency).
+    `lttb` keeps the visual shape in `points` points per sensor, `minmax` returns min/max/avg/count
+    per bucket (nothing hidden between points), `raw` returns stored readings. Long ranges are
+    served from the 1-minute/1-hour rollups. Results are columnar: one t/v array pair per sensor,
+    as JSON, streamed NDJSON (one sensor per line) or msgpack with packed float arrays.
+    Rack and site queries span at most QUERY_MAX_GROUP_SPAN_HOURS (400 beyond), and a query that
+    would read more than QUERY_MAX_ROWS storage rows (QUERY_MAX_RAW_ROWS in raw mode) gets 413.
+    """
+    started = time.perf_counter()
+    if not sensor_id and site is None and rack is None:
+        raise HTTPException(status_code=400, detail="Select data with sensor_id, rack and/or site")
+    if sensor_id and len(sensor_id) > QUERY_MAX_SENSORS:
+        raise HTTPException(status_code=400, detail=f"At most {QUERY_MAX_SENSORS} sensor ids per query")
+    if format == "msgpack" and msgpack is None:
+        raise HTTPException(status_code=406, detail="msgpack is not installed on this brain")
+
+    until = end.timestamp() if end else time.time()
+    since = start.timestamp() if start else until - 3600
+    if until <= since:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    if not sensor_id and until - since > QUERY_MAX_GROUP_SPAN_HOURS * 3600:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Rack and site queries span at most {QUERY_MAX_GROUP_SPAN_HOURS:g} hours; narrow the range or select sensor_id",
+        )
+    bucket_seconds = _bucket_seconds(mode, until - since, points)
+    max_rows = QUERY_MAX_RAW_ROWS if mode == "raw" else QUERY_MAX_ROWS
+
+    try:
+        columns = await asyncio.to_thread(
+            telemetry_writer.backend.fetch_range, sensor_id, site, rack, since, until, bucket_seconds, max_rows
+        )
+    except RangeTooLarge:
+        QUERY_ROWS.observe(max_rows)
+        hint = "use mode=lttb or mode=minmax" if mode == "raw" else "narrow the range, select fewer sensors or lower points"
+        raise HTTPException(status_code=413, detail=f"More than {max_rows} stored rows match; {hint}")
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Telemetry storage unavailable: {str(e)}")
+    QUERY_ROWS.observe(len(columns[0]))
+
+    series = _series(columns, mode, points)
+    header = {"start": since, "end": until, "mode": mode, "bucket_seconds": bucket_seconds, "sensors": len(series)}
+    QUERY_LATENCY.labels(format=format).observe(time.perf_counter() - started)
+
+    if format == "ndjson":
+        return StreamingResponse(_ndjson(header, series), media_type="application/x-ndjson")
+    if format == "msgpack":
+        body = msgpack.packb({**header, "series": [_packed(s) for s in series]})
+        return Response(body, media_type="application/x-msgpack")
+    return JSONResponse({**header, "series": [_json_ready(s) for s in series]})
@@ -1,88 +1,306 @@
-from fastapi import APIRouter, Body, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import APIRouter, Body, HTTPException, Request
+from typing import List, Optional, Tuple, Union
 from app.schemas.telemetry import TelemetryData
-from app.core.safety import SafetyController
-from app.core.database import SupabaseManager
-from app.engine.anomaly import IntelligenceEngine
-from prometheus_client import Counter, Gauge
+from app.core.admission import AdmissionController, AdmissionRejected, Ticket
+from app.core.fleet_metrics import FleetMetricsCollector
+from app.core.control import ControlHub
+from app.core.live import LiveHub
+from app.core.metrics import INGEST_LATENCY, PACKET_READINGS, PERSIST_QUEUE_DEPTH, PERSIST_SPILL_DEPTH, STAGES
+from app.core.pipeline import TelemetryWriter
+from app.core.startup import startup
+from app.engine.batch import BatchAnalysis, TelemetryColumns
+from app.engine.registry import RegistryCollector
+from app.engine.sharding import create_engine
+from prometheus_client import REGISTRY, Counter
 import logging
+import gzip
+import json
+
+try:
+    import msgpack
+except ImportError:  # Columnar msgpack ingestion is unavailable without it
+    msgpack = None
 
 logger = logging.getLogger("Helixa-API")
 router = APIRouter()
-intelligence_suite = IntelligenceEngine()
+# In-process engine, or hash-routed shard workers when ENGINE_SHARDS/ENGINE_SHARD_ADDRESSES are set
+with startup.phase("engine"):
+    intelligence_suite = create_engine()
+telemetry_writer = TelemetryWriter.from_env()
+# Push fan-out of analyzed readings to dashboards (app/api/live.py)
+live_hub = LiveHub.from_env()
+# Push channel of mitigation actions to connected nerves agents (app/api/control.py)
+control_hub = ControlHub.from_env()
+# Token buckets, bounded in-flight work and priority shedding in front of _process
+admission = AdmissionController.from_env(backlog=lambda: telemetry_writer.queue_depth() / telemetry_writer.max_queue)
 
 # Metrics
 INGESTION_COUNT = Counter('telemetry_ingestion_total', 'Total telemetry packets ingested')
-ANOMALY_COUNT = Counter('anomaly_detection_total', 'Total anomalies detected', ['sensor_id'])
-SENSOR_VALUE = Gauge('sensor_reading', 'Current sensor reading', ['sensor_id', 'type'])
+# Per-site/rack/type aggregates; per-sensor series only for allow-listed and top-K anomalous sensors
+fleet_metrics = FleetMetricsCollector.from_env()
+REGISTRY.register(fleet_metrics)
+PERSIST_QUEUE_DEPTH.set_function(telemetry_writer.queue_depth)
+PERSIST_SPILL_DEPTH.set_function(telemetry_writer.spill_depth)
+engine_state = RegistryCollector(intelligence_suite.registry_stats)
+REGISTRY.register(engine_state)
+INGEST_SINGLE = INGEST_LATENCY.labels(endpoint="telemetry")
+INGEST_BULK = INGEST_LATENCY.labels(endpoint="telemetry_bulk")
+
+def _record_metrics(batch: BatchAnalysis):
+    """Folds an analyzed batch into the bounded-cardinality fleet metrics."""
+    fleet_metrics.record(batch)
+
+
+# Packet fields stored as typed header columns in the normalized layout
+HEADER_FIELDS = ("site", "device_type", "mode", "version")
+
+
+def _persistence_rows(batch: BatchAnalysis, results: List[dict]) -> List[dict]:
+    """Builds telemetry rows enriched with intelligence results and actions."""
+    if telemetry_writer.schema == "normalized":
+        return _normalized_rows(batch)
+    columns = batch.columns
+    rows = []
+    for i, result in enumerate(results):
+        rows.append({
+            "sensor_id": columns.ids[i],
+            "type": str(columns.types[i]),
+            "value": float(columns.values[i]),
+            "unit": columns.units[i],
+            "metadata": {
+                **columns.metadata[columns.packet[i]],
+                # Event time of the packet; created_at is when the write-behind batch was stored
+                "observed_at": columns.timestamps[columns.packet[i]],
+                "intelligence": result["analysis"],
+                "recommended_action": result["action"],
+                "is_safe": bool(batch.is_safe[i])
+            }
+        })
+    return rows
+
+
+def _normalized_rows(batch: BatchAnalysis) -> List[dict]:
+    """
+    Lean rows for the normalized layout: typed intelligence columns per reading and a
+    reference to one shared header per packet instead of a copy of its metadata.
+    """
+    columns = batch.columns
+    headers = []
+    for timestamp, meta in zip(columns.timestamps, columns.metadata):
+        meta = meta or {}
+        header = {"timestamp": timestamp, "metadata": {k: v for k, v in meta.items() if k not in HEADER_FIELDS}}
+        header.update((field, meta.get(field)) for field in HEADER_FIELDS)
+        headers.append(header)
+
+    ttfs = [None if t != t else round(t, 1) for t in batch.ttf_minutes.tolist()]
+    actions = [a if a >= 0 else None for a in batch.actions.tolist()]
+    return [
+        {
+            "packet": headers[p],
+            "sensor_id": sensor_id,
+            "type": sensor_type,
+            "unit": unit,
+            "value": value,
+            "z_score": round(z, 2),
+            "is_anomaly": anomaly,
+            "status": status,
+            "ttf_minutes": ttf,
+            "is_safe": safe,
+            "action": action,
+        }
+        for p, sensor_id, sensor_type, unit, value, z, anomaly, status, ttf, safe, action in zip(
+            columns.packet.tolist(), columns.ids, columns.types.tolist(), columns.units, columns.values.tolist(),
+            batch.z_score.tolist(), batch.is_anomaly.tolist(), batch.status.tolist(), ttfs,
+            batch.is_safe.tolist(), actions,
+        )
+    ]
+
+
+def _agent(request: Request) -> Optional[str]:
+    """Sender identity for per-agent rate limits: the X-Agent-Id header, else the client address."""
+    return request.headers.get("x-agent-id") or (request.client.host if request.client else None)
+
+
+@asynccontextmanager
+async def _admitted(columns: TelemetryColumns, agent: Optional[str]):
+    """Holds in-flight capacity for the admitted share of a request; raises AdmissionRejected."""
+    if not startup.ready and not await startup.wait_ready(startup.ingest_wait):
+        # The restored history would overwrite readings analyzed before it is in place
+        raise AdmissionRejected("warming_up", 1)
+    if admission is None:
+        yield Ticket(columns, 0)
+        return
+    ticket = await admission.acquire(columns, agent)
+    try:
+        yield ticket
+    finally:
+        admission.release(ticket)
+
+
+async def _process(data: Union[TelemetryData, TelemetryColumns]) -> Tuple[BatchAnalysis, List[dict]]:
+    """Shared ingestion pipeline of the single and bulk endpoints."""
+    # 1-3. Safety Validation, Intelligence Analysis and Mitigation Strategy,
+    # vectorized over the whole packet (CEZI COLA: Risk & Intelligence)
+    batch = await intelligence_suite.analyze_batch_async(data)
+    PACKET_READINGS.observe(len(batch.columns))
+    # Actions reach agents on their control channel before anything else happens to the batch
+    with STAGES["control"].time():
+        control_hub.dispatch(batch)
+    with STAGES["report"].time():
+        results = batch.intelligence_report()
+
+    # 4. Update Metrics (CEZI COLA: Observability)
+    with STAGES["metrics"].time():
+        _record_metrics(batch)
+    with STAGES["live"].time():
+        live_hub.publish(batch)
+
+    # 5. Queue for Persistence (CEZI COLA: Persistence)
+    # Write-behind: the background writer flushes multi-row inserts off the request path
+    with STAGES["persist_enqueue"].time():
+        try:
+            await telemetry_writer.enqueue(_persistence_rows(batch, results))
+        except Exception as e:
+            logger.error(f"Database persistence failed: {str(e)}")
+    return batch, results
+
 
 @router.post("/telemetry")
-async def receive_telemetry(data: TelemetryData):
+async def receive_telemetry(data: TelemetryData, request: Request):
     """Ingests and analyzes telemetry data with predictive intelligence."""
+    with INGEST_SINGLE.time():
+        async with _admitted(TelemetryColumns.from_packets([data]), _agent(request)) as ticket:
+            return await _receive_single(data, ticket)
+
+
+async def _receive_single(data: TelemetryData, ticket: Ticket) -> dict:
     try:
         INGESTION_COUNT.inc()
-        
-        results = []
-        safety_violations = 0
-        
-        device_type = data.metadata.get("device_type", "datacenter") if data.metadata else "datacenter"
-        
-        for sensor in data.sensors:
-            sensor_id = sensor.id
-            sensor_type = sensor.type
-            
-            # 1. Safety Validation (CEZI COLA: Risk)
-            is_safe = SafetyController.validate_sensor_reading(sensor_type, sensor.value, device_type)
-            if not is_safe:
-                safety_violations += 1
-                
-            # 2. Intelligence Analysis (CEZI COLA: Intelligence)
-            limits = SafetyController.get_limits(sensor_type, device_type)
-            analysis = intelligence_suite.analyze(sensor_id, sensor.value, sensor_type, limits)
-            
-            if analysis["is_anomaly"]:
-                ANOMALY_COUNT.labels(sensor_id=sensor_id).inc()
-                
-            # 3. Mitigation Strategy (CEZI COLA: Risk)
-            recommended_action = SafetyController.get_mitigation_action(sensor_type, sensor.value, analysis, device_type)
-
-            # 4. Update Metrics (CEZI COLA: Observability)
-            SENSOR_VALUE.labels(sensor_id=sensor_id, type=sensor_type).set(sensor.value)
-
-            # 5. Persist to Memory (CEZI COLA: Persistence)
-            try:
-                # Enrich metadata with intelligence results and actions
-                enriched_metadata = {
-                    **(data.metadata or {}),
-                    "intelligence": analysis,
-                    "recommended_action": recommended_action,
-                    "is_safe": is_safe
-                }
-                
-                SupabaseManager.save_telemetry(
-                    sensor_id=sensor_id,
-                    sensor_type=sensor_type,
-                    value=sensor.value,
-                    unit=sensor.unit,
-                    metadata=enriched_metadata
-                )
-                
-                results.append({
-                    "sensor_id": sensor_id,
-                    "analysis": analysis,
-                    "action": recommended_action
-                })
-                
-            except Exception as e:
-                logger.error(f"Database persistence failed: {str(e)}")
-            
-        return {
+        batch, results = await _process(ticket.columns)
+
+        response = {
             "status": "processed",
             "sensors_count": len(data.sensors),
-            "safety_violations": safety_violations,
+            "safety_violations": batch.safety_violations(),
             "intelligence_report": results
         }
+        if ticket.shed:
+            response["shed_readings"] = ticket.shed
+        return response
     except Exception as e:
         import traceback
         logger.error(f"CRITICAL ERROR IN TELEMETRY INGESTION: {str(e)}")
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Internal Intelligence Error: {str(e)}")
+
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+
+def _decode_bulk(body: bytes, content_type: str) -> TelemetryColumns:
+    """Decodes a bulk body into columns; raises ValueError on malformed payloads."""
+    if content_type in NDJSON_TYPES:
+        records = [json.loads(line) for line in body.splitlines() if line.strip()]
+        return TelemetryColumns.from_records(records)
+
+    if content_type in MSGPACK_TYPES:
+        if msgpack is None:
+            raise HTTPException(status_code=415, detail="msgpack support is not installed on this node")
+        payload = msgpack.unpackb(body, raw=False)
+        # Accept a single columnar block, a list of blocks, or {"packets": [...]}
+        if isinstance(payload, dict):
+            payload = payload.get("packets", [payload])
+        if not isinstance(payload, list):
+            raise ValueError("msgpack payload must be a block or a list of blocks")
+        return TelemetryColumns.from_columnar(payload)
+
+    raise HTTPException(
+        status_code=415,
+        detail=f"Unsupported content type '{content_type}'. Use NDJSON or columnar msgpack."
+    )
+
+
+@router.post("/telemetry/bulk")
+async def receive_telemetry_bulk(request: Request, report: str = "actions"):
+    """
+    Ingests many packets per request, as NDJSON (one TelemetryData per line) or as
+    columnar msgpack blocks of parallel ids/types/values/units arrays.
+    Readings go straight into the vectorized engine without per-reading Pydantic models.
+    `report` selects the response detail: "full", "actions" (default, only readings that
+    raised an anomaly or action) or "none".
+    """
+    with INGEST_BULK.time():
+        return await _receive_bulk(request, report)
+
+
+async def _receive_bulk(request: Request, report: str) -> dict:
+    body = await request.body()
+    with STAGES["decode"].time():
+        if request.headers.get("content-encoding", "").lower() == "gzip":
+            try:
+                body = gzip.decompress(body)
+            except OSError as e:
+                raise HTTPException(status_code=400, detail=f"Invalid gzip body: {str(e)}")
+
+        content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+        try:
+            columns = _decode_bulk(body, content_type)
+        except (ValueError, TypeError) as e:
+            raise HTTPException(status_code=422, detail=f"Malformed bulk telemetry: {str(e)}")
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Undecodable bulk telemetry: {str(e)}")
+
+    agent, seq = request.headers.get("x-agent-id"), request.headers.get("x-control-seq")
+    if not (agent and seq):
+        async with _admitted(columns, _agent(request)) as ticket:
+            return await _process_bulk(ticket, report)
+    # Control channel telemetry resent over HTTP after its receipt was lost: ingest it at most once
+    async with control_hub.ingest_once(agent, seq) as first:
+        if not first:
+            return {"status": "duplicate", "packets_count": columns.packet_count, "sensors_count": 0,
+                    "safety_violations": 0, "packets": []}
+        async with _admitted(columns, agent) as ticket:
+            return await _process_bulk(ticket, report)
+
+
+async def _process_bulk(ticket: Ticket, report: str) -> dict:
+    columns = ticket.columns
+    try:
+        INGESTION_COUNT.inc(columns.packet_count)
+        batch, results = await _process(columns)
+
+        bounds = batch.columns.packet_bounds().tolist()
+        packets = []
+        for i in range(columns.packet_count):
+            start, stop = bounds[i], bounds[i + 1]
+            entry = {
+                "sensors_count": stop - start,
+                "safety_violations": batch.safety_violations(start, stop)
+            }
+            if report == "full":
+                entry["intelligence_report"] = results[start:stop]
+            elif report == "actions":
+                entry["intelligence_report"] = [
+                    r for r in results[start:stop] if r["action"] or r["analysis"]["is_anomaly"]
+                ]
+            packets.append(entry)
+
+        response = {
+            "status": "processed",
+            "packets_count": columns.packet_count,
+            "sensors_count": len(columns),
+            "safety_violations": batch.safety_violations(),
+            "packets": packets
+        }
+        if ticket.shed:
+            response["shed_readings"] = ticket.shed
+        return response
+    except Exception as e:
+        import traceback
+        logger.error(f"CRITICAL ERROR IN BULK TELEMETRY INGESTION: {str(e)}")
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Internal Intelligence Error: {str(e)}")
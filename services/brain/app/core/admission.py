@@ -0,0 +1,251 @@
+import os
+import math
+import time
+import heapq
+import random
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+from prometheus_client import Counter, Gauge
+
+from app.engine.batch import TelemetryColumns
+
+logger = logging.getLogger("Helixa-Admission")
+
+ADMISSION_READINGS = Counter(
+    'telemetry_admission_readings_total', 'Readings by admission outcome', ['outcome']
+)
+ADMISSION_REJECTED = Counter(
+    'telemetry_admission_rejected_total', 'Ingestion requests deferred with 429', ['reason']
+)
+ADMISSION_INFLIGHT = Gauge('telemetry_admission_inflight_readings', 'Admitted readings still being processed')
+ADMISSION_WAITING = Gauge('telemetry_admission_waiting_readings', 'Readings waiting for in-flight capacity')
+ADMISSION_OUTCOMES = {
+    outcome: ADMISSION_READINGS.labels(outcome=outcome)
+    for outcome in ("admitted", "priority", "shed_overload", "shed_rate_limit")
+}
+
+
+class AdmissionRejected(Exception):
+    """Nothing of a request could be admitted; the client should retry after `retry_after` seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Telemetry ingestion is {reason.replace('_', ' ')}; retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Readings per second with a burst allowance, refilled lazily on use."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def shortfall(self, n: int) -> float:
+        """Seconds until `n` tokens are available (0 when they are); call refill() first."""
+        if n <= self.tokens:
+            return 0.0
+        return (min(n, self.burst) - self.tokens) / self.rate
+
+    def take(self, n: int):
+        # Priority readings are debited without a check; the debt is capped at one burst
+        self.tokens = max(-self.burst, self.tokens - n)
+
+
+class Ticket:
+    """Admitted share of a request: the columns to process and the in-flight readings they hold."""
+
+    __slots__ = ("columns", "shed", "readings")
+
+    def __init__(self, columns: TelemetryColumns, shed: int):
+        self.columns = columns
+        self.shed = shed
+        self.readings = len(columns)
+
+
+class AdmissionController:
+    """
+    Admission control in front of the ingestion pipeline (CEZI COLA: Risk).
+    Readings of `priority_types` (the sensors safety actions are decided on) are always
+    admitted. Other readings need tokens from the bucket of the sending agent and of their
+    site, and are shed once the load (in-flight readings, waiters and the persistence backlog)
+    reaches `shed_ratio` of capacity; a request left with nothing to process is deferred with
+    a jittered Retry-After so throttled agents do not return in lockstep. At most
+    `max_inflight` readings are processed at once: requests beyond it wait, those with
+    priority readings ahead of the rest, and are deferred after `queue_timeout` seconds.
+    """
+
+    def __init__(self, max_inflight: int = 50000, shed_ratio: float = 0.8, agent_rate: float = 0.0,
+                 site_rate: float = 0.0, burst_seconds: float = 5.0,
+                 priority_types: Tuple[str, ...] = ("temperature", "power"), queue_timeout: float = 2.0,
+                 retry_after: float = 1.0, max_sources: int = 10000,
+                 backlog: Optional[Callable[[], float]] = None):
+        self.max_inflight = max_inflight
+        self.shed_ratio = shed_ratio
+        self.agent_rate = agent_rate
+        self.site_rate = site_rate
+        self.burst_seconds = burst_seconds
+        self.priority_types = np.array(priority_types, dtype=object)
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.max_sources = max_sources
+        # Fill ratio (0..1) of the downstream persistence queue
+        self.backlog = backlog
+        self.inflight = 0
+        self.waiting = 0
+        # (priority class, arrival order, readings, future) of requests waiting for capacity
+        self._waiters: List[Tuple[int, int, int, asyncio.Future]] = []
+        self._order = 0
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    @classmethod
+    def from_env(cls, backlog: Optional[Callable[[], float]] = None) -> Optional["AdmissionController"]:
+        """None (admit everything) when ADMISSION_CONTROL is off."""
+        if os.getenv("ADMISSION_CONTROL", "true").lower() not in ("1", "true", "yes"):
+            return None
+        types = os.getenv("ADMISSION_PRIORITY_TYPES", "temperature,power")
+        return cls(
+            max_inflight=int(os.getenv("ADMISSION_MAX_INFLIGHT", 50000)),
+            shed_ratio=float(os.getenv("ADMISSION_SHED_RATIO", 0.8)),
+            agent_rate=float(os.getenv("ADMISSION_AGENT_RATE", 0)),
+            site_rate=float(os.getenv("ADMISSION_SITE_RATE", 0)),
+            burst_seconds=float(os.getenv("ADMISSION_BURST_SECONDS", 5)),
+            priority_types=tuple(t.strip() for t in types.split(",") if t.strip()),
+            queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 2)),
+            retry_after=float(os.getenv("ADMISSION_RETRY_AFTER", 1)),
+            max_sources=int(os.getenv("ADMISSION_MAX_SOURCES", 10000)),
+            backlog=backlog,
+        )
+
+    def load(self) -> float:
+        """Fraction of capacity in use: in-flight and waiting readings, or the persistence backlog."""
+        load = (self.inflight + self.waiting) / self.max_inflight if self.max_inflight > 0 else 0.0
+        if self.backlog is not None:
+            load = max(load, self.backlog())
+        return load
+
+    def _retry_after(self, seconds: float) -> int:
+        # Jitter spreads the retries of agents throttled by the same storm
+        return max(1, math.ceil(seconds * (1.0 + random.random())))
+
+    def _bucket(self, key: str, rate: float, now: float) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(rate, max(1.0, rate * self.burst_seconds), now)
+            if len(self._buckets) > self.max_sources:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket.refill(now)
+        return bucket
+
+    def _rate_limit(self, columns: TelemetryColumns, priority: np.ndarray, agent: Optional[str], now: float) -> float:
+        """Debits the buckets and returns 0, or the seconds until the non-priority readings fit."""
+        charges = []
+        if self.agent_rate > 0 and agent:
+            charges.append((self._bucket(f"agent:{agent}", self.agent_rate, now), int(np.count_nonzero(priority)), len(columns)))
+        if self.site_rate > 0:
+            sites = columns.sites()
+            codes = {site: code for code, site in enumerate(dict.fromkeys(sites))}
+            row_sites = np.array([codes[s] for s in sites], dtype=np.int64)[columns.packet]
+            totals = np.bincount(row_sites, minlength=len(codes))
+            urgent = np.bincount(row_sites[priority], minlength=len(codes))
+            for site, code in codes.items():
+                charges.append((self._bucket(f"site:{site}", self.site_rate, now), int(urgent[code]), int(totals[code])))
+
+        wait = max((bucket.shortfall(total - urgent) for bucket, urgent, total in charges), default=0.0)
+        for bucket, urgent, total in charges:
+            bucket.take(urgent if wait else total)
+        return wait
+
+    async def acquire(self, columns: TelemetryColumns, agent: Optional[str] = None) -> Ticket:
+        """
+        Admits what it can of a request and holds its in-flight share until release().
+        Raises AdmissionRejected when nothing can be processed now.
+        """
+        priority = np.isin(columns.types, self.priority_types)
+        urgent = int(np.count_nonzero(priority))
+        total = len(columns)
+
+        reason = None
+        if urgent < total:
+            wait = self._rate_limit(columns, priority, agent, time.monotonic())
+            if wait:
+                reason, retry = "rate_limited", wait
+            elif self.load() >= self.shed_ratio:
+                reason, retry = "overloaded", self.retry_after
+        if reason is not None:
+            ADMISSION_OUTCOMES["shed_rate_limit" if reason == "rate_limited" else "shed_overload"].inc(total - urgent)
+            if not urgent:
+                ADMISSION_REJECTED.labels(reason=reason).inc()
+                raise AdmissionRejected(reason, self._retry_after(retry))
+            ticket = Ticket(columns.take(np.flatnonzero(priority)), total - urgent)
+        else:
+            ticket = Ticket(columns, 0)
+
+        await self._enter(ticket.readings, 0 if urgent else 1)
+        ADMISSION_OUTCOMES["priority"].inc(urgent)
+        ADMISSION_OUTCOMES["admitted"].inc(ticket.readings - urgent)
+        return ticket
+
+    async def _enter(self, readings: int, klass: int):
+        if not self._waiters and (self.inflight == 0 or self.inflight + readings <= self.max_inflight):
+            self._hold(readings)
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._order += 1
+        heapq.heappush(self._waiters, (klass, self._order, readings, future))
+        self.waiting += readings
+        ADMISSION_WAITING.set(self.waiting)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except BaseException as e:
+            # Timed out, or the waiting request went away (client disconnect, socket close, shutdown)
+            if future.done():
+                # Granted just as the wait ended: hand the capacity back
+                self._release(readings)
+            else:
+                future.cancel()
+                self.waiting -= readings
+                # Waiters queued behind this one may fit now
+                self._release(0)
+            if not isinstance(e, asyncio.TimeoutError):
+                raise
+            ADMISSION_REJECTED.labels(reason="queue_timeout").inc()
+            raise AdmissionRejected("overloaded", self._retry_after(self.retry_after))
+
+    def _hold(self, readings: int):
+        self.inflight += readings
+        ADMISSION_INFLIGHT.set(self.inflight)
+
+    def release(self, ticket: Ticket):
+        self._release(ticket.readings)
+
+    def _release(self, readings: int):
+        self.inflight -= readings
+        waiters = self._waiters
+        while waiters:
+            klass, _, needed, future = waiters[0]
+            if future.cancelled():
+                heapq.heappop(waiters)
+                continue
+            if self.inflight and self.inflight + needed > self.max_inflight:
+                break
+            heapq.heappop(waiters)
+            self.waiting -= needed
+            self._hold(needed)
+            future.set_result(None)
+        ADMISSION_INFLIGHT.set(self.inflight)
+        ADMISSION_WAITING.set(self.waiting)
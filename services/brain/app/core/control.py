@@ -0,0 +1,250 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.core.metrics import LATENCY_BUCKETS
+from app.engine.batch import BatchAnalysis
+
+logger = logging.getLogger("Helixa-Control")
+
+CONTROL_AGENTS = Gauge('control_agents', 'Nerves agents connected to the control channel')
+CONTROL_ACTIONS = Counter('control_actions_total', 'Mitigation actions on the control channel', ['outcome'])
+CONTROL_DUPLICATES = Counter('control_duplicate_telemetry_total', 'Resent telemetry messages already ingested')
+CONTROL_ACK_LATENCY = Histogram(
+    'control_ack_seconds', 'Time from pushing an action to the agent acknowledging it', buckets=LATENCY_BUCKETS
+)
+
+
+class AgentSession:
+    """One connected nerves agent: its outbox, the sensors it reports and actions awaiting an ack."""
+
+    def __init__(self, agent_id: str, queue_size: int):
+        self.agent_id = agent_id
+        self.outbox: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.sensors: set = set()
+        # message id -> (message, first sent at, attempts, last sent at)
+        self.pending: Dict[str, Tuple[dict, float, int, float]] = {}
+
+    def send(self, message: dict) -> bool:
+        try:
+            self.outbox.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+
+class ControlHub:
+    """
+    Pushes mitigation actions to nerves agents over their control channel (CEZI COLA: Risk).
+    Agents that stream telemetry over the channel claim the sensors they report. When a batch
+    yields actions for those sensors, one message per (agent, target, action) is pushed right
+    away, listing every sensor that triggered it. The same action for the same target is not
+    repeated within `debounce` seconds. Messages carry an id the agent acknowledges; unacked
+    messages are resent every `ack_timeout` seconds up to `max_attempts` times, and agents drop
+    ids they have already executed.
+    Telemetry an agent resends because its receipt never arrived carries the original `seq`
+    (over the channel or in X-Control-Seq over HTTP); ingest_once() remembers the last
+    `seq_memory` ingested (agent, seq) pairs, across reconnects, plus every one still being
+    ingested, so a resend is not ingested twice.
+    """
+
+    def __init__(self, debounce: float = 30.0, ack_timeout: float = 2.0, max_attempts: int = 3,
+                 max_agents: int = 1000, queue_size: int = 256, seq_memory: int = 65536):
+        self.debounce = debounce
+        self.ack_timeout = ack_timeout
+        self.max_attempts = max_attempts
+        self.max_agents = max_agents
+        self.queue_size = queue_size
+        self.sessions: Dict[str, AgentSession] = {}
+        # sensor id -> agent id, for the sensors of connected agents
+        self.routes: Dict[str, str] = {}
+        # (agent id, target, action) -> time the action was last pushed
+        self._recent: Dict[Tuple[str, str, str], float] = {}
+        self.seq_memory = seq_memory
+        # (agent id, seq) of ingested telemetry, oldest first, capped at seq_memory
+        self._ingested: "OrderedDict[Tuple[str, str], None]" = OrderedDict()
+        # (agent id, seq) being ingested -> future resolved when the attempt ends; never capped
+        self._ingesting: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls) -> "ControlHub":
+        return cls(
+            debounce=float(os.getenv("CONTROL_DEBOUNCE_SECONDS", 30)),
+            ack_timeout=float(os.getenv("CONTROL_ACK_TIMEOUT", 2)),
+            max_attempts=int(os.getenv("CONTROL_MAX_ATTEMPTS", 3)),
+            max_agents=int(os.getenv("CONTROL_MAX_AGENTS", 1000)),
+            queue_size=int(os.getenv("CONTROL_QUEUE_SIZE", 256)),
+            seq_memory=int(os.getenv("CONTROL_SEQ_MEMORY", 65536)),
+        )
+
+    # --- Sessions ---
+
+    def connect(self, agent_id: str) -> AgentSession:
+        """Registers an agent; a reconnecting agent replaces its previous session. RuntimeError when full."""
+        previous = self.sessions.get(agent_id)
+        if previous is not None:
+            self.disconnect(previous)
+        elif len(self.sessions) >= self.max_agents:
+            raise RuntimeError(f"Control channel is at its limit of {self.max_agents} agents")
+        session = self.sessions[agent_id] = AgentSession(agent_id, self.queue_size)
+        CONTROL_AGENTS.set(len(self.sessions))
+        logger.info(f"Agent {agent_id} connected to the control channel")
+        return session
+
+    def disconnect(self, session: AgentSession):
+        if self.sessions.get(session.agent_id) is not session:
+            return
+        del self.sessions[session.agent_id]
+        for sensor_id in session.sensors:
+            if self.routes.get(sensor_id) == session.agent_id:
+                del self.routes[sensor_id]
+        # Unacked actions are lost with the connection; let the next decision through right away
+        for message, _, _, _ in session.pending.values():
+            self._recent.pop((session.agent_id, message["target"], message["action"]), None)
+        if session.pending:
+            CONTROL_ACTIONS.labels(outcome="lost").inc(len(session.pending))
+        CONTROL_AGENTS.set(len(self.sessions))
+        logger.info(f"Agent {session.agent_id} left the control channel ({len(session.pending)} actions unacknowledged)")
+
+    def claim(self, session: AgentSession, sensor_ids: Iterable[str]):
+        """Routes actions for `sensor_ids` to this agent."""
+        agent_id = session.agent_id
+        for sensor_id in set(sensor_ids) - session.sensors:
+            session.sensors.add(sensor_id)
+            self.routes[sensor_id] = agent_id
+
+    async def pump(self, session: AgentSession, send: Callable):
+        """Writes the session's outbox into the async `send` callable; one writer per connection."""
+        while True:
+            message = await session.outbox.get()
+            await send(message)
+
+    # --- Idempotent telemetry ---
+
+    @asynccontextmanager
+    async def ingest_once(self, agent_id: str, seq):
+        """
+        Yields True when the telemetry `seq` of `agent_id` is to be ingested now and False when it
+        already was. A duplicate arriving while the first attempt runs waits for its outcome; an
+        attempt that raises is forgotten so the agent's retry goes through.
+        """
+        key = (agent_id, str(seq))
+        while key not in self._ingested and key in self._ingesting:
+            await asyncio.shield(self._ingesting[key])
+        if key in self._ingested:
+            CONTROL_DUPLICATES.inc()
+            yield False
+            return
+        future = self._ingesting[key] = asyncio.get_running_loop().create_future()
+        try:
+            yield True
+            self._ingested[key] = None
+            if len(self._ingested) > self.seq_memory:
+                self._ingested.popitem(last=False)
+        finally:
+            del self._ingesting[key]
+            future.set_result(None)
+
+    # --- Actions ---
+
+    def dispatch(self, batch: BatchAnalysis, now: Optional[float] = None) -> int:
+        """Pushes the actions of an analyzed batch to the agents owning the sensors; returns messages queued."""
+        if not self.sessions:
+            return 0
+        rows = np.flatnonzero(batch.actions >= 0)
+        if not len(rows):
+            return 0
+        now = time.time() if now is None else now
+        ids = batch.columns.ids
+        messages: Dict[Tuple[str, str, str], dict] = {}
+        for i, code in zip(rows.tolist(), batch.actions[rows].tolist()):
+            agent_id = self.routes.get(ids[i])
+            if agent_id is None:
+                continue
+            action = batch.action_table[code]
+            key = (agent_id, action["target"], action["action"])
+            message = messages.get(key)
+            if message is None:
+                if now - self._recent.get(key, float("-inf")) < self.debounce:
+                    CONTROL_ACTIONS.labels(outcome="debounced").inc()
+                    continue
+                message = messages[key] = {"type": "action", "id": uuid.uuid4().hex, **action, "sensors": [], "decided_at": now}
+            if ids[i] not in message["sensors"]:
+                message["sensors"].append(ids[i])
+
+        queued = 0
+        for key, message in messages.items():
+            session = self.sessions[key[0]]
+            if session.send(message):
+                self._recent[key] = now
+                session.pending[message["id"]] = (message, now, 1, now)
+                CONTROL_ACTIONS.labels(outcome="sent").inc()
+                queued += 1
+            else:
+                CONTROL_ACTIONS.labels(outcome="dropped").inc()
+                logger.error(f"Control outbox of agent {session.agent_id} is full; dropped {message['action']}")
+        return queued
+
+    def ack(self, session: AgentSession, message_id: str, status: str = "executed"):
+        entry = session.pending.pop(message_id, None)
+        if entry is None:
+            # A duplicate ack after a resend
+            return
+        message, first_sent, _, _ = entry
+        CONTROL_ACK_LATENCY.observe(time.time() - first_sent)
+        CONTROL_ACTIONS.labels(outcome="acked" if status == "executed" else "failed").inc()
+        if status != "executed":
+            logger.error(f"Agent {session.agent_id} failed to execute {message['action']}: {status}")
+
+    def resend_due(self, now: Optional[float] = None) -> int:
+        """Resends actions unacknowledged for ack_timeout; gives up after max_attempts. Returns resends."""
+        now = time.time() if now is None else now
+        resent = 0
+        for session in list(self.sessions.values()):
+            for message_id, (message, first_sent, attempts, last_sent) in list(session.pending.items()):
+                if now - last_sent < self.ack_timeout:
+                    continue
+                if attempts >= self.max_attempts:
+                    del session.pending[message_id]
+                    CONTROL_ACTIONS.labels(outcome="expired").inc()
+                    logger.error(f"Agent {session.agent_id} never acknowledged {message['action']} after {attempts} attempts")
+                    continue
+                if session.send(message):
+                    session.pending[message_id] = (message, first_sent, attempts + 1, now)
+                    CONTROL_ACTIONS.labels(outcome="resent").inc()
+                    resent += 1
+        # Forget debounce entries that can no longer suppress anything
+        self._recent = {key: at for key, at in self._recent.items() if now - at < self.debounce}
+        return resent
+
+    # --- Background resends ---
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="helixa-control-resend")
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.ack_timeout / 2)
+            try:
+                self.resend_due()
+            except Exception as e:
+                logger.error(f"Control channel resend failed: {str(e)}")
@@ -1,8 +1,12 @@
 import os
 import logging
-from supabase import create_client, Client
+from datetime import datetime
+from typing import TYPE_CHECKING, List, Optional, Tuple
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    from supabase import Client
+
 load_dotenv()
 
 logger = logging.getLogger("Helixa-Database")
@@ -11,11 +15,14 @@ class SupabaseManager:
     """
     Manages connection and operations with Supabase.
     """
-    _client: Client = None
+    _client: "Client" = None
 
     @classmethod
-    def get_client(cls) -> Client:
+    def get_client(cls) -> "Client":
         if cls._client is None:
+            # Imported on first use: the client library costs a quarter second of start-up
+            from supabase import create_client
+
             url = os.getenv("SUPABASE_URL")
             key = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_KEY")
             if not url or not key:
@@ -37,10 +44,118 @@ class SupabaseManager:
             "unit": unit,
             "metadata": metadata
         }
-        # Note: In a production environment, we would use batch inserts or a queue
+        # Hot path goes through the write-behind pipeline (app/core/pipeline.py)
         try:
             client.table("telemetry").insert(data).execute()
         except Exception as e:
             # Log error but don't break the ingestion flow (CEZI COLA: Fail-Safe)
             import logging
             logging.getLogger("Helixa-Database").error(f"Failed to save telemetry to Supabase: {str(e)}")
+
+    @classmethod
+    def save_telemetry_batch(cls, rows: List[dict]):
+        """
+        Saves many sensor readings to the 'telemetry' table as one multi-row insert.
+        Unlike save_telemetry, errors are raised so the caller can retry or spill the batch.
+        """
+        if not rows:
+            return
+        cls.get_client().table("telemetry").insert(rows).execute()
+
+    # Per-reading columns of the normalized layout (infrastructure/telemetry_normalized.sql)
+    READING_FIELDS = ("sensor_id", "type", "unit", "value", "z_score", "is_anomaly", "status", "ttf_minutes", "is_safe", "action")
+
+    @classmethod
+    def save_telemetry_packets(cls, rows: List[dict]):
+        """
+        Saves readings in the normalized layout with one ingest_telemetry RPC. Rows share their
+        packet header by reference; they are regrouped per packet into parallel reading arrays,
+        so packet fields and reading keys are sent once. Errors are raised like save_telemetry_batch.
+        """
+        if not rows:
+            return
+        packets = {}
+        for row in rows:
+            header = row["packet"]
+            packet = packets.get(id(header))
+            if packet is None:
+                packet = packets[id(header)] = {**header, "readings": {field: [] for field in cls.READING_FIELDS}}
+            readings = packet["readings"]
+            for field in cls.READING_FIELDS:
+                readings[field].append(row[field])
+        cls.get_client().rpc("ingest_telemetry", {"packets": list(packets.values())}).execute()
+
+    @classmethod
+    def fetch_range(cls, sensor_ids: Optional[List[str]], site: Optional[str], rack: Optional[str], since: float,
+                    until: float, bucket_seconds: int, page_size: int = 10000,
+                    max_rows: int = 0) -> Tuple[list, list, list, list, list, list]:
+        """
+        Min/max/avg/count per sensor and time bucket through the telemetry_range RPC, which reads
+        the rollup tier matching `bucket_seconds` (raw readings when 0). Returns parallel
+        (sensor_ids, unix bucket starts, mins, maxs, avgs, counts) lists ordered by sensor and time.
+        Paging stops once more than `max_rows` rows (when set) have been read.
+        """
+        client = cls.get_client()
+        params = {
+            "sensor_filter": sensor_ids, "site_filter": site, "rack_filter": rack,
+            "since": datetime.fromtimestamp(since).astimezone().isoformat(),
+            "until": datetime.fromtimestamp(until).astimezone().isoformat(),
+            "bucket_seconds": bucket_seconds,
+        }
+        columns = ([], [], [], [], [], [])
+        ids, buckets, mins, maxs, avgs, counts = columns
+        offset = 0
+        while True:
+            page = client.rpc("telemetry_range", params).range(offset, offset + page_size - 1).execute().data or []
+            for row in page:
+                ids.append(row["sensor_id"])
+                buckets.append(datetime.fromisoformat(row["bucket"]).timestamp())
+                mins.append(float(row["min"]))
+                maxs.append(float(row["max"]))
+                avgs.append(float(row["avg"]))
+                counts.append(int(row["count"]))
+            if len(page) < page_size or (max_rows and len(ids) > max_rows):
+                return columns
+            offset += page_size
+
+    @classmethod
+    def fetch_replay_page(cls, since: float, until: float, after: int, limit: int, normalized: bool = False) -> List[dict]:
+        """
+        One page of stored telemetry for replays, after row (or packet) id `after` in id order:
+        legacy `telemetry` rows, or normalized packets with parallel reading arrays (telemetry_replay RPC).
+        """
+        client = cls.get_client()
+        since_iso = datetime.fromtimestamp(since).astimezone().isoformat()
+        until_iso = datetime.fromtimestamp(until).astimezone().isoformat()
+        if normalized:
+            params = {"since": since_iso, "until": until_iso, "after_id": after, "max_packets": limit}
+            return client.rpc("telemetry_replay", params).execute().data or []
+        return (
+            client.table("telemetry").select("id,created_at,sensor_id,type,value,unit,metadata")
+            .gte("created_at", since_iso).lt("created_at", until_iso).gt("id", after)
+            .order("id").limit(limit).execute().data or []
+        )
+
+    @classmethod
+    def fetch_recent_windows(cls, window_size: int, since_hours: float = 24.0, page_size: int = 10000) -> Tuple[List[str], List[float], List[float]]:
+        """
+        Loads the last `window_size` readings per sensor (newer than `since_hours`) through the
+        telemetry_recent_window RPC, which walks idx_telemetry_sensor_time instead of scanning.
+        Returns parallel (sensor_ids, unix timestamps, values) lists.
+        """
+        client = cls.get_client()
+        since = datetime.now().timestamp() - since_hours * 3600
+        ids, timestamps, values = [], [], []
+        offset = 0
+        while True:
+            page = client.rpc(
+                "telemetry_recent_window",
+                {"window_size": window_size, "since": datetime.fromtimestamp(since).astimezone().isoformat()}
+            ).range(offset, offset + page_size - 1).execute().data or []
+            for row in page:
+                ids.append(row["sensor_id"])
+                timestamps.append(datetime.fromisoformat(row["created_at"]).timestamp())
+                values.append(float(row["value"]))
+            if len(page) < page_size:
+                return ids, timestamps, values
+            offset += page_size
@@ -0,0 +1,210 @@
+import os
+import time
+import threading
+from fnmatch import fnmatch
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from app.engine.batch import BatchAnalysis
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class _Group:
+    __slots__ = ("readings", "anomalies", "mean", "min", "max", "seen")
+
+    def __init__(self):
+        self.readings = 0
+        self.anomalies = 0
+        self.mean = self.min = self.max = 0.0
+        self.seen = 0.0
+
+
+class _Reservoir:
+    """Sliding sample of recent values per (site, type), the sketch behind the quantile series."""
+    __slots__ = ("values", "head", "filled", "seen")
+
+    def __init__(self, size: int):
+        self.values = np.empty(size, dtype=np.float64)
+        self.head = 0
+        self.filled = 0
+        self.seen = 0.0
+
+    def add(self, values: np.ndarray, rng: np.random.Generator):
+        size = len(self.values)
+        # A single bulk packet may only replace a quarter of the window
+        if len(values) > size // 4:
+            values = rng.choice(values, size // 4, replace=False)
+        idx = (self.head + np.arange(len(values))) % size
+        self.values[idx] = values
+        self.head = int((self.head + len(values)) % size)
+        self.filled = min(size, self.filled + len(values))
+
+
+class FleetMetricsCollector:
+    """
+    Prometheus collector with cardinality bounded by the fleet layout instead of its sensor count
+    (CEZI COLA: Observability). Readings are aggregated per (site, rack, type) and exposed as
+    counters and last-batch mean/min/max gauges, with value quantiles per (site, type) drawn from a
+    fixed-size sliding reservoir. Per-sensor series are opt-in: an allow-list of id patterns and the
+    top-K most anomalous sensors, tracked with the bounded Space-Saving algorithm.
+    Series not updated for `stale_after` seconds are evicted, and at most `max_groups` groups are kept.
+    """
+
+    def __init__(
+        self,
+        allow_list: Optional[List[str]] = None,
+        top_k: int = 0,
+        stale_after: float = 900.0,
+        max_groups: int = 5000,
+        sketch_size: int = 1024,
+    ):
+        self.allow_list = [p for p in (allow_list or []) if p]
+        self.top_k = top_k
+        self.stale_after = stale_after
+        self.max_groups = max_groups
+        self.sketch_size = sketch_size
+        self._groups: Dict[Tuple[str, str, str], _Group] = {}
+        self._sketches: Dict[Tuple[str, str], _Reservoir] = {}
+        # sensor_id -> [type, last value, last seen]
+        self._sensors: Dict[str, list] = {}
+        # Space-Saving counters, sensor_id -> [count, error]
+        self._top: Dict[str, list] = {}
+        self._rng = np.random.default_rng()
+        self._lock = threading.Lock()
+        self._last_evict = 0.0
+
+    @classmethod
+    def from_env(cls) -> "FleetMetricsCollector":
+        return cls(
+            allow_list=os.getenv("METRICS_SENSOR_ALLOWLIST", "").split(","),
+            top_k=int(os.getenv("METRICS_TOP_K", 0)),
+            stale_after=float(os.getenv("METRICS_STALE_SECONDS", 900)),
+            max_groups=int(os.getenv("METRICS_MAX_GROUPS", 5000)),
+            sketch_size=int(os.getenv("METRICS_SKETCH_SIZE", 1024)),
+        )
+
+    def _allowed(self, sensor_id: str) -> bool:
+        return any(fnmatch(sensor_id, pattern) for pattern in self.allow_list)
+
+    def record(self, batch: BatchAnalysis):
+        """Folds one analyzed batch into the aggregates."""
+        columns = batch.columns
+        if not len(columns):
+            return
+        now = time.monotonic()
+        sites = columns.sites()
+        site = [sites[p] for p in columns.packet.tolist()]
+        types = columns.types.tolist()
+        keys = np.asarray([f"{s}\x1f{r}\x1f{t}" for s, r, t in zip(site, columns.racks(), types)])
+        unique, inverse = np.unique(keys, return_inverse=True)
+        values = columns.values
+        counts = np.bincount(inverse, minlength=len(unique))
+        sums = np.bincount(inverse, weights=values, minlength=len(unique))
+        anomalies = np.bincount(inverse, weights=batch.is_anomaly, minlength=len(unique)).astype(np.int64)
+        maxs = np.full(len(unique), -np.inf)
+        mins = np.full(len(unique), np.inf)
+        np.maximum.at(maxs, inverse, values)
+        np.minimum.at(mins, inverse, values)
+
+        with self._lock:
+            for g, key in enumerate(unique.tolist()):
+                labels = tuple(key.split("\x1f"))
+                group = self._groups.get(labels)
+                if group is None:
+                    group = self._groups[labels] = _Group()
+                group.readings += int(counts[g])
+                group.anomalies += int(anomalies[g])
+                group.mean = float(sums[g] / counts[g])
+                group.min, group.max = float(mins[g]), float(maxs[g])
+                group.seen = now
+
+            site_type = np.asarray([f"{s}\x1f{t}" for s, t in zip(site, types)])
+            for key in np.unique(site_type).tolist():
+                labels = tuple(key.split("\x1f"))
+                sketch = self._sketches.get(labels)
+                if sketch is None:
+                    sketch = self._sketches[labels] = _Reservoir(self.sketch_size)
+                sketch.add(values[site_type == key], self._rng)
+                sketch.seen = now
+
+            if self.top_k:
+                for i in np.flatnonzero(batch.is_anomaly).tolist():
+                    self._count_anomaly(columns.ids[i])
+            if self.allow_list or self._top:
+                for sensor_id, sensor_type, value in zip(columns.ids, types, values.tolist()):
+                    if sensor_id in self._top or (self.allow_list and self._allowed(sensor_id)):
+                        self._sensors[sensor_id] = [sensor_type, value, now]
+
+            if now - self._last_evict > min(60.0, self.stale_after) or len(self._groups) > self.max_groups:
+                self._evict(now)
+
+    def _count_anomaly(self, sensor_id: str):
+        """Space-Saving update: keeps at most 4*K candidates whose counts over-estimate by `error`."""
+        entry = self._top.get(sensor_id)
+        if entry is not None:
+            entry[0] += 1
+        elif len(self._top) < 4 * self.top_k:
+            self._top[sensor_id] = [1, 0]
+        else:
+            victim = min(self._top, key=lambda k: self._top[k][0])
+            floor = self._top.pop(victim)[0]
+            self._sensors.pop(victim, None)
+            self._top[sensor_id] = [floor + 1, floor]
+
+    def _evict(self, now: float):
+        self._last_evict = now
+        cutoff = now - self.stale_after
+        for store in (self._groups, self._sketches):
+            for key in [k for k, v in store.items() if v.seen < cutoff]:
+                del store[key]
+        for sensor_id in [k for k, v in self._sensors.items() if v[2] < cutoff]:
+            del self._sensors[sensor_id]
+            self._top.pop(sensor_id, None)
+        if len(self._groups) > self.max_groups:
+            overflow = sorted(self._groups, key=lambda k: self._groups[k].seen)[:len(self._groups) - self.max_groups]
+            for key in overflow:
+                del self._groups[key]
+
+    def describe(self):
+        # Series are built at scrape time; an empty describe keeps registration from calling collect()
+        return []
+
+    def collect(self):
+        labels = ["site", "rack", "type"]
+        readings = CounterMetricFamily('sensor_group_readings', 'Readings ingested per site, rack and type', labels=labels)
+        anomalies = CounterMetricFamily('anomaly_detection', 'Anomalies detected per site, rack and type', labels=labels)
+        mean = GaugeMetricFamily('sensor_group_value_mean', 'Mean reading of the latest batch per group', labels=labels)
+        low = GaugeMetricFamily('sensor_group_value_min', 'Lowest reading of the latest batch per group', labels=labels)
+        high = GaugeMetricFamily('sensor_group_value_max', 'Highest reading of the latest batch per group', labels=labels)
+        quantiles = GaugeMetricFamily(
+            'sensor_value_quantile', 'Recent reading quantiles per site and type', labels=["site", "type", "quantile"]
+        )
+        sensors = GaugeMetricFamily('sensor_reading', 'Current reading of opted-in sensors', labels=["sensor_id", "type"])
+        top = GaugeMetricFamily(
+            'sensor_anomaly_top', 'Estimated anomaly count of the top-K most anomalous sensors', labels=["sensor_id"]
+        )
+
+        with self._lock:
+            self._evict(time.monotonic())
+            for key, group in self._groups.items():
+                values = list(key)
+                readings.add_metric(values, group.readings)
+                anomalies.add_metric(values, group.anomalies)
+                mean.add_metric(values, group.mean)
+                low.add_metric(values, group.min)
+                high.add_metric(values, group.max)
+            for (site, sensor_type), sketch in self._sketches.items():
+                if sketch.filled:
+                    estimates = np.quantile(sketch.values[:sketch.filled], QUANTILES)
+                    for q, estimate in zip(QUANTILES, estimates.tolist()):
+                        quantiles.add_metric([site, sensor_type, str(q)], estimate)
+            for sensor_id, (sensor_type, value, _) in self._sensors.items():
+                sensors.add_metric([sensor_id, sensor_type], value)
+            leaders = sorted(self._top.items(), key=lambda item: item[1][0], reverse=True)[:self.top_k]
+            for sensor_id, (count, _) in leaders:
+                top.add_metric([sensor_id], count)
+
+        yield from (readings, anomalies, mean, low, high, quantiles, sensors, top)
@@ -0,0 +1,228 @@
+import os
+import json
+import time
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.engine.batch import TelemetryColumns
+
+logger = logging.getLogger("Helixa-Safety")
+
+BOUNDS = ("min", "max")
+
+
+class LimitTable:
+    """
+    Safety limits compiled once into NumPy tables (CEZI COLA: Risk).
+    Base limits are keyed by (device class, sensor type); device-type strings are classified
+    once and memoized. Overrides narrow limits per site, per rack ("SITE/RACK") and per sensor,
+    most specific first: sensor > rack > site > device class. An override may set only one bound.
+
+    Config file (JSON), every section optional:
+        {
+          "device_classes": {"hardware": ["notebook", "pc", "laptop"]},
+          "limits": {"datacenter": {"temperature": {"min": 15, "max": 32}}, ...},
+          "sites": {"DC-ALPHA-01": {"temperature": {"max": 27}}},
+          "racks": {"DC-ALPHA-01/RACK-012": {"temperature": {"max": 25}}},
+          "sensors": {"S00-RACK-001-TEMP-00": {"max": 30}}
+        }
+    """
+
+    DEFAULT_CLASS = "datacenter"
+
+    def __init__(self, limits: Dict[str, Dict[str, dict]], device_classes: Optional[Dict[str, List[str]]] = None,
+                 sites: Optional[Dict[str, Dict[str, dict]]] = None, racks: Optional[Dict[str, Dict[str, dict]]] = None,
+                 sensors: Optional[Dict[str, dict]] = None, source: str = "defaults"):
+        self.source = source
+        self.classes = [self.DEFAULT_CLASS] + sorted(c for c in limits if c != self.DEFAULT_CLASS)
+        self.class_index = {name: i for i, name in enumerate(self.classes)}
+        self.device_classes = {c: [k.lower() for k in keys] for c, keys in (device_classes or {}).items()}
+        for name in self.device_classes:
+            if name not in self.class_index:
+                raise ValueError(f"device class '{name}' has no limits")
+
+        self.types = sorted({t for section in limits.values() for t in section})
+        self.type_index = {name: i for i, name in enumerate(self.types)}
+        self.base = np.full((len(self.classes), len(self.types), 2), np.nan)
+        for name, section in limits.items():
+            for sensor_type, bounds in section.items():
+                self.base[self.class_index[name], self.type_index[sensor_type]] = self._bounds(bounds)
+
+        # Scalar path: ready-made dicts per (device class, sensor type)
+        self._limits = [
+            {t: {b: float(v) for b, v in zip(BOUNDS, self.base[c, i]) if not np.isnan(v)} for t, i in self.type_index.items()}
+            for c in range(len(self.classes))
+        ]
+
+        self.sites, self.site_table = self._override_table(sites or {})
+        self.racks, self.rack_table = self._override_table(racks or {})
+        self.sensors = {sensor_id: self._bounds(bounds) for sensor_id, bounds in (sensors or {}).items()}
+        self._device_cache: Dict[str, int] = {}
+
+    @staticmethod
+    def _bounds(bounds: dict) -> Tuple[float, float]:
+        unknown = set(bounds) - set(BOUNDS)
+        if unknown:
+            raise ValueError(f"unknown limit keys {sorted(unknown)}")
+        return tuple(float(bounds[b]) if bounds.get(b) is not None else np.nan for b in BOUNDS)
+
+    def _override_table(self, overrides: Dict[str, Dict[str, dict]]) -> Tuple[Dict[str, int], np.ndarray]:
+        """Row per override key, NaN where the key does not override that type/bound."""
+        index = {key: i for i, key in enumerate(overrides)}
+        table = np.full((len(index), len(self.types), 2), np.nan)
+        for key, section in overrides.items():
+            for sensor_type, bounds in section.items():
+                if sensor_type not in self.type_index:
+                    raise ValueError(f"override '{key}' references unknown sensor type '{sensor_type}'")
+                table[index[key], self.type_index[sensor_type]] = self._bounds(bounds)
+        return index, table
+
+    @classmethod
+    def from_config(cls, config: dict, defaults: Dict[str, Dict[str, dict]], source: str = "config") -> "LimitTable":
+        limits = {name: dict(section) for name, section in defaults.items()}
+        for name, section in config.get("limits", {}).items():
+            limits.setdefault(name, {}).update(section)
+        return cls(
+            limits,
+            device_classes=config.get("device_classes", {"hardware": ["notebook", "pc", "laptop"]}),
+            sites=config.get("sites"),
+            racks=config.get("racks"),
+            sensors=config.get("sensors"),
+            source=source,
+        )
+
+    def device_class(self, device_type: str) -> int:
+        cls_index = self._device_cache.get(device_type)
+        if cls_index is None:
+            dt = device_type.lower()
+            cls_index = next(
+                (self.class_index[name] for name, keys in self.device_classes.items() if any(k in dt for k in keys)),
+                0,
+            )
+            if len(self._device_cache) < 4096:
+                self._device_cache[device_type] = cls_index
+        return cls_index
+
+    def lookup(self, sensor_type: str, device_type: str = "datacenter") -> dict:
+        """Base limits of one (device class, sensor type) as a {"min", "max"} dict; {} when undefined."""
+        return self._limits[self.device_class(device_type)].get(sensor_type, {})
+
+    def resolve(self, sensor_type: str, device_type: str = "datacenter", site: Optional[str] = None,
+                rack: Optional[str] = None, sensor_id: Optional[str] = None) -> dict:
+        """
+        Limits of one reading as a {"min", "max"} dict, with the site, rack and sensor overrides
+        that apply to it: the reading goes through bounds() so both paths always agree.
+        """
+        if not (self.sites or self.racks or self.sensors):
+            return self.lookup(sensor_type, device_type)
+        meta = {"device_type": device_type}
+        if site is not None:
+            meta["site"] = site
+        if rack is not None:
+            meta["rack"] = rack
+        reading = TelemetryColumns(
+            [sensor_id or ""], np.array([sensor_type]), np.zeros(1), [""], np.zeros(1, dtype=np.int64), [0.0], [meta]
+        )
+        low, high = self.bounds(reading)
+        return {key: float(bound[0]) for key, bound in zip(BOUNDS, (low, high)) if not np.isnan(bound[0])}
+
+    def bounds(self, columns) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorized (min, max) per reading of a TelemetryColumns batch; NaN marks readings without limits.
+        Rack and sensor overrides are only resolved when configured.
+        """
+        count = len(columns)
+        classes = np.fromiter((self.device_class(dt) for dt in columns.device_types()), dtype=np.int64,
+                              count=columns.packet_count)
+        kinds, inverse = np.unique(columns.types, return_inverse=True)
+        codes = np.array([self.type_index.get(str(k), -1) for k in kinds], dtype=np.int64)[inverse.reshape(-1)]
+        known = codes >= 0
+        bounds = np.full((count, 2), np.nan)
+        bounds[known] = self.base[classes[columns.packet[known]], codes[known]]
+
+        sites = columns.sites()
+        if self.sites:
+            site_rows = np.array([self.sites.get(site, -1) for site in sites], dtype=np.int64)[columns.packet]
+            self._apply(bounds, self.site_table, site_rows, codes, known)
+        if self.racks:
+            racks = columns.racks()
+            rack_rows = np.fromiter(
+                (self.racks.get(f"{sites[p]}/{rack}", -1) for p, rack in zip(columns.packet.tolist(), racks)),
+                dtype=np.int64, count=count,
+            )
+            self._apply(bounds, self.rack_table, rack_rows, codes, known)
+        if self.sensors:
+            for i, sensor_id in enumerate(columns.ids):
+                override = self.sensors.get(sensor_id)
+                if override is not None:
+                    bounds[i] = np.where(np.isnan(override), bounds[i], override)
+        return bounds[:, 0], bounds[:, 1]
+
+    @staticmethod
+    def _apply(bounds: np.ndarray, table: np.ndarray, rows: np.ndarray, codes: np.ndarray, known: np.ndarray):
+        hit = known & (rows >= 0)
+        if hit.any():
+            override = table[rows[hit], codes[hit]]
+            bounds[hit] = np.where(np.isnan(override), bounds[hit], override)
+
+
+class LimitRegistry:
+    """
+    Holds the active LimitTable and hot-reloads it when the config file changes.
+    The file's mtime is checked at most every `check_interval` seconds; a broken
+    config is logged and the previous table stays in force.
+    """
+
+    def __init__(self, defaults: Dict[str, Dict[str, dict]], path: Optional[str] = None, check_interval: float = 5.0):
+        self.defaults = defaults
+        self.path = path
+        self.check_interval = check_interval
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self._table = LimitTable.from_config({}, defaults, source="defaults")
+        self.reload()
+
+    @classmethod
+    def from_env(cls, defaults: Dict[str, Dict[str, dict]]) -> "LimitRegistry":
+        return cls(
+            defaults,
+            path=os.getenv("SAFETY_LIMITS_FILE") or None,
+            check_interval=float(os.getenv("SAFETY_LIMITS_RELOAD_INTERVAL", 5)),
+        )
+
+    def reload(self) -> bool:
+        """Recompiles the table if the config file changed; returns True when a new table was installed."""
+        if not self.path:
+            return False
+        with self._lock:
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except FileNotFoundError:
+                if self._mtime is not None:
+                    logger.error(f"Safety limits file {self.path} disappeared; keeping the last loaded limits")
+                    self._mtime = None
+                return False
+            if mtime == self._mtime:
+                return False
+            self._mtime = mtime
+            try:
+                with open(self.path) as f:
+                    table = LimitTable.from_config(json.load(f), self.defaults, source=self.path)
+            except (OSError, ValueError, TypeError, AttributeError) as e:
+                logger.error(f"Invalid safety limits file {self.path}: {str(e)}; keeping the previous limits")
+                return False
+            self._table = table
+            logger.info(f"Safety limits loaded from {self.path}")
+            return True
+
+    @property
+    def table(self) -> LimitTable:
+        now = time.monotonic()
+        if self.path and now >= self._next_check:
+            self._next_check = now + self.check_interval
+            self.reload()
+        return self._table
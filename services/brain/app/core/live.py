@@ -0,0 +1,173 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from prometheus_client import Counter, Gauge
+
+from app.engine.batch import BatchAnalysis
+
+logger = logging.getLogger("Helixa-Live")
+
+LIVE_SUBSCRIBERS = Gauge('telemetry_live_subscribers', 'Connected live stream subscribers')
+LIVE_FRAMES = Counter('telemetry_live_frames_total', 'Frames sent to live stream subscribers')
+LIVE_DROPPED = Counter('telemetry_live_dropped_total', 'Live stream subscribers disconnected by the hub', ['reason'])
+
+# Per-reading fields of a frame, sent as parallel arrays
+FRAME_FIELDS = ("sensor_id", "type", "value", "unit", "site", "rack", "z_score", "is_anomaly", "status", "observed_at")
+
+
+class Subscription:
+    """
+    One live stream consumer. Updates are conflated per sensor: between two frames only the
+    latest reading of each sensor is kept, so a slow consumer costs at most one entry per
+    matching sensor instead of a growing queue.
+    """
+
+    def __init__(self, site: Optional[str] = None, rack: Optional[str] = None, sensor_type: Optional[str] = None,
+                 anomalies_only: bool = False, fps: float = 2.0, max_sensors: int = 5000):
+        self.site = site
+        self.rack = rack
+        self.sensor_type = sensor_type
+        self.anomalies_only = anomalies_only
+        self.interval = 1.0 / fps
+        self.max_sensors = max_sensors
+        self.pending: Dict[str, tuple] = {}
+        self.overflow = 0
+        self.closed = False
+        self._ready = asyncio.Event()
+
+    @property
+    def key(self) -> Tuple:
+        """Subscribers with equal keys share one filter evaluation per batch."""
+        return self.site, self.rack, self.sensor_type, self.anomalies_only
+
+    def offer(self, ids: List[str], rows: List[tuple]):
+        pending = self.pending
+        if len(pending) + len(ids) <= self.max_sensors:
+            pending.update(zip(ids, rows))
+        else:
+            for sensor_id, row in zip(ids, rows):
+                if sensor_id in pending or len(pending) < self.max_sensors:
+                    pending[sensor_id] = row
+                else:
+                    self.overflow += 1
+        self._ready.set()
+
+    async def next_frame(self) -> dict:
+        """Waits for updates, then hands out everything conflated since the previous frame."""
+        await self._ready.wait()
+        self._ready.clear()
+        pending, self.pending = self.pending, {}
+        frame = {"t": time.time(), "overflow": self.overflow}
+        self.overflow = 0
+        columns = list(zip(*pending.values())) if pending else [()] * (len(FRAME_FIELDS) - 1)
+        frame["sensor_id"] = list(pending)
+        frame.update(zip(FRAME_FIELDS[1:], (list(c) for c in columns)))
+        return frame
+
+
+class LiveHub:
+    """
+    Fan-out of analyzed readings straight from the ingest path to WebSocket/SSE subscribers
+    (CEZI COLA: Observability). Filters are evaluated once per batch for every distinct
+    (site, rack, type, anomalies-only) combination; each subscriber receives coalesced frames
+    at its own rate, capped at `max_fps`. Consumers that cannot take a frame within
+    `send_timeout` are disconnected.
+    """
+
+    def __init__(self, max_subscribers: int = 200, max_fps: float = 10.0, default_fps: float = 2.0,
+                 send_timeout: float = 5.0, max_sensors: int = 5000):
+        self.max_subscribers = max_subscribers
+        self.max_fps = max_fps
+        self.default_fps = default_fps
+        self.send_timeout = send_timeout
+        self.max_sensors = max_sensors
+        self.subscribers: List[Subscription] = []
+
+    @classmethod
+    def from_env(cls) -> "LiveHub":
+        return cls(
+            max_subscribers=int(os.getenv("LIVE_MAX_SUBSCRIBERS", 200)),
+            max_fps=float(os.getenv("LIVE_MAX_FPS", 10)),
+            default_fps=float(os.getenv("LIVE_DEFAULT_FPS", 2)),
+            send_timeout=float(os.getenv("LIVE_SEND_TIMEOUT", 5)),
+            max_sensors=int(os.getenv("LIVE_MAX_SENSORS", 5000)),
+        )
+
+    def subscribe(self, site: Optional[str] = None, rack: Optional[str] = None, sensor_type: Optional[str] = None,
+                  anomalies_only: bool = False, fps: Optional[float] = None) -> Subscription:
+        """Registers a subscriber; raises RuntimeError when the hub is full."""
+        if len(self.subscribers) >= self.max_subscribers:
+            LIVE_DROPPED.labels(reason="full").inc()
+            raise RuntimeError(f"Live stream is at its limit of {self.max_subscribers} subscribers")
+        fps = min(self.max_fps, fps or self.default_fps)
+        sub = Subscription(site, rack, sensor_type, anomalies_only, fps, self.max_sensors)
+        self.subscribers.append(sub)
+        LIVE_SUBSCRIBERS.set(len(self.subscribers))
+        return sub
+
+    def unsubscribe(self, sub: Subscription, reason: Optional[str] = None):
+        sub.closed = True
+        if sub in self.subscribers:
+            self.subscribers.remove(sub)
+            LIVE_SUBSCRIBERS.set(len(self.subscribers))
+            if reason:
+                LIVE_DROPPED.labels(reason=reason).inc()
+
+    def publish(self, batch: BatchAnalysis):
+        """Offers an analyzed batch to every subscriber; free when nobody is listening."""
+        if not self.subscribers or not len(batch.columns):
+            return
+        columns = batch.columns
+        packet = columns.packet
+        sites = np.asarray(columns.sites(), dtype=object)[packet]
+        racks = np.asarray(columns.racks(), dtype=object)
+        timestamps = np.asarray(columns.timestamps, dtype=np.float64)[packet]
+        statuses = np.asarray(BatchAnalysis.STATUSES)[batch.status]
+
+        selections = {}
+        for sub in self.subscribers:
+            selection = selections.get(sub.key)
+            if selection is None:
+                mask = np.ones(len(columns), dtype=bool)
+                if sub.site is not None:
+                    mask &= sites == sub.site
+                if sub.rack is not None:
+                    mask &= racks == sub.rack
+                if sub.sensor_type is not None:
+                    mask &= columns.types == sub.sensor_type
+                if sub.anomalies_only:
+                    mask &= batch.is_anomaly
+                rows = np.flatnonzero(mask)
+                selection = selections[sub.key] = (
+                    [columns.ids[i] for i in rows.tolist()],
+                    list(zip(
+                        columns.types[rows].tolist(), columns.values[rows].tolist(), [columns.units[i] for i in rows.tolist()],
+                        sites[rows].tolist(), racks[rows].tolist(), np.round(batch.z_score[rows], 2).tolist(),
+                        batch.is_anomaly[rows].tolist(), statuses[rows].tolist(), timestamps[rows].tolist(),
+                    )),
+                )
+            if selection[0]:
+                sub.offer(*selection)
+
+    async def stream(self, sub: Subscription, send):
+        """
+        Pumps frames of `sub` into the async `send` callable at the subscriber's rate until the
+        consumer goes away or stalls for longer than send_timeout.
+        """
+        try:
+            while not sub.closed:
+                frame = await sub.next_frame()
+                try:
+                    await asyncio.wait_for(send(frame), self.send_timeout)
+                except asyncio.TimeoutError:
+                    logger.warning(f"Dropping live subscriber that stalled for more than {self.send_timeout:g}s")
+                    self.unsubscribe(sub, reason="slow")
+                    return
+                LIVE_FRAMES.inc()
+                await asyncio.sleep(sub.interval)
+        finally:
+            self.unsubscribe(sub)
@@ -0,0 +1,51 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+# Hot-path latency instrumentation (CEZI COLA: Observability)
+# Buckets span 10us..10s: per-stage work on small packets sits in the microseconds,
+# while bulk packets and slow database round trips reach into seconds.
+LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+INGEST_LATENCY = Histogram(
+    'telemetry_ingest_seconds', 'End-to-end ingestion request latency', ['endpoint'], buckets=LATENCY_BUCKETS
+)
+STAGE_LATENCY = Histogram(
+    'telemetry_stage_seconds', 'Latency of each ingestion stage', ['stage'], buckets=LATENCY_BUCKETS
+)
+PACKET_READINGS = Histogram(
+    'telemetry_packet_readings', 'Readings per ingestion request',
+    buckets=(1, 5, 10, 50, 100, 500, 1000, 5000, 10000, 50000)
+)
+
+PERSIST_QUEUE_DEPTH = Gauge('telemetry_persist_queue_depth', 'Rows waiting in the write-behind queue')
+PERSIST_SPILL_DEPTH = Gauge('telemetry_persist_spill_depth', 'Rows parked in the spill buffer while the database is failing')
+PERSIST_BATCH_ROWS = Histogram(
+    'telemetry_persist_batch_rows', 'Rows per multi-row insert',
+    buckets=(1, 10, 50, 100, 250, 500, 1000, 2500, 5000)
+)
+PERSIST_DEAD_LETTERED = Counter(
+    'telemetry_persist_dead_lettered_total', 'Rows set aside instead of persisted', ['reason']
+)
+DB_ROUND_TRIP = Histogram(
+    'telemetry_db_round_trip_seconds', 'Database insert round-trip time', ['outcome'], buckets=LATENCY_BUCKETS
+)
+
+QUERY_LATENCY = Histogram(
+    'telemetry_query_seconds', 'Range query latency up to encoding', ['format'], buckets=LATENCY_BUCKETS
+)
+QUERY_ROWS = Histogram(
+    'telemetry_query_storage_rows', 'Rows read from storage per range query',
+    buckets=(10, 100, 1000, 10000, 50000, 100000, 500000)
+)
+
+# Readings whose event time was reordered, too late for the history window, or clamped to arrival time
+EVENT_TIME_OUTCOMES = Counter('telemetry_event_time_readings_total', 'Readings with out-of-order or invalid event times', ['outcome'])
+EVENT_TIME_READINGS = {outcome: EVENT_TIME_OUTCOMES.labels(outcome=outcome) for outcome in ("reordered", "late", "clamped")}
+
+# Pre-bound children: label lookups are not free on the hot path
+STAGES = {
+    stage: STAGE_LATENCY.labels(stage=stage)
+    for stage in ("decode", "validation", "analysis", "multivariate", "mitigation", "control", "report", "metrics", "live", "persist_enqueue")
+}
@@ -0,0 +1,279 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.core.storage import StorageBackend, SupabaseBackend, append_dead_letter, create_backend
+from app.core.metrics import DB_ROUND_TRIP, PERSIST_BATCH_ROWS
+
+logger = logging.getLogger("Helixa-Pipeline")
+
+
+class TelemetryWriter:
+    """
+    Write-behind persistence stage for telemetry rows.
+    Readings are queued in memory and a background worker flushes them as
+    multi-row inserts, either when a batch fills up or when the flush interval expires.
+    Transient failures park rows in a spill buffer retried with backoff. Rows the backend
+    rejects for good (StorageBackend.permanent) are isolated by bisecting the failed chunk and
+    set aside in the dead-letter file, and a spill head that keeps failing is set aside after
+    `max_attempts`, so nothing can block the rows behind it forever.
+    (CEZI COLA: Persistence & Fail-Safe)
+    """
+
+    # Storage layouts: "legacy" rows with a JSONB metadata blob, or "normalized" packet/reading tables
+    SCHEMAS = ("legacy", "normalized")
+
+    def __init__(
+        self,
+        sink: Optional[Callable[[List[dict]], None]] = None,
+        schema: str = "legacy",
+        backend: Optional[StorageBackend] = None,
+        max_queue: int = 50000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        spill_limit: int = 200000,
+        enqueue_timeout: float = 2.0,
+        max_backoff: float = 30.0,
+        max_attempts: int = 50,
+        dead_letter_path: Optional[str] = None,
+    ):
+        if schema not in self.SCHEMAS:
+            raise ValueError(f"Unknown telemetry schema '{schema}', expected one of {self.SCHEMAS}")
+        self.schema = schema
+        self.backend = backend or SupabaseBackend(schema)
+        # The sink is a blocking callable; it always runs in a worker thread
+        self.sink = sink or self.backend.write
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        # NDJSON of rows that could not be persisted; None only counts and logs them
+        self.dead_letter_path = dead_letter_path
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        # Rows that failed to persist wait here until the database is back
+        self._spill: deque = deque(maxlen=spill_limit)
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        # Failed attempts at the current head of the spill buffer
+        self._head_attempts = 0
+
+        self.flushed_rows = 0
+        self.dropped_rows = 0
+        self.dead_lettered_rows = 0
+        self.failed_flushes = 0
+
+    @classmethod
+    def from_env(cls) -> "TelemetryWriter":
+        schema = os.getenv("TELEMETRY_SCHEMA", "legacy")
+        return cls(
+            schema=schema,
+            backend=create_backend(schema),
+            max_queue=int(os.getenv("PERSIST_QUEUE_SIZE", 50000)),
+            batch_size=int(os.getenv("PERSIST_BATCH_SIZE", 500)),
+            flush_interval=float(os.getenv("PERSIST_FLUSH_INTERVAL", 1.0)),
+            spill_limit=int(os.getenv("PERSIST_SPILL_LIMIT", 200000)),
+            max_attempts=int(os.getenv("PERSIST_MAX_ATTEMPTS", 50)),
+            dead_letter_path=os.getenv("PERSIST_DEAD_LETTER_PATH", "./state/dead_letter.ndjson") or None,
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def spill_depth(self) -> int:
+        return len(self._spill)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queue_depth": self.queue_depth(),
+            "spill_depth": self.spill_depth(),
+            "flushed_rows": self.flushed_rows,
+            "dropped_rows": self.dropped_rows,
+            "dead_lettered_rows": self.dead_lettered_rows,
+            "failed_flushes": self.failed_flushes,
+        }
+
+    async def start(self):
+        """Starts the background flush worker on the running event loop."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._stopping = False
+        self._task = asyncio.create_task(self._run(), name="helixa-telemetry-writer")
+        logger.info(f"Telemetry writer started (batch={self.batch_size}, interval={self.flush_interval}s)")
+
+    async def stop(self, timeout: float = 10.0):
+        """Flushes everything still queued or spilled, then stops the worker."""
+        if not self.running:
+            return
+        self._stopping = True
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            logger.error("Telemetry writer did not drain before shutdown timeout")
+
+        lost = self.queue_depth() + len(self._spill)
+        if lost:
+            self.dropped_rows += lost
+            logger.error(f"Telemetry writer stopped with {lost} unpersisted rows")
+        logger.info(f"Telemetry writer stopped. Stats: {self.stats()}")
+
+    async def enqueue(self, rows: List[dict]) -> int:
+        """
+        Queues rows for persistence and returns how many were accepted.
+        When the queue is full the caller waits (backpressure) up to enqueue_timeout,
+        after which the remaining rows are dropped rather than stalling ingestion.
+        """
+        if not self.running:
+            await self.start()
+
+        accepted = 0
+        for row in rows:
+            try:
+                self._queue.put_nowait(row)
+            except asyncio.QueueFull:
+                try:
+                    await asyncio.wait_for(self._queue.put(row), self.enqueue_timeout)
+                except asyncio.TimeoutError:
+                    dropped = len(rows) - accepted
+                    self.dropped_rows += dropped
+                    logger.error(f"Persistence queue saturated, dropped {dropped} rows")
+                    break
+            accepted += 1
+        return accepted
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            if batch:
+                await self._flush(batch)
+            elif self._spill and not self._stopping:
+                # Idle cycle: keep retrying the spill buffer once the backoff expires
+                await self._flush(batch)
+            elif self._stopping:
+                break
+
+        # Final attempt for anything parked in the spill buffer (flush-on-shutdown)
+        if self._spill:
+            self._retry_at = 0.0
+            await self._flush([])
+
+    async def _collect(self) -> List[dict]:
+        """Gathers up to batch_size rows, waiting at most flush_interval for stragglers."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        batch: List[dict] = []
+
+        while len(batch) < self.batch_size:
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            if len(batch) >= self.batch_size or self._stopping:
+                break
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _flush(self, batch: List[dict]):
+        loop = asyncio.get_running_loop()
+
+        # While the database is backing off, park new rows in the spill buffer
+        if self._spill or loop.time() < self._retry_at:
+            self._spill_rows(batch)
+            if loop.time() >= self._retry_at:
+                await self._drain_spill()
+            return
+
+        unwritten, error = await self._persist(batch)
+        if error is None:
+            self._backoff = 0.0
+        else:
+            self._on_failure(error)
+            self._spill_rows(unwritten)
+
+    async def _drain_spill(self) -> bool:
+        """Replays spilled rows oldest-first; returns False if the database is still failing."""
+        while self._spill:
+            chunk = [self._spill.popleft() for _ in range(min(self.batch_size, len(self._spill)))]
+            unwritten, error = await self._persist(chunk)
+            if error is not None:
+                self._head_attempts += 1
+                if self._head_attempts >= self.max_attempts:
+                    # Never let one chunk hold the spill buffer hostage
+                    self._dead_letter(unwritten, error, "retries_exhausted")
+                    self._head_attempts = 0
+                else:
+                    self._spill.extendleft(reversed(unwritten))
+                self._on_failure(error)
+                return False
+            self._head_attempts = 0
+        self._backoff = 0.0
+        logger.info("Spill buffer drained, persistence recovered")
+        return True
+
+    async def _persist(self, rows: List[dict]) -> Tuple[List[dict], Optional[Exception]]:
+        """
+        Writes rows, bisecting chunks the backend rejects for good until the offending rows are
+        isolated and dead-lettered. Stops at the first transient failure and returns the rows
+        not written yet (in order) with that error; ([], None) when everything was handled.
+        """
+        pieces = [rows]
+        while pieces:
+            piece = pieces.pop()
+            try:
+                await self._write(piece)
+                self.flushed_rows += len(piece)
+            except Exception as e:
+                if not self.backend.permanent(e):
+                    return [row for part in (piece, *reversed(pieces)) for row in part], e
+                if len(piece) == 1:
+                    self._dead_letter(piece, e, "rejected")
+                else:
+                    middle = len(piece) // 2
+                    pieces += [piece[middle:], piece[:middle]]
+        return [], None
+
+    def _dead_letter(self, rows: List[dict], error: Exception, reason: str):
+        self.dead_lettered_rows += len(rows)
+        append_dead_letter(self.dead_letter_path, rows, error, reason)
+
+    async def _write(self, rows: List[dict]):
+        """Runs the blocking sink in a worker thread and records the database round trip."""
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(self.sink, rows)
+        except Exception:
+            DB_ROUND_TRIP.labels(outcome="error").observe(time.perf_counter() - started)
+            raise
+        DB_ROUND_TRIP.labels(outcome="ok").observe(time.perf_counter() - started)
+        PERSIST_BATCH_ROWS.observe(len(rows))
+
+    def _spill_rows(self, rows: List[dict]):
+        overflow = len(self._spill) + len(rows) - self._spill.maxlen
+        if overflow > 0:
+            self.dropped_rows += overflow
+            logger.error(f"Spill buffer full, discarding {overflow} oldest rows")
+        self._spill.extend(rows)
+
+    def _on_failure(self, error: Exception):
+        self.failed_flushes += 1
+        self._backoff = min(self.max_backoff, max(0.5, self._backoff * 2))
+        self._retry_at = asyncio.get_running_loop().time() + self._backoff
+        logger.error(f"Telemetry flush failed, retrying in {self._backoff:.1f}s: {str(error)}")
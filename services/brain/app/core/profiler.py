@@ -0,0 +1,58 @@
+import os
+import sys
+import time
+import threading
+from collections import Counter
+from typing import Optional
+
+
+class SamplingProfiler:
+    """
+    Wall-clock stack sampler for the running brain (CEZI COLA: Observability).
+    A daemon thread snapshots every thread's stack through sys._current_frames()
+    at a fixed rate and folds them into collapsed stacks ("frame;frame;frame count"),
+    the input format of flamegraph.pl and speedscope. Only one capture runs at a time.
+    """
+
+    def __init__(self, max_depth: int = 128):
+        self.max_depth = max_depth
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["SamplingProfiler"]:
+        """Returns a profiler when ENABLE_PROFILER is set, otherwise None."""
+        if os.getenv("ENABLE_PROFILER", "false").lower() not in ("1", "true", "yes"):
+            return None
+        return cls()
+
+    @property
+    def busy(self) -> bool:
+        return self._lock.locked()
+
+    def _stack(self, frame) -> str:
+        parts = []
+        while frame is not None and len(parts) < self.max_depth:
+            code = frame.f_code
+            parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ";".join(reversed(parts))
+
+    def capture(self, seconds: float, hz: int = 100) -> str:
+        """Samples all threads for `seconds` at `hz` and returns collapsed stacks. Blocks the caller."""
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already being captured")
+        try:
+            stacks: Counter = Counter()
+            names = {t.ident: t.name for t in threading.enumerate()}
+            me = threading.get_ident()
+            interval = 1.0 / hz
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                for ident, frame in sys._current_frames().items():
+                    if ident == me:
+                        continue
+                    stacks[f"{names.get(ident, ident)};{self._stack(frame)}"] += 1
+                time.sleep(interval)
+            return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()) + "\n"
+        finally:
+            self._lock.release()
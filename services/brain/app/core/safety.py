@@ -1,5 +1,7 @@
 import logging
-from typing import Optional
+import numpy as np
+from typing import Optional, Tuple
+from app.core.limits import LimitRegistry, LimitTable
 
 logger = logging.getLogger("Helixa-Safety")
 
@@ -9,7 +11,7 @@ class SafetyController:
     It ensures that no action or metric violates physical safety boundaries.
     """
     
-    # Physical limits adjusted by device type
+    # Physical limits adjusted by device type; built-in defaults of the compiled LimitTable
     DEFAULT_LIMITS = {
         "temperature": {"min": 15.0, "max": 32.0},  # Celsius (Data Center)
         "power": {"min": 0.0, "max": 500.0},       # kW per PDU
@@ -23,31 +25,41 @@ class SafetyController:
     }
 
     @classmethod
-    def get_limits(cls, sensor_type: str, device_type: str = "datacenter") -> dict:
-        """Returns the safety limits for a specific sensor and device type."""
-        dt = device_type.lower()
-        base_limits = cls.HARDWARE_LIMITS if any(k in dt for k in ["notebook", "pc", "laptop"]) else cls.DEFAULT_LIMITS
-        return base_limits.get(sensor_type, {})
+    def limit_table(cls) -> LimitTable:
+        """The active compiled limits, hot-reloaded from SAFETY_LIMITS_FILE."""
+        return LIMITS.table
 
     @classmethod
-    def validate_sensor_reading(cls, sensor_type: str, value: float, device_type: str = "datacenter") -> bool:
+    def get_limits(cls, sensor_type: str, device_type: str = "datacenter", site: Optional[str] = None,
+                   rack: Optional[str] = None, sensor_id: Optional[str] = None) -> dict:
+        """
+        Returns the safety limits for a specific sensor and device type, including the site, rack
+        and sensor overrides get_limits_batch applies; pass the packet's site/rack and the sensor id.
+        """
+        return LIMITS.table.resolve(sensor_type, device_type, site, rack, sensor_id)
+
+    @classmethod
+    def validate_sensor_reading(cls, sensor_type: str, value: float, device_type: str = "datacenter",
+                                site: Optional[str] = None, rack: Optional[str] = None,
+                                sensor_id: Optional[str] = None) -> bool:
         """Validates if a sensor reading is within safe physical bounds."""
-        dt = device_type.lower()
-        base_limits = cls.HARDWARE_LIMITS if any(k in dt for k in ["notebook", "pc", "laptop"]) else cls.DEFAULT_LIMITS
-        limits = base_limits.get(sensor_type)
+        limits = cls.get_limits(sensor_type, device_type, site, rack, sensor_id)
         
         if not limits:
             return True  # No limits defined for this type
         
-        is_safe = limits["min"] <= value <= limits["max"]
+        low, high = limits.get("min", -np.inf), limits.get("max", np.inf)
+        is_safe = low <= value <= high
         
         if not is_safe:
-            logger.warning(f"SAFETY VIOLATION [{device_type}]: {sensor_type} value {value} is out of bounds ({limits['min']}-{limits['max']})")
+            logger.warning(f"SAFETY VIOLATION [{device_type}]: {sensor_type} value {value} is out of bounds ({low}-{high})")
             
         return is_safe
 
     @classmethod
-    def get_mitigation_action(cls, sensor_type: str, value: float, analysis: dict, device_type: str) -> Optional[dict]:
+    def get_mitigation_action(cls, sensor_type: str, value: float, analysis: dict, device_type: str,
+                              site: Optional[str] = None, rack: Optional[str] = None,
+                              sensor_id: Optional[str] = None) -> Optional[dict]:
         """
         Determines the best autonomous action to mitigate a risk before it becomes critical.
         (CEZI COLA: Risk & Architecture)
@@ -60,7 +72,8 @@ class SafetyController:
 
         # Mitigation Logic based on device and sensor
         if sensor_type == "temperature":
-            if status == "critical_approaching" or value > cls.get_limits("temperature", device_type).get("max", 100) * 0.9:
+            limits = cls.get_limits("temperature", device_type, site, rack, sensor_id)
+            if status == "critical_approaching" or value > limits.get("max", 100) * 0.9:
                 return {
                     "action": "INCREASE_COOLING",
                     "intensity": "HIGH",
@@ -86,8 +99,57 @@ class SafetyController:
         
         return None
 
+    # Action templates for the vectorized path; codes returned by get_mitigation_actions_batch index this tuple
+    MITIGATION_ACTIONS = (
+        {"action": "INCREASE_COOLING", "intensity": "HIGH", "target": "FAN_CONTROLLER", "reason": "Thermal runaway predicted"},
+        {"action": "OPTIMIZE_AIRFLOW", "intensity": "MEDIUM", "target": "HVAC_SYSTEM", "reason": "Rising thermal trend detected"},
+        {"action": "SHED_LOAD", "intensity": "CRITICAL", "target": "NON_ESSENTIAL_RACKS", "reason": "Power capacity limit imminent"},
+    )
+
+    @classmethod
+    def get_limits_batch(cls, columns) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Resolves (min, max) limits for every reading of a TelemetryColumns batch, including
+        site, rack and sensor overrides; NaN marks missing bounds.
+        """
+        return LIMITS.table.bounds(columns)
+
+    @classmethod
+    def validate_batch(cls, sensor_types: np.ndarray, values: np.ndarray, mins: np.ndarray, maxs: np.ndarray) -> np.ndarray:
+        """Vectorized validate_sensor_reading: missing bounds never fail a reading."""
+        with np.errstate(invalid="ignore"):
+            is_safe = ~((values < mins) | (values > maxs))
+        for i in np.flatnonzero(~is_safe):
+            logger.warning(f"SAFETY VIOLATION: {sensor_types[i]} value {values[i]} is out of bounds ({mins[i]}-{maxs[i]})")
+        return is_safe
+
+    @classmethod
+    def get_mitigation_actions_batch(cls, sensor_types: np.ndarray, values: np.ndarray, status: np.ndarray,
+                                     is_anomaly: np.ndarray, maxs: np.ndarray) -> np.ndarray:
+        """
+        Vectorized get_mitigation_action. Returns an index into MITIGATION_ACTIONS per reading, -1 for no action.
+        `status` holds prediction status names.
+        """
+        actions = np.full(len(values), -1, dtype=np.int64)
+        active = (status != "stable") | is_anomaly
+        critical = status == "critical_approaching"
+
+        temperature = active & (sensor_types == "temperature")
+        with np.errstate(invalid="ignore"):
+            hot = values > np.where(np.isnan(maxs), 100.0, maxs) * 0.9
+        actions[temperature & (status == "maintenance_required")] = 1
+        actions[temperature & (critical | hot)] = 0
+        actions[active & (sensor_types == "power") & critical] = 2
+        return actions
+
     @classmethod
     def validate_action(cls, action_type: str, params: dict) -> bool:
         """Validates if a system-proposed action is safe to execute."""
         # Placeholder for future action validation logic
         return True
+
+
+LIMITS = LimitRegistry.from_env({
+    "datacenter": SafetyController.DEFAULT_LIMITS,
+    "hardware": SafetyController.HARDWARE_LIMITS,
+})
@@ -0,0 +1,110 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Callable, Optional, Tuple
+
+from app.core.database import SupabaseManager
+from app.engine.anomaly import IntelligenceEngine
+
+logger = logging.getLogger("Helixa-Snapshots")
+
+
+class HistorySnapshotter:
+    """
+    Warm restarts for the intelligence engine (CEZI COLA: Resilience).
+    On start-up the history is restored from the latest snapshot file or, when there is none,
+    warmed in the background from the last window per sensor stored in the database.
+    While running, the history is snapshotted every `interval` seconds and once more on shutdown.
+    """
+
+    def __init__(
+        self,
+        engine: IntelligenceEngine,
+        path: Optional[str],
+        interval: float = 60.0,
+        warm_from_db: bool = True,
+        warm_max_age_hours: float = 24.0,
+        loader: Optional[Callable[[int, float], Tuple[list, list, list]]] = None,
+    ):
+        self.engine = engine
+        self.path = path
+        self.interval = interval
+        self.warm_from_db = warm_from_db
+        self.warm_max_age_hours = warm_max_age_hours
+        self.loader = loader or SupabaseManager.fetch_recent_windows
+        self.restored_from: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._warm_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls, engine: IntelligenceEngine, loader=None) -> "HistorySnapshotter":
+        return cls(
+            engine,
+            path=os.getenv("HISTORY_SNAPSHOT_PATH", "./state/history.snap") or None,
+            interval=float(os.getenv("HISTORY_SNAPSHOT_INTERVAL", 60)),
+            warm_from_db=os.getenv("HISTORY_WARM_FROM_DB", "true").lower() in ("1", "true", "yes"),
+            warm_max_age_hours=float(os.getenv("HISTORY_WARM_MAX_AGE_HOURS", 24)),
+            loader=loader,
+        )
+
+    async def restore(self):
+        """Loads the snapshot inline (milliseconds); a database warm-up runs in the background instead."""
+        if self.path:
+            started = time.perf_counter()
+            try:
+                sensors = await asyncio.to_thread(self.engine.load_snapshot, self.path)
+                self.restored_from = "snapshot"
+                logger.info(f"Restored history of {sensors} sensors from {self.path} in {(time.perf_counter() - started) * 1000:.0f}ms")
+                return
+            except FileNotFoundError:
+                logger.info(f"No history snapshot at {self.path}")
+            except Exception as e:
+                logger.error(f"Failed to load history snapshot {self.path}: {str(e)}")
+        if self.warm_from_db:
+            self._warm_task = asyncio.create_task(self._warm_from_database())
+
+    async def _warm_from_database(self):
+        started = time.perf_counter()
+        try:
+            ids, timestamps, values = await asyncio.to_thread(
+                self.loader, self.engine.window_size, self.warm_max_age_hours
+            )
+            # Applied on the event loop so it cannot interleave with analyze_batch
+            sensors = await self.engine.offload(self.engine.warm_start, ids, timestamps, values)
+            self.restored_from = "database"
+            logger.info(f"Warmed history of {sensors} sensors from {len(ids)} stored readings in {time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            logger.error(f"History warm-up from database failed: {str(e)}")
+
+    async def start(self):
+        if self.path and self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        for task in (self._warm_task, self._task):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = self._warm_task = None
+        if self.path:
+            await self.snapshot()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.snapshot()
+
+    async def snapshot(self) -> int:
+        """Captures the history on the event loop, then writes it from a worker thread."""
+        try:
+            started = time.perf_counter()
+            sensors = await asyncio.to_thread(self.engine.capture_snapshot(self.path))
+            logger.debug(f"Snapshot of {sensors} sensors written in {(time.perf_counter() - started) * 1000:.0f}ms")
+            return sensors
+        except Exception as e:
+            logger.error(f"History snapshot failed: {str(e)}")
+            return 0
@@ -0,0 +1,118 @@
+import os
+import time
+import asyncio
+import logging
+from contextlib import contextmanager
+from typing import Awaitable, Dict, Optional
+
+from prometheus_client import Gauge
+
+logger = logging.getLogger("Helixa-Startup")
+
+STARTUP_PHASES = Gauge('brain_startup_phase_seconds', 'Duration of each start-up phase', ['phase'])
+STARTUP_READY = Gauge('brain_ready', 'Whether the background warm-up has finished')
+
+
+class StartupTracker:
+    """
+    Start-up timing breakdown and readiness of the brain (CEZI COLA: Observability).
+    Inline phases (imports, engine construction, lifespan) are timed with phase(); slow
+    initialization runs as background warm-ups so the server accepts connections right away.
+    The brain is ready once every gating warm-up has finished; a failed warm-up is reported but
+    does not hold readiness back, as each of them has a degraded fallback. Warm-ups that only
+    save later work (gate=False) are reported without delaying readiness.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.failed: Dict[str, str] = {}
+        self.pending: Dict[str, asyncio.Task] = {}
+        self.background: Dict[str, asyncio.Task] = {}
+        self.ready_after: Optional[float] = None
+        # Seconds an ingestion request waits for the warm-up before it is deferred with 503
+        self.ingest_wait = float(os.getenv("STARTUP_INGEST_WAIT", 5))
+        self._serving = False
+        self._ready: Optional[asyncio.Event] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_after is not None
+
+    def record(self, name: str, seconds: float):
+        self.phases[name] = round(seconds, 4)
+        STARTUP_PHASES.labels(phase=name).set(seconds)
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def warm(self, name: str, work: Awaitable, gate: bool = True):
+        """Runs `work` in the background as the warm-up phase `name`; readiness waits for it when `gate`."""
+        tasks = self.pending if gate else self.background
+        tasks[name] = asyncio.create_task(self._warm(name, work, tasks), name=f"helixa-warm-{name}")
+
+    async def _warm(self, name: str, work: Awaitable, tasks: Dict[str, asyncio.Task]):
+        started = time.perf_counter()
+        try:
+            await work
+        except Exception as e:
+            self.failed[name] = str(e)
+            logger.error(f"Warm-up '{name}' failed: {str(e)}")
+        finally:
+            self.record(name, time.perf_counter() - started)
+            tasks.pop(name, None)
+            self._check()
+
+    def serving(self):
+        """Called once the lifespan hands over to the server; readiness follows the warm-ups."""
+        self._serving = True
+        self._check()
+
+    def _check(self):
+        if self.ready or not self._serving or self.pending:
+            return
+        self.ready_after = time.perf_counter() - self.started
+        STARTUP_READY.set(1)
+        self._event().set()
+        breakdown = ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.phases.items())
+        logger.info(f"Brain ready {self.ready_after:.2f}s after import ({breakdown})")
+
+    def _event(self) -> asyncio.Event:
+        if self._ready is None:
+            self._ready = asyncio.Event()
+        return self._ready
+
+    async def wait_ready(self, timeout: float) -> bool:
+        if self.ready:
+            return True
+        try:
+            await asyncio.wait_for(self._event().wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def stop(self):
+        tasks = [*self.pending.values(), *self.background.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def report(self) -> dict:
+        return {
+            "ready": self.ready,
+            "ready_after_seconds": None if self.ready_after is None else round(self.ready_after, 3),
+            "uptime_seconds": round(time.perf_counter() - self.started, 3),
+            "phases": dict(self.phases),
+            "pending": sorted(self.pending),
+            "warming": sorted(self.background),
+            "failed": dict(self.failed),
+        }
+
+
+# Created on the first import of app.main, which makes it the baseline of the breakdown
+startup = StartupTracker()
@@ -0,0 +1,670 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from app.core.database import SupabaseManager
+from app.core.metrics import PERSIST_DEAD_LETTERED
+from app.engine.batch import rack_from_id
+
+logger = logging.getLogger("Helixa-Storage")
+
+BACKENDS = ("supabase", "sqlite")
+# Keys the ingest path adds to legacy row metadata; not part of the packet that arrived
+ANALYSIS_KEYS = ("intelligence", "recommended_action", "is_safe", "observed_at")
+
+
+def append_dead_letter(path: Optional[str], rows: List[dict], error: Exception, reason: str):
+    """Appends rows set aside for good to the dead-letter NDJSON at `path` (None: count and log only)."""
+    PERSIST_DEAD_LETTERED.labels(reason=reason).inc(len(rows))
+    logger.error(f"Setting aside {len(rows)} telemetry row(s) ({reason}): {str(error)}")
+    if not path:
+        return
+    try:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "a") as f:
+            for row in rows:
+                f.write(json.dumps({"reason": reason, "error": str(error), "at": time.time(), "row": row}, default=str) + "\n")
+    except OSError as e:
+        logger.error(f"Dead-letter file {path} unavailable, rows lost: {str(e)}")
+
+
+def legacy_packets(rows: Iterable[tuple]) -> List[dict]:
+    """
+    Regroups legacy (stored_at, sensor_id, type, value, unit, metadata) rows into packets in the
+    TelemetryData layout: consecutive rows with the same event time and metadata form one packet.
+    Event time is the `observed_at` the brain stored, or the storage time for older rows.
+    """
+    packets, key = [], None
+    for stored_at, sensor_id, sensor_type, value, unit, metadata in rows:
+        metadata = metadata or {}
+        timestamp = float(metadata.get("observed_at", stored_at))
+        meta = {k: v for k, v in metadata.items() if k not in ANALYSIS_KEYS}
+        if key is None or key != (timestamp, meta):
+            key = (timestamp, meta)
+            packets.append({"timestamp": timestamp, "sensors": [], "metadata": meta})
+        packets[-1]["sensors"].append({"id": sensor_id, "type": sensor_type, "value": value, "unit": unit})
+    return packets
+
+
+def header_metadata(header: dict) -> dict:
+    """Packet metadata of a normalized header: typed header fields folded back into the JSON rest."""
+    meta = dict(header.get("metadata") or {})
+    meta.update((k, header[k]) for k in ("site", "device_type", "mode", "version") if header.get(k) is not None)
+    return meta
+
+
+class RangeTooLarge(Exception):
+    """A range query matched more rows than the caller allowed."""
+
+    def __init__(self, max_rows: int):
+        super().__init__(f"Range query exceeds {max_rows} rows")
+        self.max_rows = max_rows
+
+
+class StorageBackend:
+    """
+    Where the write-behind pipeline persists telemetry rows (CEZI COLA: Persistence).
+    `write` is blocking and raises on failure so the caller can retry or spill the batch;
+    rows come in the shape of the configured telemetry schema ("legacy" or "normalized").
+    """
+
+    name = "base"
+
+    def __init__(self, schema: str = "legacy"):
+        self.schema = schema
+
+    def write(self, rows: List[dict]):
+        raise NotImplementedError
+
+    def fetch_recent_windows(self, window_size: int, since_hours: float = 24.0) -> Tuple[List[str], List[float], List[float]]:
+        """Last `window_size` readings per sensor as parallel (sensor_ids, unix timestamps, values) lists."""
+        raise NotImplementedError
+
+    def fetch_range(self, sensor_ids: Optional[List[str]], site: Optional[str], rack: Optional[str],
+                    since: float, until: float, bucket_seconds: int,
+                    max_rows: int = 0) -> Tuple[list, list, list, list, list, list]:
+        """
+        Readings of [since, until) for the given sensors, site and/or rack, aggregated per sensor into
+        buckets of `bucket_seconds` (raw readings when 0). Parallel (sensor_ids, unix bucket starts,
+        mins, maxs, avgs, counts) lists ordered by sensor and time. With `max_rows`, at most that
+        many rows are read from storage and RangeTooLarge is raised when there are more.
+        """
+        raise NotImplementedError
+
+    def iter_packets(self, since: float, until: float, page_size: int = 5000) -> Iterator[List[dict]]:
+        """
+        Stored telemetry of [since, until) as pages of packets in the TelemetryData layout
+        (timestamp = event time), in storage order. Used by replays.
+        """
+        raise NotImplementedError
+
+    def permanent(self, error: Exception) -> bool:
+        """
+        True when `error` from write() is caused by the rows themselves (constraint or type errors),
+        so retrying them cannot succeed; False for an unavailable or failing database.
+        """
+        return isinstance(error, TypeError)
+
+    def connect(self):
+        """Opens connections ahead of the first write; runs as a background warm-up at start-up."""
+
+    def close(self):
+        pass
+
+
+class SupabaseBackend(StorageBackend):
+    """The hosted Supabase database, through SupabaseManager."""
+
+    name = "supabase"
+
+    # SQLSTATE classes of data exceptions, integrity violations and invalid values/columns
+    PERMANENT_SQLSTATES = ("22", "23", "42")
+
+    def connect(self):
+        SupabaseManager.get_client()
+
+    def permanent(self, error: Exception) -> bool:
+        code = getattr(error, "code", None)
+        if type(error).__name__ == "APIError" and isinstance(code, str):
+            return code[:2] in self.PERMANENT_SQLSTATES
+        # A ValueError once the client exists comes from encoding the rows (e.g. NaN in JSON);
+        # before that it is the missing-credentials error of get_client
+        if isinstance(error, ValueError):
+            return SupabaseManager._client is not None
+        return super().permanent(error)
+
+    def write(self, rows: List[dict]):
+        if self.schema == "normalized":
+            SupabaseManager.save_telemetry_packets(rows)
+        else:
+            SupabaseManager.save_telemetry_batch(rows)
+
+    def fetch_recent_windows(self, window_size: int, since_hours: float = 24.0):
+        return SupabaseManager.fetch_recent_windows(window_size, since_hours)
+
+    def fetch_range(self, sensor_ids, site, rack, since, until, bucket_seconds, max_rows=0):
+        columns = SupabaseManager.fetch_range(sensor_ids, site, rack, since, until, bucket_seconds, max_rows=max_rows)
+        if max_rows and len(columns[0]) > max_rows:
+            raise RangeTooLarge(max_rows)
+        return columns
+
+    def iter_packets(self, since: float, until: float, page_size: int = 5000):
+        normalized = self.schema == "normalized"
+        after = 0
+        while True:
+            page = SupabaseManager.fetch_replay_page(since, until, after, page_size, normalized)
+            if not page:
+                return
+            after = page[-1]["id"]
+            if normalized:
+                yield [
+                    {
+                        "timestamp": datetime.fromisoformat(p["observed_at"]).timestamp(),
+                        "sensors": [
+                            {"id": i, "type": t, "value": v, "unit": u}
+                            for i, t, v, u in zip(p["sensor_ids"] or [], p["types"] or [], p["vals"] or [], p["units"] or [])
+                        ],
+                        "metadata": header_metadata(p),
+                    }
+                    for p in page
+                ]
+            else:
+                yield legacy_packets(
+                    (datetime.fromisoformat(r["created_at"]).timestamp(), r["sensor_id"], r["type"], r["value"], r["unit"], r["metadata"])
+                    for r in page
+                )
+            if len(page) < page_size:
+                return
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Embedded storage for edge sites without WAN access. A single SQLite file in WAL mode with
+    synchronous=NORMAL: every write-behind batch is one transaction with executemany inserts,
+    so the cost per reading is a few microseconds and readers never block the writer.
+    Row ids are monotonic, which lets StorageReplicator forward rows to Supabase by cursor.
+    """
+
+    name = "sqlite"
+
+    LEGACY_SCHEMA = """
+        CREATE TABLE IF NOT EXISTS telemetry (
+            id INTEGER PRIMARY KEY,
+            created_at REAL NOT NULL,
+            sensor_id TEXT NOT NULL,
+            type TEXT NOT NULL,
+            value REAL NOT NULL,
+            unit TEXT NOT NULL,
+            metadata TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_telemetry_sensor_time ON telemetry (sensor_id, created_at);
+    """
+    NORMALIZED_SCHEMA = """
+        CREATE TABLE IF NOT EXISTS telemetry_packets (
+            id INTEGER PRIMARY KEY,
+            created_at REAL NOT NULL,
+            readings INTEGER NOT NULL,
+            header TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS telemetry_readings (
+            packet_id INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            sensor_id TEXT NOT NULL,
+            type TEXT NOT NULL,
+            unit TEXT NOT NULL,
+            value REAL NOT NULL,
+            z_score REAL NOT NULL,
+            is_anomaly INTEGER NOT NULL,
+            status INTEGER NOT NULL,
+            ttf_minutes REAL,
+            is_safe INTEGER NOT NULL,
+            action INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS idx_readings_packet ON telemetry_readings (packet_id);
+        CREATE INDEX IF NOT EXISTS idx_readings_sensor_time ON telemetry_readings (sensor_id, created_at);
+    """
+
+    def __init__(self, path: str, schema: str = "legacy"):
+        super().__init__(schema)
+        self.path = path
+        # Writes come from the pipeline's worker threads, reads from the replicator; one connection, one lock
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Opened by the start-up warm-up (connect) or, failing that, the first caller holding _lock
+        if self._db is None:
+            self._db = self._open()
+        return self._db
+
+    def _open(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(self.NORMALIZED_SCHEMA if self.schema == "normalized" else self.LEGACY_SCHEMA)
+        conn.execute("CREATE TABLE IF NOT EXISTS replication (target TEXT PRIMARY KEY, last_id INTEGER NOT NULL)")
+        conn.create_function(
+            "helixa_rack", 2, lambda sensor_id, rack: rack if rack is not None else rack_from_id(sensor_id), deterministic=True
+        )
+        return conn
+
+    def connect(self):
+        """Opens the file, recovering its WAL if needed, and creates the schema off the import path."""
+        with self._lock:
+            if self._db is None:
+                self._db = self._open()
+
+    def permanent(self, error: Exception) -> bool:
+        # OperationalError (locked database, full disk, I/O) is worth retrying; the rest is bad data
+        return isinstance(error, (sqlite3.IntegrityError, sqlite3.InterfaceError, sqlite3.DataError,
+                                  sqlite3.ProgrammingError, TypeError, ValueError, OverflowError))
+
+    def write(self, rows: List[dict]):
+        if not rows:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                if self.schema == "normalized":
+                    self._write_packets(rows, now)
+                else:
+                    self._conn.executemany(
+                        "INSERT INTO telemetry (created_at, sensor_id, type, value, unit, metadata) VALUES (?, ?, ?, ?, ?, ?)",
+                        [
+                            (now, row["sensor_id"], row["type"], row["value"], row["unit"],
+                             None if row.get("metadata") is None else json.dumps(row["metadata"]))
+                            for row in rows
+                        ],
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _write_packets(self, rows: List[dict], now: float):
+        # Rows share their packet header by reference (see save_telemetry_packets)
+        packets = {}
+        for row in rows:
+            packets.setdefault(id(row["packet"]), []).append(row)
+        for readings in packets.values():
+            cursor = self._conn.execute(
+                "INSERT INTO telemetry_packets (created_at, readings, header) VALUES (?, ?, ?)",
+                (now, len(readings), json.dumps(readings[0]["packet"])),
+            )
+            packet_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO telemetry_readings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (packet_id, now, r["sensor_id"], r["type"], r["unit"], r["value"], r["z_score"], r["is_anomaly"],
+                     r["status"], r["ttf_minutes"], r["is_safe"], r["action"])
+                    for r in readings
+                ],
+            )
+
+    def fetch_recent_windows(self, window_size: int, since_hours: float = 24.0):
+        table = "telemetry_readings" if self.schema == "normalized" else "telemetry"
+        since = time.time() - since_hours * 3600
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT sensor_id, created_at, value FROM (
+                    SELECT sensor_id, created_at, value,
+                           ROW_NUMBER() OVER (PARTITION BY sensor_id ORDER BY created_at DESC) AS age
+                    FROM {table} WHERE created_at >= ?
+                ) WHERE age <= ? ORDER BY sensor_id, created_at
+                """,
+                (since, window_size),
+            ).fetchall()
+        return [r[0] for r in rows], [r[1] for r in rows], [r[2] for r in rows]
+
+    def fetch_range(self, sensor_ids, site, rack, since, until, bucket_seconds, max_rows=0):
+        if self.schema == "normalized":
+            source = ("telemetry_readings r JOIN telemetry_packets p ON p.id = r.packet_id",
+                      "json_extract(p.header, '$.site')", "json_extract(p.header, '$.metadata.rack')")
+        else:
+            source = ("telemetry r", "json_extract(r.metadata, '$.site')", "json_extract(r.metadata, '$.rack')")
+        table, site_expr, rack_expr = source
+        filters, params = ["r.created_at >= ?", "r.created_at < ?"], [since, until]
+        if sensor_ids:
+            filters.append(f"r.sensor_id IN ({', '.join('?' * len(sensor_ids))})")
+            params.extend(sensor_ids)
+        if site is not None:
+            filters.append(f"{site_expr} = ?")
+            params.append(site)
+        if rack is not None:
+            filters.append(f"helixa_rack(r.sensor_id, {rack_expr}) = ?")
+            params.append(rack)
+        origin, width = float(since), int(bucket_seconds)
+        bucket = f"{origin!r} + CAST((r.created_at - {origin!r}) / {width} AS INTEGER) * {width}" if width > 0 else "r.created_at"
+        limit = ""
+        if max_rows:
+            # One row past the cap tells a complete result from a truncated one
+            limit = " LIMIT ?"
+            params.append(max_rows + 1)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT r.sensor_id, {bucket} AS b, MIN(r.value), MAX(r.value), AVG(r.value), COUNT(*) "
+                f"FROM {table} WHERE {' AND '.join(filters)} GROUP BY 1, 2 ORDER BY 1, 2{limit}",
+                params,
+            ).fetchall()
+        if max_rows and len(rows) > max_rows:
+            raise RangeTooLarge(max_rows)
+        return tuple(list(column) for column in zip(*rows)) if rows else ([], [], [], [], [], [])
+
+    def iter_packets(self, since: float, until: float, page_size: int = 5000):
+        after = 0
+        while True:
+            with self._lock:
+                if self.schema == "normalized":
+                    packets = self._conn.execute(
+                        "SELECT id, header FROM telemetry_packets WHERE id > ? AND created_at >= ? AND created_at < ? "
+                        "ORDER BY id LIMIT ?",
+                        (after, since, until, page_size),
+                    ).fetchall()
+                    readings = self._conn.execute(
+                        "SELECT packet_id, sensor_id, type, value, unit FROM telemetry_readings "
+                        "WHERE packet_id BETWEEN ? AND ? ORDER BY packet_id, rowid",
+                        (packets[0][0], packets[-1][0]),
+                    ).fetchall() if packets else []
+                else:
+                    rows = self._conn.execute(
+                        "SELECT id, created_at, sensor_id, type, value, unit, metadata FROM telemetry "
+                        "WHERE id > ? AND created_at >= ? AND created_at < ? ORDER BY id LIMIT ?",
+                        (after, since, until, page_size),
+                    ).fetchall()
+            if self.schema == "normalized":
+                if not packets:
+                    return
+                after = packets[-1][0]
+                by_id = {}
+                for packet_id, header in packets:
+                    header = json.loads(header)
+                    by_id[packet_id] = {"timestamp": header["timestamp"], "sensors": [], "metadata": header_metadata(header)}
+                for packet_id, sensor_id, sensor_type, value, unit in readings:
+                    by_id[packet_id]["sensors"].append({"id": sensor_id, "type": sensor_type, "value": value, "unit": unit})
+                yield list(by_id.values())
+                count = len(packets)
+            else:
+                if not rows:
+                    return
+                after = rows[-1][0]
+                yield legacy_packets((r[1], r[2], r[3], r[4], r[5], None if r[6] is None else json.loads(r[6])) for r in rows)
+                count = len(rows)
+            if count < page_size:
+                return
+
+    def cursor(self, target: str) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT last_id FROM replication WHERE target = ?", (target,)).fetchone()
+        return row[0] if row else 0
+
+    def advance(self, target: str, last_id: int):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO replication (target, last_id) VALUES (?, ?) "
+                "ON CONFLICT (target) DO UPDATE SET last_id = excluded.last_id",
+                (target, last_id),
+            )
+
+    def pending(self, target: str) -> int:
+        """Readings not yet replicated to `target`."""
+        after = self.cursor(target)
+        with self._lock:
+            if self.schema == "normalized":
+                row = self._conn.execute("SELECT SUM(readings) FROM telemetry_packets WHERE id > ?", (after,)).fetchone()
+            else:
+                row = self._conn.execute("SELECT COUNT(*) FROM telemetry WHERE id > ?", (after,)).fetchone()
+        return row[0] or 0
+
+    def read_after(self, after: int, limit: int) -> Tuple[List[dict], List[int]]:
+        """
+        Up to about `limit` rows stored after row id `after`, rebuilt in the shape they were
+        written in, and the cursor id of each (its packet's id when normalized, so readings of
+        one packet share it). Normalized packets are never split.
+        """
+        with self._lock:
+            if self.schema != "normalized":
+                records = self._conn.execute(
+                    "SELECT id, sensor_id, type, value, unit, metadata FROM telemetry WHERE id > ? ORDER BY id LIMIT ?",
+                    (after, limit),
+                ).fetchall()
+                rows = [
+                    {"sensor_id": s, "type": t, "value": v, "unit": u, "metadata": None if m is None else json.loads(m)}
+                    for _, s, t, v, u, m in records
+                ]
+                return rows, [record[0] for record in records]
+
+            packets = self._conn.execute(
+                """
+                SELECT id, header FROM (
+                    SELECT id, header, readings, SUM(readings) OVER (ORDER BY id) AS running
+                    FROM telemetry_packets WHERE id > ?
+                ) WHERE running - readings < ? ORDER BY id
+                """,
+                (after, limit),
+            ).fetchall()
+            if not packets:
+                return [], []
+            headers = {packet_id: json.loads(header) for packet_id, header in packets}
+            readings = self._conn.execute(
+                "SELECT packet_id, sensor_id, type, unit, value, z_score, is_anomaly, status, ttf_minutes, is_safe, action "
+                "FROM telemetry_readings WHERE packet_id BETWEEN ? AND ? ORDER BY packet_id, rowid",
+                (packets[0][0], packets[-1][0]),
+            ).fetchall()
+        rows = [
+            {
+                "packet": headers[p], "sensor_id": s, "type": t, "unit": u, "value": v, "z_score": z,
+                "is_anomaly": bool(a), "status": st, "ttf_minutes": ttf, "is_safe": bool(safe), "action": action,
+            }
+            for p, s, t, u, v, z, a, st, ttf, safe, action in readings
+        ]
+        return rows, [reading[0] for reading in readings]
+
+    def prune(self, older_than: float, upto_id: Optional[int] = None) -> int:
+        """Deletes rows stored before `older_than` (unix time), keeping anything after row id `upto_id`."""
+        upto_id = upto_id if upto_id is not None else -1
+        bounded = "AND id <= ?" if upto_id >= 0 else ""
+        args = (older_than, upto_id) if upto_id >= 0 else (older_than,)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                if self.schema == "normalized":
+                    last = self._conn.execute(
+                        f"SELECT MAX(id) FROM telemetry_packets WHERE created_at < ? {bounded}", args
+                    ).fetchone()[0]
+                    deleted = 0
+                    if last is not None:
+                        deleted = self._conn.execute("DELETE FROM telemetry_readings WHERE packet_id <= ?", (last,)).rowcount
+                        self._conn.execute("DELETE FROM telemetry_packets WHERE id <= ?", (last,))
+                else:
+                    deleted = self._conn.execute(f"DELETE FROM telemetry WHERE created_at < ? {bounded}", args).rowcount
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return deleted
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+def create_backend(schema: str = "legacy") -> StorageBackend:
+    """
+    Backend selected by STORAGE_BACKEND: "supabase" (default) or "sqlite" at STORAGE_SQLITE_PATH.
+    """
+    name = os.getenv("STORAGE_BACKEND", "supabase").lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown storage backend '{name}', expected one of {BACKENDS}")
+    if name == "sqlite":
+        path = os.getenv("STORAGE_SQLITE_PATH", "./state/telemetry.db")
+        logger.info(f"Persisting telemetry to embedded SQLite at {path} ({schema} schema)")
+        return SQLiteBackend(path, schema=schema)
+    return SupabaseBackend(schema)
+
+
+class StorageReplicator:
+    """
+    Forwards telemetry from the embedded store to an upstream backend (Supabase) whenever it is
+    reachable (CEZI COLA: Resilience). Rows are read by id cursor in chunks; the cursor only
+    advances past rows the upstream took, so an outage just delays replication. Chunks the
+    upstream rejects for good (StorageBackend.permanent) are bisected until the offending rows
+    are isolated and dead-lettered, so one bad row cannot hold back everything after it.
+    Upstream rows are stamped on arrival; the original observation time travels in the packet
+    metadata. Replicated rows older than `retention_hours` are pruned from the local file;
+    without an upstream (STORAGE_REPLICATE=false) it only enforces that retention.
+    """
+
+    TARGET = "supabase"
+
+    def __init__(
+        self,
+        local: SQLiteBackend,
+        upstream: Optional[StorageBackend],
+        interval: float = 5.0,
+        batch_size: int = 5000,
+        retention_hours: float = 72.0,
+        max_backoff: float = 300.0,
+        dead_letter_path: Optional[str] = None,
+    ):
+        self.local = local
+        self.upstream = upstream
+        self.interval = interval
+        self.batch_size = batch_size
+        self.retention_hours = retention_hours
+        self.max_backoff = max_backoff
+        self.dead_letter_path = dead_letter_path
+        self.replicated_rows = 0
+        self.dead_lettered_rows = 0
+        self.failed_attempts = 0
+        self._backoff = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls, backend: StorageBackend) -> Optional["StorageReplicator"]:
+        """A replicator for an embedded backend, None for Supabase itself."""
+        if not isinstance(backend, SQLiteBackend):
+            return None
+        replicate = os.getenv("STORAGE_REPLICATE", "true").lower() in ("1", "true", "yes")
+        return cls(
+            backend,
+            SupabaseBackend(backend.schema) if replicate else None,
+            interval=float(os.getenv("STORAGE_REPLICATION_INTERVAL", 5)),
+            batch_size=int(os.getenv("STORAGE_REPLICATION_BATCH", 5000)),
+            retention_hours=float(os.getenv("STORAGE_SQLITE_RETENTION_HOURS", 72)),
+            dead_letter_path=os.getenv("STORAGE_REPLICATION_DEAD_LETTER_PATH", "./state/replication_dead_letter.ndjson") or None,
+        )
+
+    def stats(self) -> dict:
+        return {
+            "pending_rows": self.local.pending(self.TARGET),
+            "replicated_rows": self.replicated_rows,
+            "dead_lettered_rows": self.dead_lettered_rows,
+            "failed_attempts": self.failed_attempts,
+        }
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="helixa-storage-replicator")
+            if self.upstream is not None:
+                logger.info(f"Replicating {self.local.path} to {self.upstream.name} every {self.interval:.0f}s")
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval + self._backoff)
+            await self.replicate()
+
+    async def replicate(self) -> int:
+        """Ships everything pending; returns the number of rows replicated in this pass."""
+        if self.upstream is None:
+            await self._prune(None)
+            return 0
+        shipped = 0
+        try:
+            cursor = await asyncio.to_thread(self.local.cursor, self.TARGET)
+            while True:
+                rows, ids = await asyncio.to_thread(self.local.read_after, cursor, self.batch_size)
+                if not rows:
+                    break
+                written, resume, error = await self._ship(rows, ids)
+                shipped += written
+                if resume is not None:
+                    await asyncio.to_thread(self.local.advance, self.TARGET, resume)
+                    cursor = resume
+                if error is not None:
+                    raise error
+            self.replicated_rows += shipped
+            if shipped or self._backoff:
+                logger.info(f"Replicated {shipped} rows to {self.upstream.name}")
+            self._backoff = 0.0
+            await self._prune(cursor)
+        except Exception as e:
+            self.replicated_rows += shipped
+            self.failed_attempts += 1
+            self._backoff = min(self.max_backoff, max(self.interval, self._backoff * 2))
+            logger.error(f"Replication to {self.upstream.name} failed, retrying in {self.interval + self._backoff:.0f}s: {str(e)}")
+        return shipped
+
+    async def _ship(self, rows: List[dict], ids: List[int]) -> Tuple[int, Optional[int], Optional[Exception]]:
+        """
+        Writes a chunk upstream, bisecting pieces it rejects for good (never splitting the rows of
+        one cursor id, i.e. a normalized packet) until the offending rows are dead-lettered.
+        Stops at the first transient failure. Returns the rows written, the id replication can
+        resume after (None if nothing was handled) and that failure, if any.
+        """
+        groups: List[Tuple[int, List[dict]]] = []
+        for row_id, row in zip(ids, rows):
+            if groups and groups[-1][0] == row_id:
+                groups[-1][1].append(row)
+            else:
+                groups.append((row_id, [row]))
+        written, resume = 0, None
+        pieces = [groups]
+        while pieces:
+            piece = pieces.pop()
+            piece_rows = [row for _, group in piece for row in group]
+            try:
+                await asyncio.to_thread(self.upstream.write, piece_rows)
+                written += len(piece_rows)
+            except Exception as e:
+                if not self.upstream.permanent(e):
+                    return written, resume, e
+                if len(piece) > 1:
+                    middle = len(piece) // 2
+                    pieces += [piece[middle:], piece[:middle]]
+                    continue
+                self.dead_lettered_rows += len(piece_rows)
+                append_dead_letter(self.dead_letter_path, piece_rows, e, "replication_rejected")
+            resume = piece[-1][0]
+        return written, resume, None
+
+    async def _prune(self, upto_id: Optional[int]):
+        if self.retention_hours > 0:
+            cutoff = time.time() - self.retention_hours * 3600
+            deleted = await asyncio.to_thread(self.local.prune, cutoff, upto_id)
+            if deleted:
+                logger.info(f"Pruned {deleted} readings older than {self.retention_hours:.0f}h from {self.local.path}")
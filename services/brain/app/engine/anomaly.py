@@ -1,7 +1,16 @@
+import os
+import time
 import logging
 import numpy as np
-from typing import Dict, List, Optional, Tuple
-from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+from app.core.metrics import STAGES
+from app.core.safety import SafetyController
+from app.engine.batch import BatchAnalysis, TelemetryColumns
+from app.engine.eventtime import EventClock
+from app.engine.history import SensorHistory
+from app.engine.multivariate import MultivariateDetector
+from app.engine.registry import SensorRegistry
+from app.schemas.telemetry import TelemetryData
 
 logger = logging.getLogger("Helixa-Intelligence")
 
@@ -11,33 +20,44 @@ class IntelligenceEngine:
     Uses statistical analysis and trend forecasting to anticipate failures.
     """
     
-    def __init__(self):
-        # Stores recent history for each sensor: [(timestamp, value), ...]
-        self.history: Dict[str, List[Tuple[float, float]]] = {}
-        self.window_size = 30
+    def __init__(self, window_size: int = 30):
+        # Ring-buffer window of (timestamp, value) per sensor with O(1) running statistics
+        self.window_size = window_size
+        self.history = SensorHistory(self.window_size)
+        # Idle/LRU eviction and memory accounting of the per-sensor state
+        self.registry = SensorRegistry.from_env()
+        self.registry.attach(self.history)
         
-        # Thresholds for maintenance alerts (e.g., 85% of safety limit)
+        # Readings are analyzed at their packet's timestamp, within a bounded reordering window
+        self.clock = EventClock.from_env()
+
+        # Thresholds for maintenance alerts (e.g., 85% of safety limit) and anomalies (z-score)
         self.maintenance_threshold_factor = 0.85
+        self.z_threshold = float(os.getenv("ENGINE_Z_THRESHOLD", 3.0))
+
+        # Optional cross-sensor detection per rack/site, refining the z-score anomaly flags
+        self.multivariate: Optional[MultivariateDetector] = None
 
-    def analyze(self, sensor_id: str, value: float, sensor_type: str, limits: Dict[str, float]) -> Dict:
+    def analyze(self, sensor_id: str, value: float, sensor_type: str, limits: Dict[str, float],
+                timestamp: Optional[float] = None) -> Dict:
         """
         Performs a full intelligence sweep: Anomaly Detection + Predictive Analysis.
+        `timestamp` is the reading's event time; arrival time when omitted.
         """
-        now = datetime.now().timestamp()
-        
-        if sensor_id not in self.history:
-            self.history[sensor_id] = []
-        
-        self.history[sensor_id].append((now, value))
-        
-        if len(self.history[sensor_id]) > self.window_size:
-            self.history[sensor_id].pop(0)
+        arrival = time.time()
+        now = self.clock.stamp([arrival if timestamp is None else timestamp], np.zeros(1, dtype=np.int64))
+        # Maintenance may evict, compact or renumber slots: it runs before the slot is taken
+        self.registry.maybe_maintain(self.history, arrival, self.multivariate)
+        slot = self.history.slot(sensor_id)
+        self.history.touch(slot, arrival)
+        if self.clock.accept(now, self.history.last_seen[[slot]])[0]:
+            self.history.append(sensor_id, now[0], value)
             
         # 1. Anomaly Detection (Z-Score)
-        is_anomaly, z_score = self._detect_anomaly(sensor_id, value)
+        is_anomaly, z_score = self._detect_anomaly(sensor_id, slot, value)
         
         # 2. Predictive Maintenance (Trend Analysis)
-        prediction = self._predict_trend(sensor_id, sensor_type, limits)
+        prediction = self._predict_trend(slot, sensor_type, limits)
         
         return {
             "is_anomaly": is_anomaly,
@@ -45,44 +65,213 @@ class IntelligenceEngine:
             "prediction": prediction
         }
 
-    def _detect_anomaly(self, sensor_id: str, value: float) -> Tuple[bool, float]:
-        data = np.array([v for _, v in self.history[sensor_id]])
-        if len(data) < 5:
+    def analyze_batch(self, data: Union[TelemetryData, List[TelemetryData], TelemetryColumns]) -> BatchAnalysis:
+        """
+        Vectorized intelligence sweep over whole packets: limit checks, z-scores, trend slopes,
+        TTF and mitigation decisions are computed with array operations across all readings.
+        Produces the same per-sensor results as calling analyze() reading by reading.
+        """
+        columns, is_safe, maxs = self._validate(data)
+        # 2-4. History, Anomaly Detection and Trend Analysis (CEZI COLA: Intelligence)
+        with STAGES["analysis"].time():
+            analyzed = self._analyze_columns(columns, maxs)
+        return self._decide(columns, is_safe, maxs, analyzed)
+
+    async def analyze_batch_async(self, data: Union[TelemetryData, List[TelemetryData], TelemetryColumns]) -> BatchAnalysis:
+        """analyze_batch for callers on the event loop; the in-process engine never blocks on I/O."""
+        return self.analyze_batch(data)
+
+    async def offload(self, method: Callable, *args):
+        """
+        Calls a method of the engine from the event loop. Inline here, where the state lives on
+        the loop and nothing blocks on I/O; engines that wait on other processes use a thread pool.
+        """
+        return method(*args)
+
+    def _validate(self, data) -> Tuple[TelemetryColumns, np.ndarray, np.ndarray]:
+        if isinstance(data, TelemetryData):
+            data = [data]
+        columns = data if isinstance(data, TelemetryColumns) else TelemetryColumns.from_packets(data)
+
+        # 1. Safety limits and validation (CEZI COLA: Risk)
+        with STAGES["validation"].time():
+            mins, maxs = SafetyController.get_limits_batch(columns)
+            is_safe = SafetyController.validate_batch(columns.types, columns.values, mins, maxs)
+        return columns, is_safe, maxs
+
+    def _decide(self, columns: TelemetryColumns, is_safe: np.ndarray, maxs: np.ndarray,
+                analyzed: Tuple[np.ndarray, ...]) -> BatchAnalysis:
+        z_score, is_anomaly, status, ttf_minutes = analyzed
+        if self.multivariate is not None:
+            with STAGES["multivariate"].time():
+                is_anomaly = self.multivariate.refine(columns, is_anomaly)
+
+        # 5. Mitigation Strategy (CEZI COLA: Risk)
+        with STAGES["mitigation"].time():
+            actions = SafetyController.get_mitigation_actions_batch(
+                columns.types, columns.values, np.asarray(BatchAnalysis.STATUSES)[status], is_anomaly, maxs
+            )
+
+        return BatchAnalysis(
+            columns=columns,
+            is_safe=is_safe,
+            is_anomaly=is_anomaly,
+            z_score=z_score,
+            status=status,
+            ttf_minutes=ttf_minutes,
+            actions=actions,
+            action_table=SafetyController.MITIGATION_ACTIONS,
+        )
+
+    def close(self):
+        """Releases engine resources; the in-process engine holds none."""
+
+    # --- Warm restarts ---
+
+    def capture_snapshot(self, path: str) -> Callable[[], int]:
+        """Copies the history now and returns a callable that writes it to `path`, safe to run off-thread."""
+        state = self.history.state()
+
+        def write() -> int:
+            SensorHistory.write_snapshot(path, state)
+            return len(state["ids"])
+        return write
+
+    def save_snapshot(self, path: str) -> int:
+        return self.history.save(path)
+
+    def load_snapshot(self, path: str) -> int:
+        """Replaces the history with a snapshot and returns the number of restored sensors."""
+        self.history = SensorHistory.load(path, self.window_size)
+        self.registry.attach(self.history)
+        return len(self.history)
+
+    # --- Sensor registry ---
+
+    def registry_stats(self) -> Dict[str, int]:
+        """Sensor counts and bytes per tier, plus eviction totals."""
+        stats = self.registry.stats(self.history)
+        stats["multivariate_bytes"] = self.multivariate.nbytes() if self.multivariate is not None else 0
+        return stats
+
+    def set_memory_budget(self, memory_budget: int):
+        self.registry.memory_budget = memory_budget
+
+    def warm_start(self, ids: Sequence[str], timestamps: Sequence[float], values: Sequence[float]) -> int:
+        """
+        Replays stored readings into the history windows without analyzing them.
+        Sensors that already have history (readings ingested since start-up) are left untouched.
+        Returns the number of sensors warmed.
+        """
+        known = self.history.index
+        keep = [i for i, sensor_id in enumerate(ids) if sensor_id not in known]
+        if not keep:
+            return 0
+        timestamps = np.asarray(timestamps, dtype=np.float64)[keep]
+        values = np.asarray(values, dtype=np.float64)[keep]
+        order = np.argsort(timestamps, kind="stable")
+        ids = [ids[keep[i]] for i in order.tolist()]
+        slots = self.history.slots(ids)
+        for rows in self._rounds(slots):
+            self.history.append_many(slots[rows], timestamps[order][rows], values[order][rows])
+        return len(set(ids))
+
+    def _analyze_columns(self, columns: TelemetryColumns, maxs: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """History update, z-scores and trend prediction for every reading of a batch."""
+        return self._analyze_rows(columns.ids, columns.values, maxs, self.clock.stamp(columns.timestamps, columns.packet))
+
+    def _analyze_rows(self, ids: List[str], values: np.ndarray, maxs: np.ndarray,
+                      times: Union[float, np.ndarray]) -> Tuple[np.ndarray, ...]:
+        """Stateful part of analyze_batch, applied to parallel id/value/limit columns observed at `times`."""
+        count = len(ids)
+        times = np.broadcast_to(np.asarray(times, dtype=np.float64), (count,))
+
+        # 2. History update; repeated sensors in one batch are applied in successive rounds,
+        # in event-time order. Readings behind their sensor's reordering window are scored but not added.
+        # Eviction follows arrival time and runs before the slots are taken, as it may renumber them.
+        arrival = time.time()
+        if count:
+            self.registry.maybe_maintain(self.history, arrival, self.multivariate)
+        slots = self.history.slots(ids)
+        self.history.touch(slots, arrival)
+        stats = {k: np.empty(count) for k in ("count", "mean", "std", "slope", "last")}
+        sequence = np.argsort(times, kind="stable") if count > 1 and (np.diff(times) < 0).any() else None
+        for rows in self._rounds(slots if sequence is None else slots[sequence]):
+            rows = rows if sequence is None else sequence[rows]
+            accepted = rows[self.clock.accept(times[rows], self.history.last_seen[slots[rows]])]
+            self.history.append_many(slots[accepted], times[accepted], values[accepted])
+            for key, column in self.history.stats_many(slots[rows]).items():
+                stats[key][rows] = column
+
+        # 3. Anomaly Detection (Z-Score)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z_score = np.abs((values - stats["mean"]) / stats["std"])
+        z_score[(stats["count"] < 5) | (stats["std"] == 0)] = 0.0
+        is_anomaly = z_score > self.z_threshold
+        for i in np.flatnonzero(is_anomaly):
+            logger.warning(f"ANOMALY: {ids[i]} value {values[i]} (Z:{z_score[i]:.2f})")
+
+        # 4. Predictive Maintenance (Trend Analysis)
+        slope, last = stats["slope"], stats["last"]
+        with np.errstate(invalid="ignore"):
+            rising = (stats["count"] >= 10) & ~np.isnan(maxs) & (slope > 0)
+        maintenance_val = maxs * self.maintenance_threshold_factor
+        below = last < maintenance_val
+        status = np.zeros(count, dtype=np.int64)
+        ttf_minutes = np.full(count, np.nan)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            seconds = np.where(below, maintenance_val - last, maxs - last) / slope
+        status[rising & below] = np.where(seconds[rising & below] > 3600, 1, 2)
+        status[rising & ~below] = 3
+        ttf_minutes[rising] = seconds[rising] / 60
+        return z_score, is_anomaly, status, ttf_minutes
+
+    @staticmethod
+    def _rounds(slots: np.ndarray) -> List[np.ndarray]:
+        """Splits row indices into rounds in which every slot appears at most once, preserving order."""
+        if len(slots) == 0:
+            return []
+        order = np.argsort(slots, kind="stable")
+        ordered = slots[order]
+        starts = np.r_[True, ordered[1:] != ordered[:-1]]
+        positions = np.arange(len(ordered))
+        rank = np.empty(len(slots), dtype=np.int64)
+        rank[order] = positions - np.maximum.accumulate(np.where(starts, positions, 0))
+        if rank.max() == 0:
+            return [np.arange(len(slots))]
+        # One stable sort by rank instead of a full scan per round (bulk uploads and replays have many)
+        by_rank = np.argsort(rank, kind="stable")
+        return np.split(by_rank, np.cumsum(np.bincount(rank))[:-1])
+
+    def _detect_anomaly(self, sensor_id: str, slot: int, value: float) -> Tuple[bool, float]:
+        if self.history.size(slot) < 5:
             return False, 0.0
             
-        mean = np.mean(data)
-        std = np.std(data)
+        mean, std = self.history.mean_std(slot)
         
         if std == 0:
             return False, 0.0
             
         z_score = abs((value - mean) / std)
-        is_anomaly = bool(z_score > 3.0)
+        is_anomaly = bool(z_score > self.z_threshold)
         
         if is_anomaly:
             logger.warning(f"ANOMALY: {sensor_id} value {value} (Z:{z_score:.2f})")
             
         return is_anomaly, float(z_score)
 
-    def _predict_trend(self, sensor_id: str, sensor_type: str, limits: Optional[Dict[str, float]]) -> Dict:
+    def _predict_trend(self, slot: int, sensor_type: str, limits: Optional[Dict[str, float]]) -> Dict:
         """
         Calculates the slope of the data to predict when it will hit critical limits.
         """
-        history = self.history[sensor_id]
-        if len(history) < 10 or not limits:
+        if self.history.size(slot) < 10 or not limits:
             return {"status": "stable", "ttf_minutes": None}
 
-        # Linear Regression: y = mx + b
-        x = np.array([t for t, _ in history])
-        y = np.array([v for _, v in history])
-        
-        # Normalize x to prevent large numbers
-        x_norm = x - x[0]
-        
-        try:
-            slope, intercept = np.polyfit(x_norm, y, 1)
-        except Exception:
+        # Linear Regression: y = mx + b, from the running sums of the window
+        slope = self.history.slope(slot)
+        if slope is None:
             return {"status": "stable", "ttf_minutes": None}
+        last = self.history.last_value(slot)
         
         # If slope is positive and we have a max limit
         if slope > 0 and "max" in limits:
@@ -90,8 +279,8 @@ class IntelligenceEngine:
             maintenance_val = critical_val * self.maintenance_threshold_factor
             
             # Time to reach maintenance threshold
-            if y[-1] < maintenance_val:
-                seconds_to_maint = (maintenance_val - y[-1]) / slope
+            if last < maintenance_val:
+                seconds_to_maint = (maintenance_val - last) / slope
                 status = "optimal" if seconds_to_maint > 3600 else "maintenance_required"
                 return {
                     "status": status,
@@ -101,7 +290,7 @@ class IntelligenceEngine:
             else:
                 return {
                     "status": "critical_approaching",
-                    "ttf_minutes": float(round((critical_val - y[-1]) / slope / 60, 1)),
+                    "ttf_minutes": float(round((critical_val - last) / slope / 60, 1)),
                     "recommendation": "IMMEDIATE ACTION REQUIRED"
                 }
                 
@@ -0,0 +1,279 @@
+import re
+import numpy as np
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+from app.schemas.telemetry import TelemetryData
+
+RACK_PATTERN = re.compile(r"RACK-?[A-Za-z0-9]+", re.IGNORECASE)
+
+
+@lru_cache(maxsize=65536)
+def rack_from_id(sensor_id: str) -> str:
+    """Parses the rack out of sensor ids such as S00-RACK-012-TEMP-00 (-> RACK-012); bounded cache."""
+    match = RACK_PATTERN.search(sensor_id)
+    return match.group(0).upper() if match else "unassigned"
+
+
+class TelemetryColumns:
+    """
+    Columnar view of one or many telemetry packets.
+    Every reading is a row across parallel arrays, and `packet` maps each row back
+    to the packet (timestamp + metadata) it arrived in.
+    """
+
+    def __init__(
+        self,
+        ids: List[str],
+        types: np.ndarray,
+        values: np.ndarray,
+        units: List[str],
+        packet: np.ndarray,
+        timestamps: List[float],
+        metadata: List[dict],
+    ):
+        self.ids = ids
+        self.types = types
+        self.values = values
+        self.units = units
+        self.packet = packet
+        self.timestamps = timestamps
+        self.metadata = metadata
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def packet_count(self) -> int:
+        return len(self.metadata)
+
+    def device_types(self) -> List[str]:
+        return [(meta or {}).get("device_type", "datacenter") for meta in self.metadata]
+
+    def sites(self) -> List[str]:
+        """Site per packet."""
+        return [str((meta or {}).get("site", "unknown")) for meta in self.metadata]
+
+    def racks(self) -> List[str]:
+        """Rack per reading: packet metadata `rack` when present, otherwise parsed from the sensor id."""
+        meta_racks = [(meta or {}).get("rack") for meta in self.metadata]
+        if all(r is not None for r in meta_racks):
+            per_packet = [str(r) for r in meta_racks]
+            return [per_packet[p] for p in self.packet.tolist()]
+        return [
+            str(meta_racks[p]) if meta_racks[p] is not None else rack_from_id(sensor_id)
+            for sensor_id, p in zip(self.ids, self.packet.tolist())
+        ]
+
+    def packet_bounds(self) -> np.ndarray:
+        """Row offsets delimiting each packet: rows of packet i are [bounds[i], bounds[i + 1])."""
+        return np.searchsorted(self.packet, np.arange(self.packet_count + 1))
+
+    def take(self, rows: np.ndarray) -> "TelemetryColumns":
+        """Subset of the readings (ascending `rows`); packets keep their positions, possibly without readings."""
+        ids, units = self.ids, self.units
+        selected = rows.tolist()
+        return TelemetryColumns(
+            [ids[i] for i in selected], self.types[rows], self.values[rows], [units[i] for i in selected],
+            self.packet[rows], self.timestamps, self.metadata,
+        )
+
+    @classmethod
+    def from_packets(cls, packets: Iterable[TelemetryData]) -> "TelemetryColumns":
+        ids, types, values, units, packet = [], [], [], [], []
+        timestamps, metadata = [], []
+        for i, data in enumerate(packets):
+            timestamps.append(data.timestamp)
+            metadata.append(data.metadata or {})
+            for sensor in data.sensors:
+                ids.append(sensor.id)
+                types.append(sensor.type)
+                values.append(sensor.value)
+                units.append(sensor.unit)
+            packet.extend([i] * len(data.sensors))
+        return cls(
+            ids=ids,
+            types=np.asarray(types, dtype=str),
+            values=np.asarray(values, dtype=np.float64),
+            units=units,
+            packet=np.asarray(packet, dtype=np.int64),
+            timestamps=timestamps,
+            metadata=metadata,
+        )
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict]) -> "TelemetryColumns":
+        """
+        Builds columns from already-decoded packet dicts (e.g. NDJSON lines) with the
+        TelemetryData layout, checking the contract without building a Pydantic model per reading.
+        """
+        ids, types, values, units, packet = [], [], [], [], []
+        timestamps, metadata = [], []
+        for i, record in enumerate(records):
+            try:
+                sensors = record["sensors"]
+                timestamps.append(float(record["timestamp"]))
+                for sensor in sensors:
+                    ids.append(str(sensor["id"]))
+                    types.append(str(sensor["type"]))
+                    values.append(sensor["value"])
+                    units.append(str(sensor["unit"]))
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(f"packet {i}: malformed telemetry ({type(e).__name__}: {e})")
+            meta = record.get("metadata") or {}
+            if not isinstance(meta, dict):
+                raise ValueError(f"packet {i}: metadata must be an object")
+            metadata.append(meta)
+            packet.extend([i] * len(sensors))
+        return cls(
+            ids=ids,
+            types=np.asarray(types, dtype=str),
+            values=cls._float_column(values, packet),
+            units=units,
+            packet=np.asarray(packet, dtype=np.int64),
+            timestamps=timestamps,
+            metadata=metadata,
+        )
+
+    @classmethod
+    def from_columnar(cls, blocks: Iterable[dict]) -> "TelemetryColumns":
+        """
+        Builds columns from compact columnar packets: each block carries `timestamp`, optional
+        `metadata` and the parallel arrays `ids`, `types`, `values` and `units`.
+        """
+        ids, types, values, units, packet = [], [], [], [], []
+        timestamps, metadata = [], []
+        for i, block in enumerate(blocks):
+            try:
+                block_ids = block["ids"]
+                size = len(block_ids)
+                if not (len(block["types"]) == len(block["values"]) == len(block["units"]) == size):
+                    raise ValueError("column lengths differ")
+                timestamps.append(float(block["timestamp"]))
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(f"packet {i}: malformed columnar block ({type(e).__name__}: {e})")
+            meta = block.get("metadata") or {}
+            if not isinstance(meta, dict):
+                raise ValueError(f"packet {i}: metadata must be an object")
+            metadata.append(meta)
+            ids.extend(block_ids)
+            types.extend(block["types"])
+            values.extend(block["values"])
+            units.extend(block["units"])
+            packet.append(np.full(size, i, dtype=np.int64))
+        packet = np.concatenate(packet) if packet else np.zeros(0, dtype=np.int64)
+        return cls(
+            ids=[str(sid) for sid in ids],
+            types=np.asarray(types, dtype=str),
+            values=cls._float_column(values, packet),
+            units=[str(unit) for unit in units],
+            packet=packet,
+            timestamps=timestamps,
+            metadata=metadata,
+        )
+
+    # Same contract as SensorReading.value: finite real numbers, no bools, strings or nulls
+    NUMBER_TYPES = frozenset((int, float))
+
+    @classmethod
+    def _float_column(cls, values: list, packet) -> np.ndarray:
+        if set(map(type, values)) <= cls.NUMBER_TYPES:
+            try:
+                column = np.asarray(values, dtype=np.float64)
+                if np.isfinite(column).all():
+                    return column
+            except OverflowError:
+                pass
+        # Error path only: name the first offending reading
+        packet = np.asarray(packet, dtype=np.int64)
+        for i, value in enumerate(values):
+            if type(value) not in cls.NUMBER_TYPES or not cls._finite(value):
+                p = int(packet[i])
+                sensor = i - int(np.searchsorted(packet, p))
+                raise ValueError(f"packet {p}, sensor {sensor}: value must be a finite number, got {value!r:.40}")
+        raise ValueError("sensor values must be finite numbers")
+
+    @staticmethod
+    def _finite(value) -> bool:
+        try:
+            return bool(np.isfinite(float(value)))
+        except OverflowError:
+            return False
+
+
+class BatchAnalysis:
+    """
+    Result arrays of IntelligenceEngine.analyze_batch, one entry per reading.
+    Materializes the same per-sensor dicts as the scalar path only when a report is requested.
+    """
+
+    STATUSES = ("stable", "optimal", "maintenance_required", "critical_approaching")
+
+    def __init__(
+        self,
+        columns: TelemetryColumns,
+        is_safe: np.ndarray,
+        is_anomaly: np.ndarray,
+        z_score: np.ndarray,
+        status: np.ndarray,
+        ttf_minutes: np.ndarray,
+        actions: np.ndarray,
+        action_table: tuple,
+    ):
+        self.columns = columns
+        self.is_safe = is_safe
+        self.is_anomaly = is_anomaly
+        self.z_score = z_score
+        self.status = status
+        self.ttf_minutes = ttf_minutes
+        self.actions = actions
+        self.action_table = action_table
+
+    def safety_violations(self, start: int = 0, stop: Optional[int] = None) -> int:
+        return int((~self.is_safe[start:stop]).sum())
+
+    def _prediction(self, status: int, ttf_minutes: float, sensor_type: str) -> Dict:
+        prediction = {"status": self.STATUSES[status], "ttf_minutes": None}
+        if status:
+            prediction["ttf_minutes"] = float(round(ttf_minutes, 1))
+            if status == 3:
+                prediction["recommendation"] = "IMMEDIATE ACTION REQUIRED"
+            else:
+                prediction["recommendation"] = "Check cooling systems" if sensor_type == "temperature" else "Balance load"
+        return prediction
+
+    def analysis(self, i: int) -> Dict:
+        return {
+            "is_anomaly": bool(self.is_anomaly[i]),
+            "z_score": float(round(float(self.z_score[i]), 2)),
+            "prediction": self._prediction(int(self.status[i]), float(self.ttf_minutes[i]), self.columns.types[i]),
+        }
+
+    def action(self, i: int) -> Optional[dict]:
+        code = int(self.actions[i])
+        return dict(self.action_table[code]) if code >= 0 else None
+
+    def intelligence_report(self, start: int = 0, stop: Optional[int] = None) -> List[Dict]:
+        """Per-sensor report entries for rows [start, stop), shaped like receive_telemetry's."""
+        window = slice(start, stop)
+        # Convert columns to Python lists once; per-element NumPy indexing dominates otherwise
+        ids = self.columns.ids[window]
+        types = self.columns.types[window].tolist()
+        anomalies = self.is_anomaly[window].tolist()
+        z_scores = self.z_score[window].tolist()
+        statuses = self.status[window].tolist()
+        ttfs = self.ttf_minutes[window].tolist()
+        actions = self.actions[window].tolist()
+        table = self.action_table
+        return [
+            {
+                "sensor_id": ids[i],
+                "analysis": {
+                    "is_anomaly": anomalies[i],
+                    "z_score": float(round(z_scores[i], 2)),
+                    "prediction": self._prediction(statuses[i], ttfs[i], types[i]),
+                },
+                "action": dict(table[actions[i]]) if actions[i] >= 0 else None,
+            }
+            for i in range(len(ids))
+        ]
@@ -0,0 +1,38 @@
+import numpy as np
+
+
+def lttb(t: np.ndarray, v: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of `threshold` points of the (t, v) series that keep
+    its visual shape. The first and last points are always kept; every bucket in between keeps
+    the point forming the largest triangle with the previously kept point and the next bucket's mean.
+    """
+    count = len(t)
+    if threshold >= count:
+        return np.arange(count)
+    if threshold < 3:
+        return np.array([0, count - 1][:max(threshold, 0)], dtype=np.int64)
+
+    # Bucket edges over the inner points [1, count - 1)
+    edges = (1 + np.arange(threshold - 1) * (count - 2) / (threshold - 2)).astype(np.int64)
+    edges[-1] = count - 1
+    # Means of every bucket, from prefix sums (the last "bucket" is the final point)
+    t_sum = np.concatenate(([0.0], np.cumsum(t)))
+    v_sum = np.concatenate(([0.0], np.cumsum(v)))
+    starts = np.append(edges[:-1], count - 1)
+    stops = np.append(edges[1:], count)
+    sizes = stops - starts
+    t_mean = (t_sum[stops] - t_sum[starts]) / sizes
+    v_mean = (v_sum[stops] - v_sum[starts]) / sizes
+
+    picked = np.empty(threshold, dtype=np.int64)
+    picked[0] = 0
+    picked[-1] = count - 1
+    previous = 0
+    for b in range(threshold - 2):
+        lo, hi = edges[b], edges[b + 1]
+        ta, va = t[previous], v[previous]
+        area = np.abs((ta - t_mean[b + 1]) * (v[lo:hi] - va) - (ta - t[lo:hi]) * (v_mean[b + 1] - va))
+        previous = lo + int(np.argmax(area))
+        picked[b + 1] = previous
+    return picked
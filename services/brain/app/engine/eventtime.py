@@ -0,0 +1,58 @@
+import os
+import time
+from typing import Optional
+
+import numpy as np
+
+from app.core.metrics import EVENT_TIME_READINGS
+
+TIME_MODES = ("event", "arrival")
+
+
+class EventClock:
+    """
+    Decides the time a reading is analyzed at (CEZI COLA: Intelligence).
+    In "event" mode readings carry their packet's own timestamp, so buffered or resent packets
+    land where they belong in the trend regression; timestamps more than `max_skew` seconds
+    ahead of the brain's clock (or not finite) fall back to arrival time. Readings older than
+    their sensor's newest reading by up to `reorder_window` seconds are still folded into the
+    history (the running sums do not depend on arrival order); later ones are scored against
+    the window but not added to it. "arrival" mode keeps the old wall-clock stamping.
+    """
+
+    def __init__(self, mode: str = "event", reorder_window: float = 60.0, max_skew: float = 300.0):
+        if mode not in TIME_MODES:
+            raise ValueError(f"Unknown engine time mode '{mode}', expected one of {TIME_MODES}")
+        self.mode = mode
+        self.reorder_window = reorder_window
+        self.max_skew = max_skew
+
+    @classmethod
+    def from_env(cls) -> "EventClock":
+        return cls(
+            mode=os.getenv("ENGINE_TIME_MODE", "event"),
+            reorder_window=float(os.getenv("ENGINE_REORDER_WINDOW", 60)),
+            max_skew=float(os.getenv("ENGINE_MAX_CLOCK_SKEW", 300)),
+        )
+
+    def stamp(self, timestamps, packet: np.ndarray, now: Optional[float] = None) -> np.ndarray:
+        """Analysis time of every reading, from the per-packet `timestamps` and the row -> packet map."""
+        now = time.time() if now is None else now
+        if self.mode == "arrival":
+            return np.full(len(packet), now)
+        stamps = np.asarray(timestamps, dtype=np.float64)
+        invalid = ~np.isfinite(stamps) | (stamps > now + self.max_skew)
+        if invalid.any():
+            stamps = np.where(invalid, now, stamps)
+            EVENT_TIME_READINGS["clamped"].inc(int(np.count_nonzero(invalid[packet])))
+        return stamps[packet]
+
+    def accept(self, times: np.ndarray, last_seen: np.ndarray) -> np.ndarray:
+        """Mask of readings recent enough to enter their sensor's history window."""
+        behind = times < last_seen
+        if not behind.any():
+            return np.ones(len(times), dtype=bool)
+        accepted = times >= last_seen - self.reorder_window
+        EVENT_TIME_READINGS["reordered"].inc(int(np.count_nonzero(behind & accepted)))
+        EVENT_TIME_READINGS["late"].inc(int(np.count_nonzero(~accepted)))
+        return accepted
@@ -0,0 +1,410 @@
+import os
+import sys
+import json
+import struct
+import numpy as np
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class SensorHistory:
+    """
+    Compact store for the recent (timestamp, value) window of every sensor.
+    Each sensor owns one slot (row) of preallocated 2-D NumPy ring buffers, and
+    running sums are kept per slot so mean, std and the least-squares slope are
+    available in O(1) per reading instead of being rebuilt from the whole window.
+    Released slots (evicted sensors) are recycled before the arrays grow, and compact()
+    shrinks them again after a burst of sensors went away.
+    """
+
+    # Columns of the running-sum matrix
+    SX, SY, SXY, SXX, SYY = range(5)
+
+    # Snapshot layout: magic, header length, JSON header, then 64-byte aligned raw arrays
+    SNAPSHOT_MAGIC = b"HLXHIST1"
+    SNAPSHOT_ARRAYS = ("times", "values", "count", "head", "t0", "v0", "sums", "last_seen", "latest", "touched")
+    ARRAYS = SNAPSHOT_ARRAYS
+
+    def __init__(self, window_size: int = 30, initial_capacity: int = 1024):
+        self.window_size = window_size
+        self.index: Dict[str, int] = {}
+        # Slot -> sensor id (None for free slots), high-water mark and recycled slots
+        self.slot_ids: List[Optional[str]] = []
+        self.used = 0
+        self._free: List[int] = []
+        self.id_bytes = 0
+        # Called as hook(history, sensor_id, slot) when a sensor gets a fresh slot (cold-tier restore)
+        self.restore_hook: Optional[Callable[["SensorHistory", str, int], None]] = None
+        self._allocate(max(1, initial_capacity))
+
+    def _allocate(self, capacity: int):
+        self.capacity = capacity
+        self.times = np.zeros((capacity, self.window_size), dtype=np.float64)
+        self.values = np.zeros((capacity, self.window_size), dtype=np.float64)
+        self.count = np.zeros(capacity, dtype=np.int64)
+        self.head = np.zeros(capacity, dtype=np.int64)
+        # Per-slot origins: sums are taken over (t - t0, v - v0) to keep them well conditioned
+        self.t0 = np.zeros(capacity, dtype=np.float64)
+        self.v0 = np.zeros(capacity, dtype=np.float64)
+        self.sums = np.zeros((capacity, 5), dtype=np.float64)
+        # Event time of the latest reading per slot, for the reordering window
+        self.last_seen = np.zeros(capacity, dtype=np.float64)
+        # Value of that latest reading; a late one within the reordering window joins the window
+        # but does not become the sensor's current value
+        self.latest = np.zeros(capacity, dtype=np.float64)
+        # Wall-clock arrival of the latest reading per slot, for idle/LRU eviction; event times
+        # cannot drive eviction, one reading stamped in the future would age out every other sensor
+        self.touched = np.zeros(capacity, dtype=np.float64)
+        self.slot_ids.extend([None] * (capacity - len(self.slot_ids)))
+
+    def _grow(self, capacity: int):
+        old = [getattr(self, name) for name in self.ARRAYS]
+        self._allocate(capacity)
+        for name, prev in zip(self.ARRAYS, old):
+            getattr(self, name)[:self.used] = prev[:self.used]
+
+    def __contains__(self, sensor_id: str) -> bool:
+        return sensor_id in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def slot(self, sensor_id: str) -> int:
+        """Returns the slot of a sensor, assigning a fresh (or recycled) one on first sight."""
+        slot = self.index.get(sensor_id)
+        if slot is None:
+            if self._free:
+                slot = self._free.pop()
+            else:
+                slot = self.used
+                if slot >= self.capacity:
+                    self._grow(self.capacity * 2)
+                self.used += 1
+            self.index[sensor_id] = slot
+            self.slot_ids[slot] = sensor_id
+            self.id_bytes += sys.getsizeof(sensor_id)
+            if self.restore_hook is not None:
+                self.restore_hook(self, sensor_id, slot)
+        return slot
+
+    # --- Eviction and memory accounting ---
+
+    def release(self, slots: np.ndarray) -> List[str]:
+        """Forgets the sensors of `slots` and recycles the slots; returns the released sensor ids."""
+        slots = np.asarray(slots, dtype=np.int64)
+        released = []
+        for slot in slots.tolist():
+            sensor_id = self.slot_ids[slot]
+            if sensor_id is None:
+                continue
+            del self.index[sensor_id]
+            self.slot_ids[slot] = None
+            self.id_bytes -= sys.getsizeof(sensor_id)
+            self._free.append(slot)
+            released.append(sensor_id)
+        self.count[slots] = 0
+        self.head[slots] = 0
+        self.sums[slots] = 0.0
+        self.last_seen[slots] = 0.0
+        self.touched[slots] = 0.0
+        return released
+
+    def live_slots(self) -> np.ndarray:
+        return np.fromiter(self.index.values(), dtype=np.int64, count=len(self.index))
+
+    def touch(self, slots, now: float):
+        """Records the arrival of readings for `slots` at wall-clock time `now`."""
+        self.touched[slots] = now
+
+    def idle_slots(self, cutoff: float) -> np.ndarray:
+        """Slots whose latest reading arrived before `cutoff`."""
+        live = self.live_slots()
+        return live[self.touched[live] < cutoff]
+
+    def lru_slots(self, count: int) -> np.ndarray:
+        """The `count` least recently updated slots."""
+        live = self.live_slots()
+        if count >= len(live):
+            return live
+        return live[np.argpartition(self.touched[live], count)[:count]]
+
+    def bytes_per_sensor(self) -> int:
+        """Array bytes of one slot."""
+        return sum(getattr(self, name)[:1].nbytes for name in self.ARRAYS) + 8
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the history: arrays, sensor index and id strings."""
+        arrays = sum(getattr(self, name).nbytes for name in self.ARRAYS)
+        return arrays + sys.getsizeof(self.index) + sys.getsizeof(self.slot_ids) + self.id_bytes
+
+    def compact(self, capacity: Optional[int] = None):
+        """Packs the live slots into new arrays of `capacity` (default: next power of two)."""
+        live = self.live_slots()
+        capacity = max(capacity or 1 << max(10, int(len(live) - 1).bit_length()), len(live), 1)
+        old = [getattr(self, name)[live] for name in self.ARRAYS]
+        ids = [self.slot_ids[slot] for slot in live.tolist()]
+        self.slot_ids = []
+        self._allocate(capacity)
+        for name, prev in zip(self.ARRAYS, old):
+            getattr(self, name)[:len(live)] = prev
+        self.slot_ids[:len(ids)] = ids
+        self.index = {sensor_id: slot for slot, sensor_id in enumerate(ids)}
+        self.used = len(ids)
+        self._free = []
+
+    def export(self, slot: int) -> Tuple[np.ndarray, np.ndarray]:
+        """The slot's (timestamps, values) window in arrival order."""
+        n = int(self.count[slot])
+        order = (np.arange(int(self.head[slot]) - n, int(self.head[slot]))) % self.window_size
+        return self.times[slot, order].copy(), self.values[slot, order].copy()
+
+    def restore(self, slot: int, timestamps: np.ndarray, values: np.ndarray):
+        """Refills a fresh slot with a window exported earlier."""
+        sensor_id = self.slot_ids[slot]
+        for timestamp, value in zip(timestamps.tolist()[-self.window_size:], values.tolist()[-self.window_size:]):
+            self.append(sensor_id, timestamp, value)
+
+    def append(self, sensor_id: str, timestamp: float, value: float) -> int:
+        """Pushes a reading into the sensor's ring buffer and updates its running sums."""
+        slot = self.slot(sensor_id)
+        n = int(self.count[slot])
+        h = int(self.head[slot])
+        sums = self.sums[slot]
+
+        if n == 0:
+            self.t0[slot] = timestamp
+            self.v0[slot] = value
+
+        if n == self.window_size:
+            # Evict the oldest reading, which sits where the new one is written
+            ox = self.times[slot, h] - self.t0[slot]
+            oy = self.values[slot, h] - self.v0[slot]
+            sums -= (ox, oy, ox * oy, ox * ox, oy * oy)
+        else:
+            self.count[slot] = n + 1
+
+        x = timestamp - self.t0[slot]
+        y = value - self.v0[slot]
+        sums += (x, y, x * y, x * x, y * y)
+        self.times[slot, h] = timestamp
+        self.values[slot, h] = value
+        if n == 0 or timestamp >= self.last_seen[slot]:
+            self.latest[slot] = value
+            self.last_seen[slot] = timestamp
+
+        h = (h + 1) % self.window_size
+        self.head[slot] = h
+        if h == 0:
+            # Once per lap: rebase origins and recompute sums exactly to cancel float drift
+            self._resync(slot)
+        return slot
+
+    def _resync(self, slot: int):
+        n = int(self.count[slot])
+        if n == 0:
+            self.sums[slot] = 0.0
+            return
+        oldest = (int(self.head[slot]) - n) % self.window_size
+        self.t0[slot] = self.times[slot, oldest]
+        self.v0[slot] = self.values[slot, oldest]
+        # Valid readings always occupy columns [0, n) of the slot
+        x = self.times[slot, :n] - self.t0[slot]
+        y = self.values[slot, :n] - self.v0[slot]
+        self.sums[slot] = (x.sum(), y.sum(), (x * y).sum(), (x * x).sum(), (y * y).sum())
+
+    def size(self, slot: int) -> int:
+        return int(self.count[slot])
+
+    def last_value(self, slot: int) -> float:
+        """Value of the reading with the newest event time."""
+        return float(self.latest[slot])
+
+    def mean_std(self, slot: int) -> Tuple[float, float]:
+        """Population mean and standard deviation of the window (as np.mean / np.std)."""
+        n = int(self.count[slot])
+        s = self.sums[slot]
+        mean = s[self.SY] / n
+        var = s[self.SYY] / n - mean * mean
+        # Guard against cancellation noise on (near-)constant series
+        if var <= 1e-12 * (s[self.SYY] / n):
+            var = 0.0
+        return float(mean + self.v0[slot]), float(np.sqrt(var))
+
+    def slope(self, slot: int) -> Optional[float]:
+        """Least-squares slope of value over time for the window, or None if undefined."""
+        n = int(self.count[slot])
+        s = self.sums[slot]
+        denom = n * s[self.SXX] - s[self.SX] * s[self.SX]
+        if n < 2 or denom <= 0:
+            return None
+        return float((n * s[self.SXY] - s[self.SX] * s[self.SY]) / denom)
+
+    def window(self, sensor_id: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the sensor's (timestamps, values) window in arrival order."""
+        return self.export(self.index[sensor_id])
+
+    # --- Vectorized paths used by IntelligenceEngine.analyze_batch ---
+
+    def slots(self, sensor_ids) -> np.ndarray:
+        """Maps many sensor ids to slots in one pass, assigning new slots as needed."""
+        index = self.index
+        out = np.fromiter((index.get(sid, -1) for sid in sensor_ids), dtype=np.int64, count=len(sensor_ids))
+        missing = np.flatnonzero(out < 0)
+        for i in missing:
+            out[i] = self.slot(sensor_ids[i])
+        return out
+
+    def append_many(self, slots: np.ndarray, timestamps: np.ndarray, values: np.ndarray):
+        """
+        Vectorized append of one reading per slot. Slots must be unique within the call;
+        callers split repeated sensors into successive rounds.
+        """
+        n = self.count[slots]
+        h = self.head[slots]
+
+        fresh = n == 0
+        self.t0[slots[fresh]] = timestamps[fresh]
+        self.v0[slots[fresh]] = values[fresh]
+        t0 = self.t0[slots]
+        v0 = self.v0[slots]
+
+        x = timestamps - t0
+        y = values - v0
+        delta = np.stack((x, y, x * y, x * x, y * y), axis=1)
+
+        full = n == self.window_size
+        if full.any():
+            ox = self.times[slots[full], h[full]] - t0[full]
+            oy = self.values[slots[full], h[full]] - v0[full]
+            delta[full] -= np.stack((ox, oy, ox * oy, ox * ox, oy * oy), axis=1)
+
+        self.sums[slots] += delta
+        self.count[slots] = np.minimum(n + 1, self.window_size)
+        self.times[slots, h] = timestamps
+        self.values[slots, h] = values
+        newest = fresh | (timestamps >= self.last_seen[slots])
+        self.latest[slots[newest]] = values[newest]
+        self.last_seen[slots[newest]] = timestamps[newest]
+
+        h = (h + 1) % self.window_size
+        self.head[slots] = h
+        wrapped = slots[h == 0]
+        if len(wrapped):
+            self._resync_many(wrapped)
+
+    def _resync_many(self, slots: np.ndarray):
+        # Only full rings wrap, so every reading of these slots is valid and column 0 is the oldest
+        self.t0[slots] = self.times[slots, 0]
+        self.v0[slots] = self.values[slots, 0]
+        x = self.times[slots] - self.t0[slots, None]
+        y = self.values[slots] - self.v0[slots, None]
+        self.sums[slots] = np.stack(
+            (x.sum(axis=1), y.sum(axis=1), (x * y).sum(axis=1), (x * x).sum(axis=1), (y * y).sum(axis=1)),
+            axis=1,
+        )
+
+    def stats_many(self, slots: np.ndarray) -> Dict[str, np.ndarray]:
+        """Window size, mean, std, slope (NaN if undefined) and the value at the newest event time for many slots."""
+        n = self.count[slots]
+        s = self.sums[slots]
+        nf = np.maximum(n, 1).astype(np.float64)
+
+        mean = s[:, self.SY] / nf
+        mean_sq = s[:, self.SYY] / nf
+        var = mean_sq - mean * mean
+        var[var <= 1e-12 * mean_sq] = 0.0
+
+        denom = nf * s[:, self.SXX] - s[:, self.SX] ** 2
+        valid = (n >= 2) & (denom > 0)
+        slope = np.full(len(slots), np.nan)
+        slope[valid] = (nf[valid] * s[valid, self.SXY] - s[valid, self.SX] * s[valid, self.SY]) / denom[valid]
+
+        return {
+            "count": n,
+            "mean": mean + self.v0[slots],
+            "std": np.sqrt(var),
+            "slope": slope,
+            "last": self.latest[slots],
+        }
+
+    # --- Snapshots for warm restarts ---
+
+    def state(self) -> Dict[str, object]:
+        """Consistent copy of the used slots, safe to write out from another thread."""
+        live = self.live_slots()
+        state = {name: getattr(self, name)[live] for name in self.SNAPSHOT_ARRAYS}
+        state["ids"] = list(self.index)
+        state["window_size"] = self.window_size
+        return state
+
+    @classmethod
+    def write_snapshot(cls, path: str, state: Dict[str, object]):
+        """Writes a state() atomically: readers see either the previous snapshot or the new one."""
+        ids = json.dumps(state["ids"]).encode()
+        arrays, offset = {}, 0
+        for name in cls.SNAPSHOT_ARRAYS:
+            array = state[name]
+            arrays[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+            offset += -(-array.nbytes // 64) * 64
+        header = json.dumps({
+            "window_size": state["window_size"],
+            "arrays": arrays,
+            "ids": {"offset": offset, "length": len(ids)},
+        }).encode()
+        prefix = len(cls.SNAPSHOT_MAGIC) + 8 + len(header)
+        base = -(-prefix // 64) * 64
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(cls.SNAPSHOT_MAGIC + struct.pack("<Q", len(header)) + header)
+            for name in cls.SNAPSHOT_ARRAYS:
+                f.seek(base + arrays[name]["offset"])
+                f.write(np.ascontiguousarray(state[name]).tobytes())
+            f.seek(base + offset)
+            f.write(ids)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def save(self, path: str) -> int:
+        self.write_snapshot(path, self.state())
+        return len(self.index)
+
+    @classmethod
+    def load(cls, path: str, window_size: Optional[int] = None) -> "SensorHistory":
+        """Restores a snapshot through memory-mapped views; raises ValueError if it does not fit."""
+        with open(path, "rb") as f:
+            if f.read(len(cls.SNAPSHOT_MAGIC)) != cls.SNAPSHOT_MAGIC:
+                raise ValueError(f"{path} is not a sensor history snapshot")
+            (length,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(length))
+        if window_size is not None and header["window_size"] != window_size:
+            raise ValueError(f"snapshot window {header['window_size']} differs from configured window {window_size}")
+        base = -(-(len(cls.SNAPSHOT_MAGIC) + 8 + length) // 64) * 64
+
+        raw = np.memmap(path, dtype=np.uint8, mode="r")
+        ids_meta = header["ids"]
+        ids: List[str] = json.loads(raw[base + ids_meta["offset"]:base + ids_meta["offset"] + ids_meta["length"]].tobytes())
+
+        history = cls(header["window_size"], initial_capacity=max(1024, len(ids)))
+        # Snapshots written before idle eviction existed count as seen when they were written
+        history.last_seen[:len(ids)] = os.path.getmtime(path)
+        history.touched[:len(ids)] = os.path.getmtime(path)
+        for name in cls.SNAPSHOT_ARRAYS:
+            meta = header["arrays"].get(name)
+            if meta is None:
+                continue
+            shape = tuple(meta["shape"])
+            if shape[0] != len(ids):
+                raise ValueError(f"snapshot array {name} does not match its sensor index")
+            view = np.ndarray(shape, dtype=np.dtype(meta["dtype"]), buffer=raw, offset=base + meta["offset"])
+            getattr(history, name)[:len(ids)] = view
+        if "latest" not in header["arrays"]:
+            # Older snapshots: the last reading appended stands in for the newest one
+            rows = np.arange(len(ids))
+            history.latest[rows] = history.values[rows, (history.head[rows] - 1) % history.window_size]
+        history.index = {sensor_id: slot for slot, sensor_id in enumerate(ids)}
+        history.slot_ids[:len(ids)] = ids
+        history.used = len(ids)
+        history.id_bytes = sum(sys.getsizeof(sensor_id) for sensor_id in ids)
+        return history
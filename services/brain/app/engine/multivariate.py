@@ -0,0 +1,323 @@
+import os
+import time
+import asyncio
+import importlib
+import importlib.util
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.engine.batch import TelemetryColumns
+
+logger = logging.getLogger("Helixa-Intelligence")
+
+GROUP_BY = ("rack", "site")
+
+
+class _GroupModel:
+    """Immutable scoring parameters of one group, published by the trainer."""
+    __slots__ = ("version", "scale", "mean", "components", "residual_std")
+
+    def __init__(self, version: int, scale: np.ndarray, mean: np.ndarray, components: np.ndarray, residual_std: np.ndarray):
+        self.version = version
+        self.scale = scale
+        self.mean = mean
+        self.components = components
+        self.residual_std = residual_std
+
+    def residuals(self, current: np.ndarray) -> np.ndarray:
+        """Reconstruction error of every feature of the group, in training residual deviations."""
+        x = current / self.scale - self.mean
+        return (x - (x @ self.components.T) @ self.components) / self.residual_std
+
+
+class _Group:
+    """Feature layout, latest values and training buffer of one rack or site."""
+    __slots__ = ("features", "version", "current", "seen", "buffer", "head", "filled", "unfitted", "last_sample")
+
+    def __init__(self, capacity: int):
+        self.features: Dict[str, int] = {}
+        self.version = 0
+        self.current = np.empty(0)
+        # Monotonic arrival time of the latest reading per feature
+        self.seen = np.empty(0)
+        self.buffer = np.empty((capacity, 0))
+        self.head = 0
+        self.filled = 0
+        self.unfitted = 0
+        self.last_sample = 0.0
+
+    def reset(self, features: Dict[str, int]):
+        """A sensor joining or leaving changes the feature layout; the group starts learning from scratch."""
+        current = np.full(len(features), np.nan)
+        seen = np.zeros(len(features))
+        for sensor_id, i in self.features.items():
+            j = features.get(sensor_id)
+            if j is not None:
+                current[j] = self.current[i]
+                seen[j] = self.seen[i]
+        self.features = features
+        self.version += 1
+        self.current = current
+        self.seen = seen
+        self.buffer = np.empty((len(self.buffer), len(features)))
+        self.head = self.filled = self.unfitted = 0
+
+    def sample(self):
+        self.buffer[self.head] = self.current
+        self.head = (self.head + 1) % len(self.buffer)
+        self.filled = min(len(self.buffer), self.filled + 1)
+        self.unfitted = min(len(self.buffer), self.unfitted + 1)
+
+    def recent(self, rows: int) -> np.ndarray:
+        idx = (self.head - rows + np.arange(rows)) % len(self.buffer)
+        return self.buffer[idx]
+
+    def nbytes(self) -> int:
+        # Arrays plus roughly 100 bytes per feature for the layout dict and its id
+        return self.buffer.nbytes + self.current.nbytes + self.seen.nbytes + 100 * len(self.features)
+
+
+class MultivariateDetector:
+    """
+    Cross-sensor anomaly detection per rack or site (CEZI COLA: Intelligence).
+    Every batch updates a vector with the latest value of each sensor of a group (temperatures,
+    PDU load, cooling flow, ...) and samples it into a training buffer. A background trainer
+    fits an IncrementalPCA per group on the new samples and publishes immutable scoring
+    parameters by swapping a dict reference, so the request path never waits on training.
+    Readings of a group with a model are anomalous when their reconstruction error exceeds
+    `threshold` training deviations and is among the group's largest: a load shift that moves
+    correlated sensors together is reconstructed and no longer flagged, while a sensor breaking
+    away from its peers is.
+    Readings without a model keep the per-sensor z-score decision.
+    Sensors that sent nothing for `ttl` seconds leave their group, and groups left empty are
+    dropped; an engine's SensorRegistry also counts the groups against its memory budget and
+    removes the sensors it evicts.
+    """
+
+    def __init__(
+        self,
+        group_by: str = "rack",
+        components: int = 2,
+        threshold: float = 4.0,
+        buffer_size: int = 2048,
+        min_samples: int = 200,
+        sample_interval: float = 1.0,
+        train_interval: float = 30.0,
+        max_features: int = 64,
+        ttl: float = 86400.0,
+    ):
+        if group_by not in GROUP_BY:
+            raise ValueError(f"Unknown multivariate grouping '{group_by}', expected one of {GROUP_BY}")
+        self.group_by = group_by
+        self.components = components
+        self.threshold = threshold
+        self.buffer_size = buffer_size
+        self.min_samples = min_samples
+        self.sample_interval = sample_interval
+        self.train_interval = train_interval
+        self.max_features = max_features
+        self.ttl = ttl
+        self.groups: Dict[str, _Group] = {}
+        # group -> _GroupModel; replaced as a whole by the trainer, read once per batch
+        self.models: Dict[str, _GroupModel] = {}
+        # Trainer-side incremental state: group -> (layout version, scale, IncrementalPCA, residual variance)
+        self._estimators: Dict[str, tuple] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls) -> Optional["MultivariateDetector"]:
+        """A detector when MULTIVARIATE_DETECTION is on, otherwise None."""
+        if os.getenv("MULTIVARIATE_DETECTION", "false").lower() not in ("1", "true", "yes"):
+            return None
+        # Located, not imported: scikit-learn is loaded by the start-up warm-up (preload)
+        if importlib.util.find_spec("sklearn") is None:
+            logger.error("MULTIVARIATE_DETECTION needs scikit-learn; falling back to per-sensor z-scores")
+            return None
+        return cls(
+            group_by=os.getenv("MULTIVARIATE_GROUP_BY", "rack"),
+            components=int(os.getenv("MULTIVARIATE_COMPONENTS", 2)),
+            threshold=float(os.getenv("MULTIVARIATE_THRESHOLD", 4.0)),
+            buffer_size=int(os.getenv("MULTIVARIATE_BUFFER_SIZE", 2048)),
+            min_samples=int(os.getenv("MULTIVARIATE_MIN_SAMPLES", 200)),
+            sample_interval=float(os.getenv("MULTIVARIATE_SAMPLE_INTERVAL", 1.0)),
+            train_interval=float(os.getenv("MULTIVARIATE_TRAIN_INTERVAL", 30)),
+            ttl=float(os.getenv("ENGINE_SENSOR_TTL_HOURS", 24)) * 3600,
+        )
+
+    def _keys(self, columns: TelemetryColumns) -> List[str]:
+        sites = columns.sites()
+        if self.group_by == "site":
+            return [sites[p] for p in columns.packet.tolist()]
+        return [f"{sites[p]}/{rack}" for p, rack in zip(columns.packet.tolist(), columns.racks())]
+
+    def refine(self, columns: TelemetryColumns, is_anomaly: np.ndarray) -> np.ndarray:
+        """
+        Updates the group vectors with a batch and returns its anomaly flags, decided by the
+        group model wherever one is published. Runs on the request path: array math only.
+        """
+        if not len(columns):
+            return is_anomaly
+        now = time.monotonic()
+        models = self.models
+        keys = self._keys(columns)
+        rows_by_group: Dict[str, List[int]] = {}
+        for i, key in enumerate(keys):
+            rows_by_group.setdefault(key, []).append(i)
+
+        refined = is_anomaly.copy()
+        values = columns.values
+        for key, rows in rows_by_group.items():
+            group = self.groups.get(key)
+            if group is None:
+                group = self.groups[key] = _Group(self.buffer_size)
+            ids = [columns.ids[i] for i in rows]
+            features = group.features
+            unseen = [s for s in dict.fromkeys(ids) if s not in features]
+            if unseen and len(features) < self.max_features:
+                grown = dict(features)
+                for sensor_id in unseen[:self.max_features - len(features)]:
+                    grown[sensor_id] = len(grown)
+                group.reset(grown)
+                features = grown
+            slots = np.array([features.get(s, -1) for s in ids], dtype=np.int64)
+            known = slots >= 0
+            # Later readings of a sensor in the same batch win, like in the history windows
+            group.current[slots[known]] = values[np.asarray(rows)[known]]
+            group.seen[slots[known]] = now
+
+            if len(features) < 2 or np.isnan(group.current).any():
+                continue
+            if now - group.last_sample >= self.sample_interval:
+                group.last_sample = now
+                group.sample()
+
+            model = models.get(key)
+            if model is None or model.version != group.version:
+                continue
+            residuals = np.abs(model.residuals(group.current))
+            # The projection smears one sensor's error over its peers; blame the dominant contributors
+            flagged = (residuals > self.threshold) & (residuals >= 0.5 * residuals.max())
+            scored = np.asarray(rows)[known]
+            refined[scored] = flagged[slots[known]]
+        return refined
+
+    # --- Memory bounds ---
+
+    def nbytes(self) -> int:
+        """Approximate memory of the group vectors and training buffers."""
+        return sum(group.nbytes() for group in self.groups.values())
+
+    def forget(self, sensor_ids) -> int:
+        """Removes sensors from their groups (e.g. evicted from the history); returns groups dropped."""
+        gone = set(sensor_ids)
+        return self._prune(lambda group: [s for s in group.features if s not in gone])
+
+    def expire(self, cutoff: float) -> int:
+        """Removes sensors whose latest reading arrived before the monotonic `cutoff`; returns groups dropped."""
+        return self._prune(lambda group: [s for s, i in group.features.items() if group.seen[i] >= cutoff])
+
+    def _prune(self, keep) -> int:
+        dropped = []
+        for key, group in list(self.groups.items()):
+            kept = keep(group)
+            if len(kept) == len(group.features):
+                continue
+            if kept:
+                group.reset({sensor_id: i for i, sensor_id in enumerate(kept)})
+            else:
+                del self.groups[key]
+                self._estimators.pop(key, None)
+                dropped.append(key)
+        if dropped:
+            self.models = {key: model for key, model in self.models.items() if key in self.groups}
+            logger.info(f"Dropped {len(dropped)} multivariate groups without live sensors")
+        return len(dropped)
+
+    # --- Background training ---
+
+    def preload(self):
+        """Imports scikit-learn (blocking) so the first training round does not pay for it."""
+        importlib.import_module("sklearn.decomposition")
+
+    async def start(self):
+        if self._task is None and self.train_interval > 0:
+            self._task = asyncio.create_task(self._run(), name="helixa-multivariate-trainer")
+            logger.info(f"Multivariate detection per {self.group_by}, retraining every {self.train_interval:.0f}s")
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.train_interval)
+            if self.ttl > 0:
+                self.expire(time.monotonic() - self.ttl)
+            await self.train()
+
+    def _jobs(self) -> List[tuple]:
+        """Copies the unfitted samples of every group that has enough of them (event loop side)."""
+        jobs = []
+        for key, group in self.groups.items():
+            if group.filled < self.min_samples or group.unfitted == 0:
+                continue
+            # A fresh layout first trains on everything buffered, afterwards only on new samples
+            fresh = self._estimators.get(key, (None,))[0] != group.version
+            rows = group.filled if fresh else group.unfitted
+            jobs.append((key, group.version, group.recent(rows)))
+            group.unfitted = 0
+        return jobs
+
+    def _fit(self, jobs: List[tuple]) -> Dict[str, _GroupModel]:
+        """Incremental fits off the event loop; returns the models to publish."""
+        from sklearn.decomposition import IncrementalPCA
+
+        fitted = {}
+        for key, version, samples in jobs:
+            state = self._estimators.get(key)
+            if state is None or state[0] != version:
+                scale = np.maximum(np.abs(samples).mean(axis=0), 1e-9)
+                n_components = max(1, min(self.components, samples.shape[1] - 1))
+                state = (version, scale, IncrementalPCA(n_components=n_components), None)
+            _, scale, estimator, residual_var = state
+            x = samples / scale
+            if len(x) < estimator.n_components:
+                continue
+            estimator.partial_fit(x)
+            centered = x - estimator.mean_
+            residual = centered - (centered @ estimator.components_.T) @ estimator.components_
+            batch_var = residual.var(axis=0)
+            # Residual spread is smoothed across fits so one quiet batch cannot shrink it
+            residual_var = batch_var if residual_var is None else 0.8 * residual_var + 0.2 * batch_var
+            self._estimators[key] = (version, scale, estimator, residual_var)
+            fitted[key] = _GroupModel(
+                version, scale.copy(), estimator.mean_.copy(), estimator.components_.copy(),
+                np.sqrt(np.maximum(residual_var, 1e-12)) + 1e-3,
+            )
+        return fitted
+
+    async def train(self) -> int:
+        """One training round; returns the number of group models published."""
+        jobs = self._jobs()
+        if not jobs:
+            return 0
+        started = time.perf_counter()
+        try:
+            fitted = await asyncio.to_thread(self._fit, jobs)
+        except Exception as e:
+            logger.error(f"Multivariate training failed: {str(e)}")
+            return 0
+        # Atomic swap: the request path sees either the old or the new dict, never a partial update
+        self.models = {**self.models, **{k: m for k, m in fitted.items() if k in self.groups and self.groups[k].version == m.version}}
+        for key in [key for key in self._estimators if key not in self.groups]:
+            # Groups dropped while their fit was running
+            del self._estimators[key]
+        logger.info(f"Trained {len(fitted)} multivariate models in {time.perf_counter() - started:.2f}s")
+        return len(fitted)
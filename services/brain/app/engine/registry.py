@@ -0,0 +1,227 @@
+import os
+import time
+import zlib
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from app.engine.history import SensorHistory
+
+logger = logging.getLogger("Helixa-Intelligence")
+
+
+class ColdTier:
+    """
+    Compressed windows of sensors demoted from the hot history, bounded by `budget` bytes.
+    Timestamps are stored as float32 offsets from the window's first reading, values as float64,
+    both zlib-compressed; the least recently demoted entries are dropped first when full.
+    """
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.nbytes = 0
+        # sensor_id -> (demoted at, compressed window)
+        self.entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def put(self, sensor_id: str, timestamps: np.ndarray, values: np.ndarray, now: float):
+        if not len(timestamps):
+            return
+        base = timestamps[0]
+        blob = zlib.compress(
+            np.float64(base).tobytes() + (timestamps - base).astype(np.float32).tobytes() + values.astype(np.float64).tobytes(), 1
+        )
+        self.discard(sensor_id)
+        self.entries[sensor_id] = (now, blob)
+        self.nbytes += len(blob)
+        while self.nbytes > self.budget and self.entries:
+            _, (_, dropped) = self.entries.popitem(last=False)
+            self.nbytes -= len(dropped)
+            self.dropped += 1
+
+    def pop(self, sensor_id: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        entry = self.entries.pop(sensor_id, None)
+        if entry is None:
+            return None
+        self.nbytes -= len(entry[1])
+        raw = zlib.decompress(entry[1])
+        count = (len(raw) - 8) // 12
+        base = np.frombuffer(raw, dtype=np.float64, count=1)[0]
+        offsets = np.frombuffer(raw, dtype=np.float32, count=count, offset=8)
+        values = np.frombuffer(raw, dtype=np.float64, count=count, offset=8 + 4 * count)
+        return base + offsets.astype(np.float64), values.copy()
+
+    def discard(self, sensor_id: str):
+        entry = self.entries.pop(sensor_id, None)
+        if entry is not None:
+            self.nbytes -= len(entry[1])
+
+    def expire(self, cutoff: float) -> int:
+        """Drops entries demoted before `cutoff`; entries are kept in demotion order."""
+        expired = 0
+        while self.entries:
+            sensor_id, (demoted, _) = next(iter(self.entries.items()))
+            if demoted >= cutoff:
+                break
+            self.discard(sensor_id)
+            expired += 1
+        return expired
+
+
+class SensorRegistry:
+    """
+    Bounds the per-sensor state of an engine (CEZI COLA: Efficiency).
+    Sensors that sent nothing for `ttl` seconds are forgotten; beyond `max_sensors` or the
+    `memory_budget` (bytes) the least recently updated sensors are evicted to the cold tier,
+    which restores their window if they come back. Freed slots are reused, and the arrays are
+    compacted when most of them are empty, so memory follows the live sensor count instead of
+    every id ever seen. Maintenance runs at most every `check_interval` seconds on the
+    analysis path and costs one pass over the live slots. Idleness and recency are measured
+    in arrival (wall-clock) time, never in the event time the readings carry.
+    A multivariate detector passed to maintain() shares the memory budget and loses the
+    sensors evicted from the history.
+    """
+
+    # Evict down to this fraction of the limit so a full registry does not evict on every check
+    HEADROOM = 0.9
+
+    def __init__(self, ttl: float = 86400.0, max_sensors: int = 0, memory_budget: int = 0,
+                 cold_budget: int = 0, check_interval: float = 30.0):
+        self.ttl = ttl
+        self.max_sensors = max_sensors
+        self.memory_budget = memory_budget
+        self.check_interval = check_interval
+        self.cold = ColdTier(cold_budget) if cold_budget > 0 else None
+        self.evicted = {"idle": 0, "lru": 0}
+        self.restored = 0
+        self._next_check = 0.0
+
+    @classmethod
+    def from_env(cls) -> "SensorRegistry":
+        return cls(
+            ttl=float(os.getenv("ENGINE_SENSOR_TTL_HOURS", 24)) * 3600,
+            max_sensors=int(os.getenv("ENGINE_MAX_SENSORS", 0)),
+            memory_budget=int(float(os.getenv("ENGINE_MEMORY_BUDGET_MB", 0)) * 1024 * 1024),
+            cold_budget=int(float(os.getenv("ENGINE_COLD_TIER_MB", 0)) * 1024 * 1024),
+            check_interval=float(os.getenv("ENGINE_REGISTRY_CHECK_INTERVAL", 30)),
+        )
+
+    def attach(self, history: SensorHistory):
+        history.restore_hook = self.restore if self.cold is not None else None
+
+    def restore(self, history: SensorHistory, sensor_id: str, slot: int):
+        """Restore hook of the history: refills a returning sensor from the cold tier."""
+        window = self.cold.pop(sensor_id)
+        if window is not None:
+            history.restore(slot, *window)
+            self.restored += 1
+
+    def limit(self, history: SensorHistory, reserved: int = 0) -> int:
+        """Hot sensors allowed by max_sensors and the memory budget less `reserved` bytes; 0 means unbounded."""
+        limits = []
+        if self.max_sensors > 0:
+            limits.append(self.max_sensors)
+        if self.memory_budget > 0:
+            # Ids and index entries are not in bytes_per_sensor; count them at their current average
+            per_sensor = history.bytes_per_sensor() + (history.id_bytes / max(1, len(history))) + 100
+            limits.append(max(1, int((self.memory_budget - reserved) / per_sensor)))
+        return min(limits) if limits else 0
+
+    def maybe_maintain(self, history: SensorHistory, now: float, detector=None):
+        """Runs maintain() when due; `now` is the wall-clock arrival time of the current readings."""
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            self.maintain(history, now, detector)
+
+    def maintain(self, history: SensorHistory, now: float, detector=None) -> Dict[str, int]:
+        """One eviction pass; returns the number of sensors evicted per reason."""
+        started = time.perf_counter()
+        evicted = {"idle": 0, "lru": 0}
+        released = []
+        if self.ttl > 0:
+            # Idle sensors are gone (replaced hardware, renamed ids); they skip the cold tier
+            idle = history.release(history.idle_slots(now - self.ttl))
+            evicted["idle"] = len(idle)
+            released.extend(idle)
+            if self.cold is not None:
+                self.cold.expire(now - self.ttl)
+        limit = self.limit(history, detector.nbytes() if detector is not None else 0)
+        if limit and len(history) > limit:
+            slots = history.lru_slots(len(history) - int(limit * self.HEADROOM))
+            if self.cold is not None:
+                for slot in slots.tolist():
+                    self.cold.put(history.slot_ids[slot], *history.export(slot), now)
+            lru = history.release(slots)
+            evicted["lru"] = len(lru)
+            released.extend(lru)
+        if detector is not None and released:
+            detector.forget(released)
+        if history.capacity > 4 * max(1024, len(history)):
+            history.compact()
+        for reason, count in evicted.items():
+            self.evicted[reason] += count
+        if evicted["idle"] or evicted["lru"]:
+            logger.info(
+                f"Evicted {evicted['idle']} idle and {evicted['lru']} least recently used sensors "
+                f"in {(time.perf_counter() - started) * 1000:.1f}ms; {len(history)} remain"
+            )
+        return evicted
+
+    def stats(self, history: SensorHistory) -> Dict[str, int]:
+        return {
+            "hot_sensors": len(history),
+            "hot_capacity": history.capacity,
+            "hot_bytes": history.nbytes(),
+            "cold_sensors": len(self.cold) if self.cold is not None else 0,
+            "cold_bytes": self.cold.nbytes if self.cold is not None else 0,
+            "evicted_idle": self.evicted["idle"],
+            "evicted_lru": self.evicted["lru"],
+            "cold_dropped": self.cold.dropped if self.cold is not None else 0,
+            "restored": self.restored,
+            "memory_budget": self.memory_budget,
+        }
+
+
+class RegistryCollector:
+    """Prometheus view of an engine's registry_stats(), cached for `ttl` seconds per scrape burst."""
+
+    def __init__(self, stats, ttl: float = 1.0):
+        self._stats = stats
+        self.ttl = ttl
+        self._cached: Tuple[float, Dict[str, int]] = (0.0, {})
+
+    def snapshot(self) -> Dict[str, int]:
+        at, stats = self._cached
+        if time.monotonic() - at > self.ttl:
+            stats = self._stats()
+            self._cached = (time.monotonic(), stats)
+        return stats
+
+    def describe(self):
+        # Stats may live in shard workers; an empty describe keeps registration from calling collect()
+        return []
+
+    def collect(self):
+        try:
+            stats = self.snapshot()
+        except Exception as e:
+            logger.error(f"Engine registry stats unavailable: {str(e)}")
+            return
+        sensors = GaugeMetricFamily('engine_sensors', 'Sensors held by the intelligence engine', labels=['tier'])
+        state = GaugeMetricFamily('engine_state_bytes', 'Approximate memory of per-sensor engine state', labels=['tier'])
+        for tier in ("hot", "cold"):
+            sensors.add_metric([tier], stats[f"{tier}_sensors"])
+            state.add_metric([tier], stats[f"{tier}_bytes"])
+        state.add_metric(["multivariate"], stats.get("multivariate_bytes", 0))
+        evicted = CounterMetricFamily('engine_sensor_evictions', 'Sensors evicted from the hot history', labels=['reason'])
+        for reason in ("idle", "lru"):
+            evicted.add_metric([reason], stats[f"evicted_{reason}"])
+        restored = CounterMetricFamily('engine_sensor_restores', 'Sensors restored from the cold tier')
+        restored.add_metric([], stats["restored"])
+        yield from (sensors, state, evicted, restored)
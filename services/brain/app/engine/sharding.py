@@ -0,0 +1,367 @@
+"""
+Sharded IntelligenceEngine: sensor ids are hash-routed to a fixed set of worker processes,
+each owning the history of its shard, so analysis scales across cores and every sensor's
+window lives in exactly one place.
+
+Local mode (ENGINE_SHARDS=N) spawns the shard workers from the API process. To share shards
+between several uvicorn workers, run standalone shard servers and point the API at them:
+
+    python -m app.engine.sharding --address /tmp/helixa-shard-0.sock
+    python -m app.engine.sharding --address /tmp/helixa-shard-1.sock
+    ENGINE_SHARD_ADDRESSES=/tmp/helixa-shard-0.sock,/tmp/helixa-shard-1.sock uvicorn app.main:app --workers 4
+"""
+import os
+import zlib
+import asyncio
+import logging
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.engine.anomaly import IntelligenceEngine
+from app.engine.eventtime import EventClock
+from app.engine.multivariate import MultivariateDetector
+from app.engine.registry import SensorRegistry
+from app.core.metrics import STAGES
+from app.engine.batch import BatchAnalysis, TelemetryColumns
+
+logger = logging.getLogger("Helixa-Sharding")
+
+
+def shard_of(sensor_id: str, shards: int) -> int:
+    """Stable routing: CRC32 is identical across processes and restarts, unlike hash()."""
+    return zlib.crc32(sensor_id.encode()) % shards
+
+
+def _handle(engine: IntelligenceEngine, message: tuple):
+    op, args = message
+    if op == "rows":
+        return engine._analyze_rows(*args)
+    if op == "analyze":
+        return engine.analyze(*args)
+    if op == "call":
+        # Generic hook for engine/history maintenance (snapshots, eviction, stats)
+        method, method_args = args
+        return getattr(engine, method)(*method_args)
+    raise ValueError(f"Unknown shard operation '{op}'")
+
+
+def serve_shard(conn: Connection, window_size: int, lock: Optional[threading.Lock] = None,
+                engine: Optional[IntelligenceEngine] = None):
+    """Request loop of one shard owner: answers ("ok", result) or ("error", message) per request."""
+    engine = engine or IntelligenceEngine(window_size=window_size)
+    lock = lock or threading.Lock()
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return
+        if message is None:
+            return
+        try:
+            with lock:
+                reply = ("ok", _handle(engine, message))
+        except Exception as e:
+            logger.error(f"Shard operation {message[0]} failed: {e}")
+            reply = ("error", f"{type(e).__name__}: {e}")
+        conn.send(reply)
+
+
+def _worker(conn: Connection, window_size: int, memory_budget: int = 0):
+    logging.basicConfig(level=logging.INFO)
+    engine = IntelligenceEngine(window_size=window_size)
+    if memory_budget:
+        engine.set_memory_budget(memory_budget)
+    serve_shard(conn, window_size, engine=engine)
+
+
+class ShardServer:
+    """Standalone shard owner shared by many API processes; one thread per connected client."""
+
+    def __init__(self, address: str, window_size: int = 30, authkey: Optional[bytes] = None):
+        self.listener = Listener(address, authkey=authkey)
+        self.engine = IntelligenceEngine(window_size=window_size)
+        self.window_size = window_size
+        self._lock = threading.Lock()
+
+    def serve_forever(self):
+        logger.info(f"Shard server listening on {self.listener.address}")
+        while True:
+            conn = self.listener.accept()
+            threading.Thread(
+                target=serve_shard, args=(conn, self.window_size, self._lock, self.engine), daemon=True
+            ).start()
+
+
+class ShardedIntelligenceEngine(IntelligenceEngine):
+    """
+    Drop-in IntelligenceEngine whose stateful analysis (history, z-scores, trends) runs on
+    shard workers. Limit checks, mitigation and reporting stay in the caller, which fans
+    each batch out to all shards at once and scatters the replies back into row order.
+    Each shard's pipe has its own lock, so a snapshot or stats call on one shard does not stall
+    the others, and analyze_batch_async() waits for the shards on a dedicated thread pool
+    instead of blocking the event loop.
+    """
+
+    ROUTE_CACHE_SIZE = 1_000_000
+
+    def __init__(self, shards: int = 0, window_size: int = 30, addresses: Optional[List[str]] = None,
+                 authkey: Optional[bytes] = None):
+        self.window_size = window_size
+        self.maintenance_threshold_factor = 0.85
+        self.clock = EventClock.from_env()
+        # Shard state lives in the workers
+        self.history = None
+        self.addresses = addresses or []
+        self.shards = len(self.addresses) or shards
+        if self.shards < 1:
+            raise ValueError("A sharded engine needs at least one shard")
+        self.authkey = authkey
+        # Local shards split ENGINE_MEMORY_BUDGET_MB; shard servers read their own environment
+        self.registry = SensorRegistry.from_env()
+        self.multivariate: Optional[MultivariateDetector] = None
+        self._conns: List[Connection] = []
+        self._processes: List[multiprocessing.Process] = []
+        self._routes: Dict[str, int] = {}
+        # Guards starting and resetting the connections; each pipe is then guarded by its shard's lock
+        self._lock = threading.Lock()
+        self._shard_locks = [threading.Lock() for _ in range(self.shards)]
+        self._executor = ThreadPoolExecutor(max_workers=self.shards, thread_name_prefix="helixa-shard-io")
+
+    @classmethod
+    def from_env(cls, window_size: int = 30) -> Optional["ShardedIntelligenceEngine"]:
+        """Sharded engine from ENGINE_SHARD_ADDRESSES or ENGINE_SHARDS (>1), otherwise None."""
+        addresses = [a for a in os.getenv("ENGINE_SHARD_ADDRESSES", "").split(",") if a]
+        shards = int(os.getenv("ENGINE_SHARDS", 1))
+        if not addresses and shards <= 1:
+            return None
+        authkey = os.getenv("ENGINE_SHARD_AUTHKEY", "").encode() or None
+        return cls(shards=shards, window_size=window_size, addresses=addresses, authkey=authkey)
+
+    def start(self):
+        with self._lock:
+            self._start()
+
+    def _start(self):
+        if self._conns:
+            return
+        if self.addresses:
+            self._conns = [Client(address, authkey=self.authkey) for address in self.addresses]
+            logger.info(f"Connected to {self.shards} shard servers")
+            return
+        context = multiprocessing.get_context("spawn")
+        memory_budget = self.registry.memory_budget // self.shards
+        conns, processes = [], []
+        for shard in range(self.shards):
+            parent, child = context.Pipe()
+            process = context.Process(
+                target=_worker, args=(child, self.window_size, memory_budget), name=f"helixa-shard-{shard}", daemon=True
+            )
+            process.start()
+            child.close()
+            conns.append(parent)
+            processes.append(process)
+        self._conns, self._processes = conns, processes
+        logger.info(f"Started {self.shards} local engine shards")
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._all_shards():
+            for conn in self._conns:
+                try:
+                    if self._processes:
+                        conn.send(None)
+                    conn.close()
+                except OSError:
+                    pass
+            for process in self._processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+            self._conns, self._processes = [], []
+
+    def _all_shards(self) -> ExitStack:
+        """Holds every shard lock (in shard order, like _exchange) plus the connection lock."""
+        stack = ExitStack()
+        for lock in self._shard_locks:
+            stack.enter_context(lock)
+        stack.enter_context(self._lock)
+        return stack
+
+    def _reset(self):
+        for conn in self._conns:
+            conn.close()
+        for process in self._processes:
+            process.kill()
+        self._conns, self._processes = [], []
+
+    def _exchange(self, requests: Dict[int, tuple]) -> Dict[int, object]:
+        """
+        Sends every request before awaiting any reply, so shards work in parallel. Blocks on
+        the pipes: call it from a worker thread, not the event loop.
+        """
+        self.start()
+        try:
+            with ExitStack() as held:
+                # Shard order keeps concurrent multi-shard exchanges from deadlocking
+                for shard in sorted(requests):
+                    held.enter_context(self._shard_locks[shard])
+                conns = self._conns
+                for shard, message in requests.items():
+                    conns[shard].send(message)
+                replies = {shard: conns[shard].recv() for shard in requests}
+        except (EOFError, OSError, IndexError) as e:
+            # A dead shard leaves the pipes out of step; reconnect (or respawn) on the next call
+            logger.error(f"Lost connection to an engine shard: {e}")
+            with self._all_shards():
+                self._reset()
+            raise RuntimeError(f"Engine shard unavailable: {e}")
+        errors = [f"shard {shard}: {reply[1]}" for shard, reply in replies.items() if reply[0] != "ok"]
+        if errors:
+            raise RuntimeError("; ".join(errors))
+        return {shard: reply[1] for shard, reply in replies.items()}
+
+    def broadcast(self, method: str, *args) -> List[object]:
+        """Calls an engine method on every shard and returns the per-shard results."""
+        replies = self._exchange({shard: ("call", (method, args)) for shard in range(self.shards)})
+        return [replies[shard] for shard in range(self.shards)]
+
+    def registry_stats(self) -> Dict[str, int]:
+        totals: Dict[str, int] = {}
+        for stats in self.broadcast("registry_stats"):
+            for key, value in stats.items():
+                totals[key] = totals.get(key, 0) + value
+        totals["memory_budget"] = self.registry.memory_budget or totals.get("memory_budget", 0)
+        # The detector runs here, outside the shards' budgets; it only expires idle groups
+        totals["multivariate_bytes"] = self.multivariate.nbytes() if self.multivariate is not None else 0
+        return totals
+
+    def set_memory_budget(self, memory_budget: int):
+        self.registry.memory_budget = memory_budget
+        self.broadcast("set_memory_budget", memory_budget // self.shards)
+
+    def _shard_path(self, path: str, shard: int) -> str:
+        return f"{path}.{shard}-of-{self.shards}"
+
+    def _per_shard(self, method: str, args_by_shard: Dict[int, tuple]) -> Dict[int, object]:
+        return self._exchange({shard: ("call", (method, args)) for shard, args in args_by_shard.items()})
+
+    def capture_snapshot(self, path: str) -> Callable[[], int]:
+        # Shards copy their own state when the request reaches them
+        return lambda: self.save_snapshot(path)
+
+    def save_snapshot(self, path: str) -> int:
+        """Each shard writes its own file; a different shard count later falls back to the database."""
+        replies = self._per_shard("save_snapshot", {s: (self._shard_path(path, s),) for s in range(self.shards)})
+        return sum(replies.values())
+
+    def load_snapshot(self, path: str) -> int:
+        paths = {s: self._shard_path(path, s) for s in range(self.shards)}
+        # Local shards share our filesystem; remote shard servers report missing files themselves
+        if not self.addresses and not all(os.path.exists(p) for p in paths.values()):
+            raise FileNotFoundError(f"Incomplete {self.shards}-shard snapshot at {path}")
+        return sum(self._per_shard("load_snapshot", {s: (p,) for s, p in paths.items()}).values())
+
+    def warm_start(self, ids: Sequence[str], timestamps: Sequence[float], values: Sequence[float]) -> int:
+        route = self.route(ids)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        args = {}
+        for shard in range(self.shards):
+            rows = np.flatnonzero(route == shard)
+            if len(rows):
+                args[shard] = ([ids[i] for i in rows.tolist()], timestamps[rows], values[rows])
+        return sum(self._per_shard("warm_start", args).values())
+
+    def route(self, ids: List[str]) -> np.ndarray:
+        """Shard per id; routes are memoized (bounded) since CRC32 per reading dominates the fan-out."""
+        routes = self._routes
+        try:
+            return np.fromiter(map(routes.__getitem__, ids), dtype=np.int64, count=len(ids))
+        except KeyError:
+            pass
+        # Executor threads share the cache and may reset it meanwhile: resolve into a local mapping
+        resolved: Dict[str, int] = {}
+        for sensor_id in ids:
+            if sensor_id not in resolved:
+                shard = routes.get(sensor_id)
+                resolved[sensor_id] = shard_of(sensor_id, self.shards) if shard is None else shard
+        if len(routes) + len(resolved) > self.ROUTE_CACHE_SIZE:
+            routes = self._routes = {}
+        routes.update(resolved)
+        return np.fromiter(map(resolved.__getitem__, ids), dtype=np.int64, count=len(ids))
+
+    def analyze(self, sensor_id: str, value: float, sensor_type: str, limits: Dict[str, float],
+                timestamp: Optional[float] = None) -> Dict:
+        shard = shard_of(sensor_id, self.shards)
+        return self._exchange({shard: ("analyze", (sensor_id, value, sensor_type, limits, timestamp))})[shard]
+
+    async def offload(self, method: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, method, *args)
+
+    async def analyze_batch_async(self, data) -> BatchAnalysis:
+        """analyze_batch with the shard round trip on the engine's thread pool; the rest stays on the loop."""
+        columns, is_safe, maxs = self._validate(data)
+        with STAGES["analysis"].time():
+            analyzed = await self.offload(self._analyze_columns, columns, maxs)
+        return self._decide(columns, is_safe, maxs, analyzed)
+
+    def _analyze_columns(self, columns: TelemetryColumns, maxs: np.ndarray) -> Tuple[np.ndarray, ...]:
+        count = len(columns)
+        times = self.clock.stamp(columns.timestamps, columns.packet)
+        route = self.route(columns.ids)
+        rows_by_shard = {
+            shard: rows for shard in range(self.shards) if len(rows := np.flatnonzero(route == shard))
+        }
+        ids = columns.ids
+        replies = self._exchange({
+            shard: ("rows", ([ids[i] for i in rows.tolist()], columns.values[rows], maxs[rows], times[rows]))
+            for shard, rows in rows_by_shard.items()
+        })
+
+        z_score = np.zeros(count)
+        is_anomaly = np.zeros(count, dtype=bool)
+        status = np.zeros(count, dtype=np.int64)
+        ttf_minutes = np.full(count, np.nan)
+        for shard, rows in rows_by_shard.items():
+            z_score[rows], is_anomaly[rows], status[rows], ttf_minutes[rows] = replies[shard]
+        return z_score, is_anomaly, status, ttf_minutes
+
+
+def create_engine(window_size: int = 30) -> IntelligenceEngine:
+    """
+    The engine configured by the environment: sharded when ENGINE_SHARDS/ENGINE_SHARD_ADDRESSES ask for it,
+    with multivariate detection when MULTIVARIATE_DETECTION is on. Groups span shards, so the
+    detector always runs in the API process.
+    """
+    engine = ShardedIntelligenceEngine.from_env(window_size) or IntelligenceEngine(window_size=window_size)
+    engine.multivariate = MultivariateDetector.from_env()
+    return engine
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Helixa-One brain engine shard server")
+    parser.add_argument("--address", required=True, help="Unix socket path or host:port to listen on")
+    parser.add_argument("--window", type=int, default=30, help="history window per sensor")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    address = args.address
+    if ":" in address and not address.startswith("/"):
+        host, port = address.rsplit(":", 1)
+        address = (host, int(port))
+    authkey = os.getenv("ENGINE_SHARD_AUTHKEY", "").encode() or None
+    if isinstance(address, tuple) and not authkey:
+        # Shard traffic is pickled; never accept it over TCP from unauthenticated peers
+        parser.error("TCP shard servers require ENGINE_SHARD_AUTHKEY")
+    ShardServer(address, window_size=args.window, authkey=authkey).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
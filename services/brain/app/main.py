@@ -1,20 +1,103 @@
-from fastapi import FastAPI
+from app.core.startup import startup  # first: the start-up breakdown is measured from here
+import math
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
 from prometheus_client import make_asgi_app
-from app.api.telemetry import router as telemetry_router
+from app.api.telemetry import router as telemetry_router, telemetry_writer, intelligence_suite, engine_state, control_hub
+from app.api.debug import router as debug_router
+from app.api.query import router as query_router
+from app.api.live import router as live_router
+from app.api.control import router as control_router
+from app.core.admission import AdmissionRejected
+from app.core.snapshots import HistorySnapshotter
+from app.core.storage import StorageReplicator
 import time
 
+# Warm-up reads come from wherever telemetry is persisted (Supabase or the embedded store)
+history_snapshotter = HistorySnapshotter.from_env(intelligence_suite, loader=telemetry_writer.backend.fetch_recent_windows)
+# Embedded storage only: forwards local rows to Supabase when it is reachable
+storage_replicator = StorageReplicator.from_env(telemetry_writer.backend)
+
+startup.record("imports", time.perf_counter() - startup.started)
+
+async def _warm_history():
+    # Warm restart: restore sensor history so anomaly and trend detection resume immediately
+    await history_snapshotter.restore()
+    await history_snapshotter.start()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Slow initialization warms in the background; /ready reports when it is done
+    with startup.phase("lifespan"):
+        startup.warm("history", _warm_history())
+        startup.warm("storage", asyncio.to_thread(telemetry_writer.backend.connect))
+        if intelligence_suite.multivariate:
+            # Only the background trainer needs scikit-learn: ingestion does not wait for it
+            startup.warm("multivariate", asyncio.to_thread(intelligence_suite.multivariate.preload), gate=False)
+        await telemetry_writer.start()
+        if intelligence_suite.multivariate:
+            await intelligence_suite.multivariate.start()
+        if storage_replicator:
+            await storage_replicator.start()
+        await control_hub.start()
+    startup.serving()
+    yield
+    await startup.stop()
+    await control_hub.stop()
+    # Flush-on-shutdown: drain queued and spilled rows before exiting
+    await telemetry_writer.stop()
+    if intelligence_suite.multivariate:
+        await intelligence_suite.multivariate.stop()
+    if storage_replicator:
+        await storage_replicator.stop()
+    await history_snapshotter.stop()
+    telemetry_writer.backend.close()
+    intelligence_suite.close()
+
 app = FastAPI(
     title="Helixa-One Brain API",
     description="The central intelligence engine for Data Center optimization.",
-    version="0.2.0"
+    version="0.2.0",
+    lifespan=lifespan
 )
 
+# Range query responses are columnar float arrays that compress well
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected(request: Request, exc: AdmissionRejected):
+    # Deferred, not failed: agents keep the telemetry and resend it after Retry-After
+    return JSONResponse(
+        status_code=503 if exc.reason == "warming_up" else 429,
+        content={"detail": str(exc), "reason": exc.reason},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+@app.exception_handler(RequestValidationError)
+async def validation_error(request: Request, exc: RequestValidationError):
+    # Rejected NaN/inf values cannot be echoed back as JSON numbers
+    errors = [
+        {**error, "input": repr(error["input"])}
+        if isinstance(error.get("input"), float) and not math.isfinite(error["input"]) else error
+        for error in exc.errors()
+    ]
+    return JSONResponse(status_code=422, content={"detail": jsonable_encoder(errors)})
+
 # Add Prometheus metrics
 metrics_app = make_asgi_app()
 app.mount("/metrics", metrics_app)
 
 # Include Routers
 app.include_router(telemetry_router, tags=["telemetry"])
+app.include_router(query_router, tags=["query"])
+app.include_router(live_router, tags=["live"])
+app.include_router(control_router, tags=["control"])
+app.include_router(debug_router, tags=["debug"])
 
 @app.get("/")
 async def root():
@@ -31,3 +114,17 @@ async def health():
         "status": "ok",
         "timestamp": time.time()
     }
+
+@app.get("/ready")
+async def ready():
+    """Readiness, separate from liveness (/health): 503 until the start-up warm-up has finished."""
+    report = startup.report()
+    return JSONResponse(status_code=200 if report["ready"] else 503, content={**report, "timestamp": time.time()})
+
+@app.get("/engine/stats")
+async def engine_stats():
+    """Sensors and approximate bytes held per tier by the intelligence engine, with eviction totals."""
+    return {
+        **await intelligence_suite.offload(engine_state.snapshot),
+        "timestamp": time.time()
+    }
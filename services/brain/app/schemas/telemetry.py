@@ -4,7 +4,8 @@ from typing import List, Optional
 class SensorReading(BaseModel):
     id: str
     type: str
-    value: float
+    # A finite real number: numeric strings, booleans, null and NaN/inf are rejected
+    value: float = Field(strict=True, allow_inf_nan=False)
     unit: str
 
 class TelemetryData(BaseModel):
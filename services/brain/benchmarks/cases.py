@@ -0,0 +1,204 @@
+import os
+import time
+import socket
+import asyncio
+import threading
+import numpy as np
+from typing import Callable, Dict, List
+
+from app.core.safety import SafetyController
+from app.engine.anomaly import IntelligenceEngine
+from app.schemas.telemetry import TelemetryData
+from benchmarks.stubdb import StubDatabase
+
+SENSOR_TYPES = ("temperature", "power", "humidity", "flow")
+UNITS = {"temperature": "C", "power": "kW", "humidity": "%", "flow": "L/m"}
+
+
+def sensor_ids(count: int) -> List[str]:
+    return [f"BENCH-{i:07d}" for i in range(count)]
+
+
+def warm_engine(sensors: int, window: int, seed: int = 1) -> IntelligenceEngine:
+    """Builds an engine whose every sensor already holds a full history window."""
+    rng = np.random.default_rng(seed)
+    engine = IntelligenceEngine(window_size=window)
+    slots = engine.history.slots(sensor_ids(sensors))
+    start = time.time() - window
+    for w in range(window):
+        engine.history.append_many(slots, np.full(sensors, start + w), 22.0 + rng.normal(0, 0.5, sensors))
+    return engine
+
+
+def make_packet(ids: List[str], offset: int, size: int, rng: np.random.Generator) -> dict:
+    """A TelemetryData-shaped dict of `size` readings, rotating through the sensor population."""
+    picks = [(offset + k) % len(ids) for k in range(size)]
+    values = (22.0 + rng.normal(0, 0.5, size)).round(2).tolist()
+    return {
+        "timestamp": time.time(),
+        "sensors": [
+            {"id": ids[i], "type": SENSOR_TYPES[i % 4], "value": values[k], "unit": UNITS[SENSOR_TYPES[i % 4]]}
+            for k, i in enumerate(picks)
+        ],
+        "metadata": {"site": "BENCH-SITE", "device_type": "datacenter", "mode": "benchmark"},
+    }
+
+
+def repeat(fn: Callable[[int], None], budget: float, max_iterations: int) -> List[float]:
+    """Calls fn(i) until the time budget or iteration cap is reached; returns per-call seconds."""
+    latencies = []
+    deadline = time.perf_counter() + budget
+    for i in range(max_iterations):
+        started = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - started)
+        if started > deadline:
+            break
+    return latencies
+
+
+def bench_analyze(sensors: int, window: int, packet: int, budget: float) -> Dict:
+    """Scalar IntelligenceEngine.analyze, one reading per call."""
+    engine = warm_engine(sensors, window)
+    ids = sensor_ids(sensors)
+    rng = np.random.default_rng(2)
+    picks = rng.integers(0, sensors, 200000)
+    values = 22.0 + rng.normal(0, 0.5, 200000)
+    limits = SafetyController.get_limits("temperature")
+    latencies = repeat(lambda i: engine.analyze(ids[picks[i]], values[i], "temperature", limits), budget, len(picks))
+    return {"readings": len(latencies), "latencies": latencies, "unit": "reading"}
+
+
+def bench_analyze_batch(sensors: int, window: int, packet: int, budget: float) -> Dict:
+    """Vectorized IntelligenceEngine.analyze_batch plus report materialization, one packet per call."""
+    engine = warm_engine(sensors, window)
+    ids = sensor_ids(sensors)
+    rng = np.random.default_rng(3)
+    packets = [TelemetryData(**make_packet(ids, i * packet, packet, rng)) for i in range(8)]
+    latencies = repeat(lambda i: engine.analyze_batch(packets[i % 8]).intelligence_report(), budget, 100000)
+    return {"readings": len(latencies) * packet, "latencies": latencies, "unit": "packet"}
+
+
+def bench_safety(sensors: int, window: int, packet: int, budget: float) -> Dict:
+    """Scalar SafetyController path as used per reading: validate, get_limits, get_mitigation_action."""
+    rng = np.random.default_rng(4)
+    values = (20.0 + rng.normal(0, 6, 200000)).tolist()
+    analysis = {"is_anomaly": False, "prediction": {"status": "maintenance_required"}}
+
+    def step(i):
+        sensor_type = SENSOR_TYPES[i % 4]
+        SafetyController.validate_sensor_reading(sensor_type, values[i], "datacenter")
+        SafetyController.get_limits(sensor_type, "datacenter")
+        SafetyController.get_mitigation_action(sensor_type, values[i], analysis, "datacenter")
+
+    latencies = repeat(step, budget, len(values))
+    return {"readings": len(latencies), "latencies": latencies, "unit": "reading"}
+
+
+def bench_persistence(sensors: int, window: int, packet: int, budget: float) -> Dict:
+    """TelemetryWriter enqueue latency and drained throughput against the stub database."""
+    from app.core.pipeline import TelemetryWriter
+
+    stub = StubDatabase()
+    row = {"sensor_id": "BENCH-0000000", "type": "temperature", "value": 22.0, "unit": "C", "metadata": {}}
+    rows = [dict(row) for _ in range(packet)]
+
+    async def run():
+        writer = TelemetryWriter(sink=stub.insert, flush_interval=0.05)
+        await writer.start()
+        latencies = []
+        started = time.perf_counter()
+        while time.perf_counter() - started < budget:
+            t = time.perf_counter()
+            await writer.enqueue(rows)
+            latencies.append(time.perf_counter() - t)
+            await asyncio.sleep(0)
+        await writer.stop(timeout=60)
+        return latencies, time.perf_counter() - started
+
+    latencies, elapsed = asyncio.run(run())
+    return {"readings": stub.rows, "latencies": latencies, "elapsed": elapsed, "unit": "packet"}
+
+
+def _install_stub_database() -> StubDatabase:
+    # Benchmarks start cold: no snapshot files, no database warm-up
+    os.environ["HISTORY_SNAPSHOT_PATH"] = ""
+    os.environ["HISTORY_WARM_FROM_DB"] = "false"
+    import app.api.telemetry as telemetry_api
+    stub = StubDatabase()
+    telemetry_api.telemetry_writer.sink = stub.insert
+    return stub
+
+
+def bench_ingest_inprocess(sensors: int, window: int, packet: int, budget: float) -> Dict:
+    """receive_telemetry called in-process on pre-validated packets, with the stub database."""
+    import app.api.telemetry as telemetry_api
+
+    _install_stub_database()
+    telemetry_api.intelligence_suite = warm_engine(sensors, window)
+    ids = sensor_ids(sensors)
+    rng = np.random.default_rng(5)
+    packets = [TelemetryData(**make_packet(ids, i * packet, packet, rng)) for i in range(8)]
+
+    async def run():
+        latencies = []
+        started = time.perf_counter()
+        i = 0
+        while time.perf_counter() - started < budget:
+            t = time.perf_counter()
+            await telemetry_api.receive_telemetry(packets[i % 8])
+            latencies.append(time.perf_counter() - t)
+            i += 1
+        await telemetry_api.telemetry_writer.stop(timeout=60)
+        return latencies
+
+    latencies = asyncio.run(run())
+    return {"readings": len(latencies) * packet, "latencies": latencies, "unit": "packet"}
+
+
+def bench_ingest_http(sensors: int, window: int, packet: int, budget: float) -> Dict:
+    """POST /telemetry over a keep-alive HTTP connection to a local uvicorn server."""
+    import json
+    import requests
+    import uvicorn
+    import app.api.telemetry as telemetry_api
+    from app.main import app
+
+    _install_stub_database()
+    telemetry_api.intelligence_suite = warm_engine(sensors, window)
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    ids = sensor_ids(sensors)
+    rng = np.random.default_rng(6)
+    bodies = [json.dumps(make_packet(ids, i * packet, packet, rng)) for i in range(8)]
+    session = requests.Session()
+    url = f"http://127.0.0.1:{port}/telemetry"
+
+    def post(i):
+        response = session.post(url, data=bodies[i % 8], headers={"Content-Type": "application/json"}, timeout=60)
+        response.raise_for_status()
+
+    try:
+        latencies = repeat(post, budget, 100000)
+    finally:
+        server.should_exit = True
+        thread.join(timeout=30)
+    return {"readings": len(latencies) * packet, "latencies": latencies, "unit": "request"}
+
+
+CASES = {
+    "analyze": bench_analyze,
+    "analyze_batch": bench_analyze_batch,
+    "safety": bench_safety,
+    "persistence": bench_persistence,
+    "ingest_inprocess": bench_ingest_inprocess,
+    "ingest_http": bench_ingest_http,
+}
@@ -0,0 +1,169 @@
+"""
+Helixa-One Brain ingestion benchmarks.
+
+Run from services/brain:
+
+    python -m benchmarks.run --suite quick
+    python -m benchmarks.run --suite full --output results.json
+    python -m benchmarks.run --suite quick --update-baseline
+
+Every case runs in a fresh process so peak RSS is measured per case. Results are
+compared against the stored baseline (benchmarks/baselines.json by default) and the
+run exits with status 1 when throughput, p99 latency or peak RSS regress beyond tolerance.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import resource
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+# Ring buffers need sensors * window * 16 bytes; larger combinations are skipped
+MEMORY_LIMIT = int(float(os.getenv("BENCH_MEMORY_LIMIT_GB", 4)) * 1024 ** 3)
+
+
+def _case(kind: str, sensors: int = 1000, window: int = 30, packet: int = 1) -> Dict:
+    return {"id": f"{kind}/s{sensors}/w{window}/p{packet}", "kind": kind, "sensors": sensors, "window": window, "packet": packet}
+
+
+SUITES = {
+    "quick": [
+        _case("analyze", sensors=1000, window=30),
+        _case("analyze_batch", sensors=10000, window=30, packet=1000),
+        _case("safety"),
+        _case("persistence", packet=100),
+        _case("ingest_inprocess", sensors=1000, window=30, packet=100),
+        _case("ingest_http", sensors=1000, window=30, packet=100),
+    ],
+    "full": (
+        [_case("analyze", sensors=s, window=w) for s in (10, 1000, 100000, 1000000) for w in (30, 1000, 10000)]
+        + [_case("analyze_batch", sensors=s, window=w, packet=p)
+           for s in (10000, 1000000) for w in (30, 1000) for p in (1, 100, 10000)]
+        + [_case("safety")]
+        + [_case("persistence", packet=p) for p in (1, 100, 10000)]
+        + [_case("ingest_inprocess", sensors=100000, window=30, packet=p) for p in (1, 100, 10000)]
+        + [_case("ingest_http", sensors=100000, window=30, packet=p) for p in (1, 100, 10000)]
+    ),
+}
+
+
+def _execute(case: Dict, budget: float) -> Dict:
+    """Runs one case inside the worker process and summarizes it."""
+    logging.disable(logging.WARNING)
+    from benchmarks.cases import CASES
+
+    started = time.perf_counter()
+    raw = CASES[case["kind"]](case["sensors"], case["window"], case["packet"], budget)
+    latencies = np.array(raw["latencies"])
+    busy = raw.get("elapsed") or float(latencies.sum())
+    return {
+        "readings_per_s": round(raw["readings"] / busy, 1) if busy else None,
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 4),
+        "p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 4),
+        "latency_unit": raw["unit"],
+        "samples": len(latencies),
+        # ru_maxrss is reported in KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "wall_s": round(time.perf_counter() - started, 2),
+    }
+
+
+def run_case(case: Dict, budget: float) -> Dict:
+    if case["sensors"] * case["window"] * 16 > MEMORY_LIMIT:
+        return {"skipped": f"needs more than BENCH_MEMORY_LIMIT_GB={MEMORY_LIMIT / 1024 ** 3:.0f}"}
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        try:
+            return pool.submit(_execute, case, budget).result()
+        except Exception as e:
+            return {"error": f"{type(e).__name__}: {e}"}
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float, latency_tolerance: float) -> List[str]:
+    """Returns human-readable regressions of results against baseline cases."""
+    regressions = []
+    for case_id, result in results.items():
+        base = baseline.get(case_id)
+        if not base or "readings_per_s" not in result:
+            continue
+        if base.get("readings_per_s") and result["readings_per_s"] < base["readings_per_s"] * (1 - tolerance):
+            regressions.append(f"{case_id}: throughput {result['readings_per_s']} < baseline {base['readings_per_s']}")
+        if base.get("p99_ms") and result["p99_ms"] > base["p99_ms"] * (1 + latency_tolerance):
+            regressions.append(f"{case_id}: p99 {result['p99_ms']}ms > baseline {base['p99_ms']}ms")
+        if base.get("peak_rss_mb") and result["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"{case_id}: peak RSS {result['peak_rss_mb']}MB > baseline {base['peak_rss_mb']}MB")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Helixa-One brain ingestion benchmarks")
+    parser.add_argument("--suite", choices=sorted(SUITES), default="quick")
+    parser.add_argument("--case", help="only run cases whose id contains this substring")
+    parser.add_argument("--budget", type=float, default=2.0, help="measurement seconds per case")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed throughput/RSS regression ratio")
+    parser.add_argument("--latency-tolerance", type=float, default=0.5, help="allowed p99 regression ratio")
+    parser.add_argument("--output", help="write results JSON to this file")
+    args = parser.parse_args(argv)
+
+    cases = [c for c in SUITES[args.suite] if not args.case or args.case in c["id"]]
+    results: Dict[str, Dict] = {}
+    print(f"{'case':<44} {'readings/s':>14} {'p50 ms':>10} {'p99 ms':>10} {'RSS MB':>8}")
+    for case in cases:
+        result = run_case(case, args.budget)
+        results[case["id"]] = result
+        if "readings_per_s" in result:
+            print(f"{case['id']:<44} {result['readings_per_s']:>14,.0f} {result['p50_ms']:>10.3f} "
+                  f"{result['p99_ms']:>10.3f} {result['peak_rss_mb']:>8.0f}  (per {result['latency_unit']})")
+        else:
+            print(f"{case['id']:<44} {result.get('skipped') or result.get('error')}")
+
+    report = {
+        "meta": {
+            "suite": args.suite,
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "cases": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    stored: Dict = {"cases": {}}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            stored = json.load(f)
+
+    if args.update_baseline:
+        stored.setdefault("cases", {}).update({k: v for k, v in results.items() if "readings_per_s" in v})
+        stored["meta"] = report["meta"]
+        with open(args.baseline, "w") as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    errors = [case_id for case_id, r in results.items() if "error" in r]
+    regressions = compare(results, stored.get("cases", {}), args.tolerance, args.latency_tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    for case_id in errors:
+        print(f"ERROR {case_id}: {results[case_id]['error']}")
+    return 1 if regressions or errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
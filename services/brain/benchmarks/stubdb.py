@@ -0,0 +1,24 @@
+import time
+import threading
+from typing import List
+
+
+class StubDatabase:
+    """
+    Local stand-in for the Supabase 'telemetry' table used by the benchmarks.
+    Each insert call costs a fixed round trip plus a per-row cost, like a remote
+    multi-row INSERT, and rows are only counted (nothing is retained).
+    """
+
+    def __init__(self, round_trip_ms: float = 2.0, per_row_us: float = 2.0):
+        self.round_trip = round_trip_ms / 1000.0
+        self.per_row = per_row_us / 1e6
+        self.rows = 0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def insert(self, rows: List[dict]):
+        time.sleep(self.round_trip + self.per_row * len(rows))
+        with self._lock:
+            self.rows += len(rows)
+            self.calls += 1
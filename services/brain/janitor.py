@@ -1,41 +1,74 @@
+import os
 import time
 import logging
+from datetime import datetime, timedelta, timezone
 from app.core.database import SupabaseManager
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("Helixa-Janitor")
 
-def run_janitor():
+# Retention policy (days) per storage tier
+RAW_RETENTION_DAYS = int(os.getenv("TELEMETRY_RETENTION_DAYS", 7))
+ROLLUP_1M_RETENTION_DAYS = int(os.getenv("ROLLUP_1M_RETENTION_DAYS", 30))
+ROLLUP_1H_RETENTION_DAYS = int(os.getenv("ROLLUP_1H_RETENTION_DAYS", 365))
+JANITOR_INTERVAL = float(os.getenv("JANITOR_INTERVAL", 600))
+# Rows younger than this may still be in flight from the write-behind queue
+ROLLUP_LAG_SECONDS = float(os.getenv("ROLLUP_LAG_SECONDS", 120))
+PARTITIONS_AHEAD_DAYS = 3
+# The normalized layout (infrastructure/telemetry_normalized.sql) adds packet and reading tables
+DAILY_TABLES = ["telemetry", "telemetry_rollup_1m"] + (
+    ["telemetry_packets", "telemetry_readings"] if os.getenv("TELEMETRY_SCHEMA", "legacy") == "normalized" else []
+)
+
+def run_cycle(client):
+    """
+    One maintenance pass over the partitioned telemetry storage (infrastructure/telemetry_partitioning.sql):
+    pre-create upcoming partitions, roll raw readings up into 1-minute and 1-hour tables, then
+    enforce retention by dropping whole partitions (raw data only once it has been rolled up).
     """
-    Removes telemetry data older than 24 hours to keep the database lean.
+    for table in DAILY_TABLES:
+        client.rpc("helixa_ensure_partitions", {"parent": table, "step": "1 day", "ahead": PARTITIONS_AHEAD_DAYS}).execute()
+    client.rpc("helixa_ensure_partitions", {"parent": "telemetry_rollup_1h", "step": "1 month", "ahead": 1}).execute()
+
+    until = datetime.now(timezone.utc) - timedelta(seconds=ROLLUP_LAG_SECONDS)
+    started = time.perf_counter()
+    written = client.rpc("telemetry_rollup", {"until": until.isoformat()}).execute().data
+    logger.info(f"Rolled up telemetry until {until.isoformat()}: {written or 0} minute buckets in {time.perf_counter() - started:.1f}s")
+
+    dropped = client.rpc("telemetry_apply_retention", {
+        "raw_days": RAW_RETENTION_DAYS,
+        "rollup_1m_days": ROLLUP_1M_RETENTION_DAYS,
+        "rollup_1h_days": ROLLUP_1H_RETENTION_DAYS,
+    }).execute().data or []
+    for partition in dropped:
+        logger.info(f"Retention: dropped partition {partition}")
+
+def run_janitor(start_delay: float = 0.0):
     """
+    Keeps the telemetry storage lean: daily partitions, rollups and partition-drop retention.
+    The first cycle waits `start_delay` seconds so it does not compete with the brain's start-up.
+    """
+    time.sleep(start_delay)
     try:
         client = SupabaseManager.get_client()
     except Exception as e:
         logger.error(f"Supabase client error: {str(e)}")
         return
 
-    logger.info("Helixa-Janitor started. Cleaning up old telemetry every hour...")
-    
+    logger.info(
+        f"Helixa-Janitor started. Every {JANITOR_INTERVAL:.0f}s: rollups, retention raw={RAW_RETENTION_DAYS}d "
+        f"1m={ROLLUP_1M_RETENTION_DAYS}d 1h={ROLLUP_1H_RETENTION_DAYS}d"
+    )
+
     while True:
         try:
-            # Calculate timestamp from 24 hours ago
-            # Note: Supabase uses ISO strings, but we can use date filters
-            # To simplify, we will remove records where 'created_at' is old
-            # Supabase allows filters like .lt('created_at', timestamp)
-            
-            # Since volume is low for the MVP, we will just log for now
-            # and implement real deletion if the client has many rows.
-            
-            # Deletion example (commented for initial safety):
-            # result = client.table("telemetry").delete().lt("created_at", "now() - interval '24 hours'").execute()
-            
+            run_cycle(client)
             logger.info("Janitor cycle complete. System is lean.")
-            
+
         except Exception as e:
             logger.error(f"Janitor error: {str(e)}")
-            
-        time.sleep(3600) # Runs every 1 hour
+
+        time.sleep(JANITOR_INTERVAL)
 
 if __name__ == "__main__":
     run_janitor()
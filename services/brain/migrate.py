@@ -1,4 +1,6 @@
 import os
+import argparse
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 from supabase import create_client, Client
 import logging
@@ -6,18 +8,8 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("Helixa-Migration")
 
-def run_migration():
-    load_dotenv()
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_KEY")
-
-    if not url or not key:
-        logger.error("SUPABASE_URL or SUPABASE_KEY not found in .env")
-        return
-
+def check_metadata_column(supabase: Client):
     try:
-        supabase: Client = create_client(url, key)
-        
         # Note: Standard Supabase API keys (anon/public) cannot run ALTER TABLE.
         # This script serves as a guide and attempt.
         logger.info("Attempting to verify 'metadata' column in 'telemetry' table...")
@@ -42,5 +34,60 @@ def run_migration():
         else:
             logger.error(f"Migration check failed: {str(e)}")
 
+def migrate_normalized(supabase: Client, days: float, chunk_hours: float):
+    """
+    Moves to the normalized packet/reading layout: verifies the schema from
+    infrastructure/telemetry_normalized.sql exists, then backfills the last `days`
+    of legacy telemetry rows in chunks so no single statement runs for long.
+    """
+    try:
+        supabase.table("telemetry_readings").select("packet_id").limit(1).execute()
+    except Exception as e:
+        logger.error(f"Normalized tables not found ({str(e)}).")
+        logger.info("Please run infrastructure/telemetry_partitioning.sql and then infrastructure/telemetry_normalized.sql in your Supabase SQL Editor.")
+        return
+
+    until = datetime.now(timezone.utc)
+    since = until - timedelta(days=days)
+    step = timedelta(hours=chunk_hours)
+    total = 0
+    cursor = since
+    while cursor < until:
+        upper = min(cursor + step, until)
+        try:
+            written = supabase.rpc(
+                "telemetry_backfill_normalized", {"since": cursor.isoformat(), "until": upper.isoformat()}
+            ).execute().data or 0
+        except Exception as e:
+            logger.error(f"Backfill of {cursor.isoformat()} .. {upper.isoformat()} failed: {str(e)}")
+            logger.info("Fix the error and re-run with --days covering the remaining range.")
+            return
+        total += written
+        logger.info(f"Backfilled {written} readings from {cursor.isoformat()} .. {upper.isoformat()}")
+        cursor = upper
+
+    logger.info(f"Normalized backfill complete: {total} readings. Set TELEMETRY_SCHEMA=normalized for the brain.")
+
+def run_migration(argv=None):
+    parser = argparse.ArgumentParser(description="Helixa-One telemetry schema migrations")
+    parser.add_argument("--normalize", action="store_true", help="backfill the normalized packet/reading tables")
+    parser.add_argument("--days", type=float, default=7, help="days of legacy telemetry to backfill")
+    parser.add_argument("--chunk-hours", type=float, default=1, help="backfill window per RPC call")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_KEY")
+
+    if not url or not key:
+        logger.error("SUPABASE_URL or SUPABASE_KEY not found in .env")
+        return
+
+    supabase: Client = create_client(url, key)
+    if args.normalize:
+        migrate_normalized(supabase, args.days, args.chunk_hours)
+    else:
+        check_metadata_column(supabase)
+
 if __name__ == "__main__":
     run_migration()
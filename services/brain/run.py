@@ -2,16 +2,24 @@ import uvicorn
 import os
 import sys
 import threading
-from janitor import run_janitor
 
 # Add the current directory to sys.path to ensure 'app' is findable
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+
+def start_janitor(start_delay: float):
+    """Janitor thread target; the janitor and its database client are imported here, off the start-up path."""
+    from janitor import run_janitor
+    run_janitor(start_delay)
+
+
 if __name__ == "__main__":
     print("🧠 HELIXA-ONE BRAIN: Starting Intelligence Engine...")
     
     # Start Janitor in background
-    janitor_thread = threading.Thread(target=run_janitor, daemon=True)
+    janitor_thread = threading.Thread(
+        target=start_janitor, args=(float(os.getenv("JANITOR_START_DELAY", 60)),), daemon=True
+    )
     janitor_thread.start()
     print("🧹 HELIXA-ONE JANITOR: Maintenance service active.")
     
@@ -0,0 +1,13 @@
+import os
+import sys
+import tempfile
+
+# The brain reads its configuration at import: keep tests on a throwaway embedded store
+_state = tempfile.mkdtemp(prefix="helixa-tests-")
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+os.environ.setdefault("STORAGE_SQLITE_PATH", os.path.join(_state, "telemetry.db"))
+os.environ.setdefault("STORAGE_REPLICATE", "false")
+os.environ.setdefault("HISTORY_SNAPSHOT_PATH", "")
+os.environ.setdefault("HISTORY_WARM_FROM_DB", "false")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
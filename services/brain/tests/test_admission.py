@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from app.core.admission import AdmissionController, AdmissionRejected
+
+
+def _controller(**kwargs) -> AdmissionController:
+    return AdmissionController(max_inflight=10, queue_timeout=5.0, **kwargs)
+
+
+def test_cancelled_waiter_gives_its_place_back():
+    async def scenario():
+        admission = _controller()
+        await admission._enter(10, 1)
+        waiter = asyncio.create_task(admission._enter(5, 1))
+        await asyncio.sleep(0)
+        assert admission.waiting == 5
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert admission.waiting == 0
+
+        # The capacity goes to live requests, not to the cancelled one
+        admission._release(10)
+        assert admission.inflight == 0
+        await asyncio.wait_for(admission._enter(10, 1), 1)
+        assert admission.inflight == 10
+
+    asyncio.run(scenario())
+
+
+def test_grant_racing_a_cancellation_is_not_lost():
+    async def scenario():
+        admission = _controller()
+        await admission._enter(10, 1)
+        waiter = asyncio.create_task(admission._enter(5, 1))
+        await asyncio.sleep(0)
+
+        # Capacity is handed over, but the request goes away before it resumes
+        admission._release(10)
+        assert admission.inflight == 5
+        waiter.cancel()
+        cancelled = isinstance((await asyncio.gather(waiter, return_exceptions=True))[0], asyncio.CancelledError)
+        if not cancelled:
+            # The wait completed after all: the caller holds the ticket and releases it
+            admission._release(5)
+        assert admission.inflight == 0
+        assert admission.waiting == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_head_unblocks_the_queue():
+    async def scenario():
+        admission = _controller()
+        await admission._enter(6, 1)
+        blocked = asyncio.create_task(admission._enter(8, 0))
+        await asyncio.sleep(0)
+        behind = asyncio.create_task(admission._enter(4, 1))
+        await asyncio.sleep(0)
+
+        blocked.cancel()
+        await asyncio.gather(blocked, return_exceptions=True)
+        await asyncio.wait_for(behind, 1)
+        assert admission.inflight == 10
+        assert admission.waiting == 0
+
+    asyncio.run(scenario())
+
+
+def test_queue_timeout_still_defers():
+    async def scenario():
+        admission = AdmissionController(max_inflight=10, queue_timeout=0.01)
+        await admission._enter(10, 1)
+        with pytest.raises(AdmissionRejected):
+            await admission._enter(5, 1)
+        assert admission.waiting == 0
+        admission._release(10)
+        assert admission.inflight == 0
+
+    asyncio.run(scenario())
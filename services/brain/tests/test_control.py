@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from app.core.control import ControlHub
+
+
+async def _ingest(hub: ControlHub, seq: str, ingested: list, release: asyncio.Event = None, fail: bool = False):
+    async with hub.ingest_once("agent-1", seq) as fresh:
+        if not fresh:
+            return
+        if release is not None:
+            await release.wait()
+        if fail:
+            raise RuntimeError("ingest failed")
+        ingested.append(seq)
+
+
+def test_duplicate_during_a_slow_first_ingest_is_not_ingested_again():
+    async def scenario():
+        hub = ControlHub(seq_memory=2)
+        ingested, release = [], asyncio.Event()
+        first = asyncio.create_task(_ingest(hub, "a-1", ingested, release))
+        await asyncio.sleep(0)
+
+        # Other messages complete meanwhile and overflow the memory of ingested seqs
+        for n in range(2, 10):
+            await _ingest(hub, f"a-{n}", ingested)
+        duplicate = asyncio.create_task(_ingest(hub, "a-1", ingested))
+        await asyncio.sleep(0)
+
+        release.set()
+        await asyncio.gather(first, duplicate)
+        assert ingested.count("a-1") == 1
+
+        # Seqs past the memory are forgotten, bounded
+        assert len(hub._ingested) == 2
+        assert not hub._ingesting
+
+    asyncio.run(scenario())
+
+
+def test_duplicate_of_a_failed_ingest_goes_through():
+    async def scenario():
+        hub = ControlHub()
+        ingested, release = [], asyncio.Event()
+        first = asyncio.create_task(_ingest(hub, "a-1", ingested, release, fail=True))
+        await asyncio.sleep(0)
+        duplicate = asyncio.create_task(_ingest(hub, "a-1", ingested))
+        await asyncio.sleep(0)
+
+        release.set()
+        with pytest.raises(RuntimeError):
+            await first
+        await duplicate
+        assert ingested == ["a-1"]
+        await _ingest(hub, "a-1", ingested)
+        assert ingested == ["a-1"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,80 @@
+import asyncio
+import json
+
+import pytest
+
+from app.core.storage import SQLiteBackend, StorageBackend, StorageReplicator
+
+
+class Upstream(StorageBackend):
+    """Upstream that rejects rows with a negative value for good, and can be taken offline."""
+
+    name = "upstream"
+
+    def __init__(self, schema: str = "legacy"):
+        super().__init__(schema)
+        self.rows = []
+        self.online = True
+
+    def write(self, rows):
+        if not self.online:
+            raise ConnectionError("upstream unreachable")
+        if any(row["value"] < 0 for row in rows):
+            raise TypeError("value out of range")
+        self.rows.extend(rows)
+
+
+def _reading(value: float, packet=None) -> dict:
+    row = {"sensor_id": "S00-RACK-001-TEMP-00", "type": "temperature", "value": value, "unit": "C", "metadata": None}
+    if packet is not None:
+        row.update(packet=packet, z_score=0.0, is_anomaly=False, status=0, ttf_minutes=None, is_safe=True, action=None)
+    return row
+
+
+@pytest.fixture
+def replicator(tmp_path):
+    local = SQLiteBackend(str(tmp_path / "local.db"))
+    replicator = StorageReplicator(local, Upstream(), batch_size=4, retention_hours=0,
+                                   dead_letter_path=str(tmp_path / "dead.ndjson"))
+    yield replicator
+    local.close()
+
+
+def test_rejected_rows_are_dead_lettered_and_replication_moves_on(replicator, tmp_path):
+    replicator.local.write([_reading(v) for v in (1, 2, -3, 4, 5, -6, 7, 8, 9)])
+
+    assert asyncio.run(replicator.replicate()) == 7
+    assert [row["value"] for row in replicator.upstream.rows] == [1, 2, 4, 5, 7, 8, 9]
+    assert replicator.dead_lettered_rows == 2
+    assert replicator.local.pending(replicator.TARGET) == 0
+    dead = [json.loads(line) for line in (tmp_path / "dead.ndjson").read_text().splitlines()]
+    assert [entry["row"]["value"] for entry in dead] == [-3, -6]
+
+    # Nothing is retried on the next pass
+    assert asyncio.run(replicator.replicate()) == 0
+    assert replicator.failed_attempts == 0
+
+
+def test_transient_errors_keep_the_cursor(replicator):
+    replicator.local.write([_reading(v) for v in (1, 2, 3)])
+    replicator.upstream.online = False
+
+    assert asyncio.run(replicator.replicate()) == 0
+    assert replicator.failed_attempts == 1
+    assert replicator.dead_lettered_rows == 0
+    assert replicator.local.pending(replicator.TARGET) == 3
+
+    replicator.upstream.online = True
+    assert asyncio.run(replicator.replicate()) == 3
+
+
+def test_normalized_packets_are_never_split(tmp_path):
+    local = SQLiteBackend(str(tmp_path / "local.db"), schema="normalized")
+    good, bad = {"timestamp": 1.0, "metadata": {}}, {"timestamp": 2.0, "metadata": {}}
+    local.write([_reading(1, good), _reading(2, good), _reading(3, bad), _reading(-4, bad)])
+    replicator = StorageReplicator(local, Upstream("normalized"), batch_size=10, retention_hours=0, dead_letter_path=None)
+
+    assert asyncio.run(replicator.replicate()) == 2
+    assert replicator.dead_lettered_rows == 2
+    assert local.pending(replicator.TARGET) == 0
+    local.close()
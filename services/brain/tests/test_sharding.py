@@ -0,0 +1,38 @@
+import numpy as np
+
+from app.engine.sharding import ShardedIntelligenceEngine, shard_of
+
+
+class ResetByOtherThread(dict):
+    """Route cache another executor thread resets right after every write to it."""
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.clear()
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.clear()
+
+
+def test_route_survives_a_concurrent_cache_reset():
+    engine = ShardedIntelligenceEngine(shards=4)
+    engine._routes = ResetByOtherThread()
+    ids = [f"S00-RACK-{i:03d}-TEMP-00" for i in range(32)] * 2
+    try:
+        route = engine.route(ids)
+    finally:
+        engine.close()
+    assert route.tolist() == [shard_of(sensor_id, 4) for sensor_id in ids]
+
+
+def test_route_cache_stays_bounded():
+    engine = ShardedIntelligenceEngine(shards=4)
+    engine.ROUTE_CACHE_SIZE = 10
+    try:
+        for start in range(0, 100, 8):
+            ids = [f"S00-RACK-{i:03d}-TEMP-00" for i in range(start, start + 8)]
+            assert (engine.route(ids) == np.array([shard_of(sensor_id, 4) for sensor_id in ids])).all()
+            assert len(engine._routes) <= engine.ROUTE_CACHE_SIZE
+    finally:
+        engine.close()
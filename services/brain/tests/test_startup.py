@@ -0,0 +1,39 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.startup import startup
+from app.main import app
+
+PACKET = {
+    "timestamp": time.time(),
+    "sensors": [{"id": "S00-RACK-001-TEMP-00", "type": "temperature", "value": 41.5, "unit": "C"}],
+    "metadata": {"site": "test"},
+}
+
+
+@pytest.fixture
+def warming(monkeypatch):
+    """A client whose brain has not finished its warm-up, with a short ingestion wait."""
+    with TestClient(app) as client:
+        # Keep the brain warming: finishing warm-ups must not flip readiness back on
+        monkeypatch.setattr(startup, "_check", lambda: None)
+        monkeypatch.setattr(startup, "ready_after", None)
+        monkeypatch.setattr(startup, "_ready", None)
+        monkeypatch.setattr(startup, "ingest_wait", 0.05)
+        yield client
+
+
+def test_ingest_is_deferred_until_ready(warming):
+    assert warming.get("/ready").status_code == 503
+
+    response = warming.post("/telemetry", json=PACKET)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert response.json()["reason"] == "warming_up"
+
+    response = warming.post("/telemetry/bulk", content='{"timestamp": 1, "sensors": []}\n',
+                            headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
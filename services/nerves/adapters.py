@@ -0,0 +1,166 @@
+import time
+import asyncio
+import random
+import logging
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Type
+
+logger = logging.getLogger("Helixa-Adapters")
+
+
+class ProtocolAdapter:
+    """
+    Reads one device (PDU, CRAC unit, BMC, ...) and returns its sensor readings in the
+    TelemetryData sensor layout. One adapter instance serves every target of its protocol,
+    so per-device state is keyed by target id. read() must be a coroutine and may raise;
+    the collector applies timeouts and concurrency limits around it. `concurrency` is the
+    collector's limit of reads in flight, for adapters that size resources after it.
+    """
+
+    name = "adapter"
+
+    def __init__(self, concurrency: int = 64):
+        self.concurrency = concurrency
+
+    async def read(self, target: dict) -> List[dict]:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class _SimulatedAdapter(ProtocolAdapter):
+    """Local stand-in for a network device: random-walk values behind a small I/O delay."""
+
+    def __init__(self, concurrency: int = 64):
+        super().__init__(concurrency)
+        self._state: Dict[str, Dict[str, float]] = {}
+
+    def _walk(self, target: dict, metric: str, start: float, step: float, low: float, high: float) -> float:
+        state = self._state.setdefault(target["id"], {})
+        value = state.get(metric, start + random.uniform(-step, step) * 5)
+        value = min(high, max(low, value + random.uniform(-step, step)))
+        state[metric] = value
+        return round(value, 2)
+
+    async def read(self, target: dict) -> List[dict]:
+        latency = target.get("sim_latency", 0.05)
+        await asyncio.sleep(random.uniform(0.2, 1.0) * latency)
+        if random.random() < target.get("sim_failure_rate", 0.0):
+            raise ConnectionError(f"{target['id']} did not answer")
+        return self.sample(target)
+
+    def sample(self, target: dict) -> List[dict]:
+        raise NotImplementedError
+
+
+class SimulatedPDUAdapter(_SimulatedAdapter):
+    name = "sim-pdu"
+
+    def sample(self, target: dict) -> List[dict]:
+        return [
+            {"id": f"{target['id']}-LOAD", "type": "power", "value": self._walk(target, "load", 45.0, 0.8, 0.0, 120.0), "unit": "kW"},
+            {"id": f"{target['id']}-VOLTAGE", "type": "voltage", "value": self._walk(target, "voltage", 230.0, 0.5, 210.0, 250.0), "unit": "V"},
+        ]
+
+
+class SimulatedCRACAdapter(_SimulatedAdapter):
+    name = "sim-crac"
+
+    def sample(self, target: dict) -> List[dict]:
+        return [
+            {"id": f"{target['id']}-SUPPLY-TEMP", "type": "temperature", "value": self._walk(target, "supply", 18.0, 0.2, 12.0, 30.0), "unit": "C"},
+            {"id": f"{target['id']}-RETURN-TEMP", "type": "temperature", "value": self._walk(target, "return", 27.0, 0.3, 18.0, 40.0), "unit": "C"},
+            {"id": f"{target['id']}-FLOW", "type": "flow", "value": self._walk(target, "flow", 110.0, 1.5, 60.0, 160.0), "unit": "L/m"},
+        ]
+
+
+class SimulatedBMCAdapter(_SimulatedAdapter):
+    name = "sim-bmc"
+
+    def sample(self, target: dict) -> List[dict]:
+        return [
+            {"id": f"{target['id']}-INLET-TEMP", "type": "temperature", "value": self._walk(target, "inlet", 23.0, 0.3, 15.0, 45.0), "unit": "C"},
+            {"id": f"{target['id']}-POWER", "type": "power", "value": self._walk(target, "power", 0.45, 0.02, 0.05, 1.5), "unit": "kW"},
+        ]
+
+
+class RedfishAdapter(ProtocolAdapter):
+    """
+    Reads chassis thermal and power data from a BMC's Redfish API
+    (target keys: "url", optional "chassis", "username", "password", "verify_tls").
+    requests is blocking, so calls run on the adapter's own thread pool, sized for the two
+    requests of every concurrent read, each thread with its own pooled session. Request
+    timeouts count down to the read's deadline, so a thread whose read the collector already
+    timed out is released at about the same time instead of holding the pool.
+    """
+
+    name = "redfish"
+
+    def __init__(self, concurrency: int = 64):
+        super().__init__(concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=2 * concurrency, thread_name_prefix="helixa-redfish")
+        self._local = threading.local()
+        self._sessions: List[requests.Session] = []
+        self._lock = threading.Lock()
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            # One thread sends one request at a time, to BMCs spread over many hosts
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=1, max_retries=0)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def _get(self, target: dict, path: str, deadline: float) -> dict:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"{target['id']} read budget spent before {path}")
+        auth = (target["username"], target.get("password", "")) if target.get("username") else None
+        response = self._session().get(
+            target["url"].rstrip("/") + path,
+            auth=auth,
+            verify=target.get("verify_tls", True),
+            timeout=remaining,
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def read(self, target: dict) -> List[dict]:
+        chassis = target.get("chassis", "1")
+        deadline = time.monotonic() + target.get("timeout", 2.0)
+        loop = asyncio.get_running_loop()
+        thermal, power = await asyncio.gather(
+            loop.run_in_executor(self._executor, self._get, target, f"/redfish/v1/Chassis/{chassis}/Thermal", deadline),
+            loop.run_in_executor(self._executor, self._get, target, f"/redfish/v1/Chassis/{chassis}/Power", deadline),
+        )
+        readings = []
+        for sensor in thermal.get("Temperatures", []):
+            if sensor.get("ReadingCelsius") is not None:
+                name = str(sensor.get("Name", sensor.get("MemberId", "TEMP"))).upper().replace(" ", "-")
+                readings.append({"id": f"{target['id']}-{name}", "type": "temperature", "value": float(sensor["ReadingCelsius"]), "unit": "C"})
+        for i, control in enumerate(power.get("PowerControl", [])):
+            if control.get("PowerConsumedWatts") is not None:
+                suffix = f"-POWER{i}" if i else "-POWER"
+                readings.append({"id": f"{target['id']}{suffix}", "type": "power", "value": float(control["PowerConsumedWatts"]) / 1000, "unit": "kW"})
+        return readings
+
+    async def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            session.close()
+
+
+ADAPTERS: Dict[str, Type[ProtocolAdapter]] = {
+    adapter.name: adapter
+    for adapter in (SimulatedPDUAdapter, SimulatedCRACAdapter, SimulatedBMCAdapter, RedfishAdapter)
+}
@@ -0,0 +1,139 @@
+import json
+import time
+import asyncio
+import logging
+from collections import defaultdict
+from threading import Event
+from typing import Dict, List, Optional
+
+from adapters import ADAPTERS, ProtocolAdapter
+
+logger = logging.getLogger("Helixa-Collector")
+
+
+def load_inventory(path: str) -> dict:
+    """
+    Loads a target inventory (JSON):
+    {"site": "...", "defaults": {"adapter": "...", "timeout": 2.0}, "targets": [{"id": "...", ...}]}
+    Target entries inherit the defaults and the top-level site.
+    """
+    with open(path) as f:
+        inventory = json.load(f)
+
+    defaults = {"timeout": 2.0, **inventory.get("defaults", {})}
+    site = inventory.get("site", "DC-ALPHA-01")
+    targets, seen = [], set()
+    for entry in inventory.get("targets", []):
+        target = {"site": site, **defaults, **entry}
+        if "id" not in target or "adapter" not in target:
+            raise ValueError(f"Inventory target needs 'id' and 'adapter': {entry}")
+        if target["adapter"] not in ADAPTERS:
+            raise ValueError(f"Unknown adapter '{target['adapter']}' for target {target['id']}")
+        if target["id"] in seen:
+            raise ValueError(f"Duplicate inventory target id {target['id']}")
+        seen.add(target["id"])
+        targets.append(target)
+    return {**inventory, "targets": targets}
+
+
+class FleetCollector:
+    """
+    Polls many devices concurrently from one process. Each cycle fans out over every
+    target through its protocol adapter, bounded by a concurrency limit and a per-target
+    timeout, and aggregates the readings into one telemetry packet per site.
+    Targets that keep failing are backed off exponentially (in cycles) so a dead device
+    cannot eat the poll budget of healthy ones.
+    """
+
+    MAX_BACKOFF_CYCLES = 32
+
+    def __init__(self, targets: List[dict], concurrency: int = 64, version: str = "0.3.0"):
+        self.targets = targets
+        self.concurrency = concurrency
+        self.version = version
+        self.adapters: Dict[str, ProtocolAdapter] = {
+            name: ADAPTERS[name](concurrency) for name in {t["adapter"] for t in targets}
+        }
+        self._failures: Dict[str, int] = defaultdict(int)
+        self._skip_until: Dict[str, int] = {}
+        self._cycle = 0
+
+    async def _poll(self, semaphore: asyncio.Semaphore, target: dict) -> Optional[List[dict]]:
+        async with semaphore:
+            try:
+                readings = await asyncio.wait_for(self.adapters[target["adapter"]].read(target), target["timeout"])
+            except asyncio.TimeoutError:
+                self._on_failure(target, f"timed out after {target['timeout']}s")
+                return None
+            except Exception as e:
+                self._on_failure(target, str(e))
+                return None
+        self._failures.pop(target["id"], None)
+        self._skip_until.pop(target["id"], None)
+        return readings
+
+    def _on_failure(self, target: dict, reason: str):
+        fails = self._failures[target["id"]] + 1
+        self._failures[target["id"]] = fails
+        backoff = min(self.MAX_BACKOFF_CYCLES, 2 ** (fails - 1))
+        self._skip_until[target["id"]] = self._cycle + backoff
+        logger.warning(f"Target {target['id']} failed ({reason}); backing off {backoff} cycle(s)")
+
+    async def poll_once(self) -> List[dict]:
+        """Runs one collection cycle and returns one aggregated packet per site."""
+        self._cycle += 1
+        semaphore = asyncio.Semaphore(self.concurrency)
+        due = [t for t in self.targets if self._skip_until.get(t["id"], 0) < self._cycle]
+        started = time.perf_counter()
+        results = await asyncio.gather(*(self._poll(semaphore, t) for t in due))
+
+        sensors_by_site: Dict[str, List[dict]] = defaultdict(list)
+        stats_by_site: Dict[str, Dict[str, int]] = defaultdict(lambda: {"targets_ok": 0, "targets_failed": 0})
+        for target, readings in zip(due, results):
+            stats = stats_by_site[target["site"]]
+            if readings is None:
+                stats["targets_failed"] += 1
+                continue
+            stats["targets_ok"] += 1
+            for reading in readings:
+                # Readings carry their rack so the brain can aggregate by rack
+                if target.get("rack"):
+                    reading.setdefault("rack", target["rack"])
+                sensors_by_site[target["site"]].append(reading)
+
+        elapsed = time.perf_counter() - started
+        logger.info(f"Collection cycle {self._cycle}: {len(due)}/{len(self.targets)} targets polled in {elapsed * 1000:.0f}ms")
+
+        now = time.time()
+        return [
+            {
+                "timestamp": now,
+                "sensors": sensors_by_site[site],
+                "metadata": {
+                    "site": site,
+                    "version": self.version,
+                    "mode": "collector",
+                    "device_type": "datacenter",
+                    **stats,
+                },
+            }
+            for site, stats in stats_by_site.items()
+            if sensors_by_site[site]
+        ]
+
+    async def run(self, transmitter, interval: float, shutdown: Event, on_report=None):
+        """Polls every `interval` seconds until shutdown, handing packets to the (blocking) transmitter."""
+        logger.info(f"Collector mode: {len(self.targets)} targets, concurrency {self.concurrency}, every {interval}s")
+        try:
+            while not shutdown.is_set():
+                started = time.monotonic()
+                packets = await self.poll_once()
+                report = await asyncio.to_thread(transmitter.submit_many, packets)
+                if report and on_report:
+                    on_report(report)
+                remaining = interval - (time.monotonic() - started)
+                if remaining > 0:
+                    await asyncio.to_thread(shutdown.wait, remaining)
+        finally:
+            for adapter in self.adapters.values():
+                await adapter.close()
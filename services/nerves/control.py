@@ -0,0 +1,197 @@
+import os
+import json
+import time
+import uuid
+import socket
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote, urlsplit, urlunsplit
+
+try:
+    from websockets.sync.client import connect
+    from websockets.exceptions import ConnectionClosed
+except ImportError:  # optional: without it telemetry and actions keep using HTTP
+    connect = None
+    ConnectionClosed = OSError
+
+logger = logging.getLogger("Helixa-Control")
+
+
+def control_url(brain_api_url: str) -> str:
+    """ws(s)://host/agents/control on the brain serving `brain_api_url`."""
+    parts = urlsplit(brain_api_url)
+    scheme = "wss" if parts.scheme == "https" else "ws"
+    return urlunsplit((scheme, parts.netloc, "/agents/control", "", ""))
+
+
+class ControlChannel:
+    """
+    Persistent WebSocket to the brain carrying telemetry upstream and mitigation actions
+    downstream. Actions are executed as soon as they arrive and acknowledged by id; ids seen
+    before (resends) are acknowledged again without executing twice. Telemetry messages stay
+    unconfirmed until the brain's receipt; reclaim() hands back whatever the brain did not
+    confirm within `receipt_timeout` or lost with the connection, for the HTTP path to deliver
+    with its original seq. Seqs are unique per agent process, so the brain recognizes a resend
+    of telemetry it did ingest and drops it.
+    Telemetry the brain defers under load is handed back at once and `on_defer` receives the
+    Retry-After seconds, so the HTTP path holds it just as long.
+    A background thread keeps the connection up with exponential backoff.
+    """
+
+    SEEN_IDS = 1024
+
+    def __init__(self, url: str, agent_id: str, on_action: Callable[[dict], None],
+                 receipt_timeout: float = 10.0, max_backoff: float = 30.0,
+                 on_defer: Optional[Callable[[float], None]] = None):
+        self.url = url
+        self.agent_id = agent_id
+        self.on_action = on_action
+        self.on_defer = on_defer
+        self.receipt_timeout = receipt_timeout
+        self.max_backoff = max_backoff
+        self._ws = None
+        self._seq = 0
+        # Restarted agents must not reuse seqs the brain still remembers
+        self._instance = uuid.uuid4().hex[:12]
+        self._lock = threading.Lock()
+        # seq -> (sent at, packets) awaiting a receipt
+        self._unconfirmed: Dict[str, Tuple[float, List[dict]]] = {}
+        self._returned: List[Tuple[str, List[dict]]] = []
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        self._sensors: set = set()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls, brain_api_url: str, on_action: Callable[[dict], None],
+                 on_defer: Optional[Callable[[float], None]] = None) -> Optional["ControlChannel"]:
+        """A channel unless CONTROL_CHANNEL is off; None (HTTP only) without the websockets package."""
+        if os.getenv("CONTROL_CHANNEL", "true").lower() not in ("1", "true", "yes"):
+            return None
+        if connect is None:
+            logger.warning("CONTROL_CHANNEL needs the websockets package; actions arrive with HTTP responses")
+            return None
+        url = os.getenv("BRAIN_CONTROL_URL") or control_url(brain_api_url)
+        agent_id = os.getenv("AGENT_ID") or socket.gethostname()
+        return cls(
+            f"{url}?agent_id={quote(agent_id)}",
+            agent_id=agent_id,
+            on_action=on_action,
+            receipt_timeout=float(os.getenv("CONTROL_RECEIPT_TIMEOUT", 10)),
+            on_defer=on_defer,
+        )
+
+    @property
+    def connected(self) -> bool:
+        return self._ws is not None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="helixa-control", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        ws = self._ws
+        if ws is not None:
+            ws.close()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def send_packets(self, packets: List[dict]) -> bool:
+        """Sends packets over the channel; False when it is down and the caller should use HTTP."""
+        ws = self._ws
+        if ws is None or not packets:
+            return False
+        with self._lock:
+            self._seq += 1
+            seq = f"{self._instance}-{self._seq}"
+            self._unconfirmed[seq] = (time.monotonic(), packets)
+            new = {s["id"] for p in packets for s in p["sensors"]} - self._sensors
+            self._sensors |= new
+        try:
+            ws.send(json.dumps({"type": "telemetry", "seq": seq, "packets": packets}, separators=(",", ":")))
+            return True
+        except (ConnectionClosed, OSError) as e:
+            logger.warning(f"Control channel send failed ({str(e)}); falling back to HTTP")
+            with self._lock:
+                self._unconfirmed.pop(seq, None)
+            return False
+
+    def reclaim(self) -> List[Tuple[str, List[dict]]]:
+        """(seq, packets) the brain never confirmed (timed out or lost with a connection), oldest first."""
+        now = time.monotonic()
+        with self._lock:
+            late = [seq for seq, (sent, _) in self._unconfirmed.items() if now - sent > self.receipt_timeout]
+            groups = self._returned + [(seq, self._unconfirmed.pop(seq)[1]) for seq in late]
+            self._returned = []
+        if groups:
+            count = sum(len(packets) for _, packets in groups)
+            logger.warning(f"Brain did not confirm {count} packet(s) on the control channel; resending over HTTP")
+        return groups
+
+    # --- Connection thread ---
+
+    def _run(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                with connect(self.url, open_timeout=10, close_timeout=2) as ws:
+                    self._ws = ws
+                    backoff = 1.0
+                    logger.info(f"Control channel to {self.url} established")
+                    with self._lock:
+                        sensors = sorted(self._sensors)
+                    if sensors:
+                        ws.send(json.dumps({"type": "hello", "sensors": sensors}))
+                    for raw in ws:
+                        self._handle(ws, json.loads(raw))
+            except (ConnectionClosed, OSError, TimeoutError, ValueError) as e:
+                if not self._stop.is_set():
+                    logger.warning(f"Control channel down ({str(e) or type(e).__name__}); retrying in {backoff:.0f}s")
+            finally:
+                self._ws = None
+                with self._lock:
+                    # Nothing unconfirmed will be confirmed on a new connection
+                    self._returned.extend((seq, packets) for seq, (_, packets) in self._unconfirmed.items())
+                    self._unconfirmed.clear()
+            self._stop.wait(backoff)
+            backoff = min(self.max_backoff, backoff * 2)
+
+    def _handle(self, ws, message: dict):
+        kind = message.get("type")
+        if kind == "action":
+            message_id = message.get("id")
+            status = "executed"
+            if message_id not in self._seen:
+                self._seen[message_id] = None
+                if len(self._seen) > self.SEEN_IDS:
+                    self._seen.popitem(last=False)
+                try:
+                    self.on_action(message)
+                except Exception as e:
+                    status = f"error: {str(e)}"
+                    logger.error(f"Action {message.get('action')} failed: {str(e)}")
+            ws.send(json.dumps({"type": "ack", "id": message_id, "status": status}))
+        elif kind == "receipt":
+            with self._lock:
+                self._unconfirmed.pop(message.get("seq"), None)
+        elif kind == "error":
+            if message.get("retry_after") is not None:
+                # Admission control deferred it: back to the caller now, to be resent after Retry-After
+                with self._lock:
+                    deferred = self._unconfirmed.pop(message.get("seq"), None)
+                    if deferred:
+                        self._returned.append((message["seq"], deferred[1]))
+                logger.warning(f"Brain is shedding load; holding telemetry for {message['retry_after']}s")
+                if self.on_defer:
+                    self.on_defer(float(message["retry_after"]))
+                return
+            if message.get("retry"):
+                # Left unconfirmed: reclaim() resends it over HTTP after the receipt timeout
+                logger.error(f"Brain failed to process telemetry: {message.get('detail')}")
+                return
+            with self._lock:
+                dropped = self._unconfirmed.pop(message.get("seq"), None)
+            logger.error(f"Brain rejected {len(dropped[1]) if dropped else 0} packet(s): {message.get('detail')}")
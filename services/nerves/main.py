@@ -1,6 +1,5 @@
 import time
 import random
-import requests
 import logging
 import os
 import psutil
@@ -8,6 +7,9 @@ import subprocess
 import signal
 from threading import Event
 from dotenv import load_dotenv
+from transport import TelemetryTransmitter
+from control import ControlChannel
+from sampling import HostFacts, Sampler, collectors_from_env
 
 load_dotenv()
 
@@ -20,7 +22,10 @@ logger = logging.getLogger("Helixa-Nerves")
 
 BRAIN_API_URL = os.getenv("BRAIN_API_URL", "http://localhost:8000/telemetry")
 HARDWARE_MODE = os.getenv("HARDWARE_MODE", "false").lower() == "true"
+SEND_INTERVAL = float(os.getenv("SEND_INTERVAL", 5))
+COLLECTOR_INVENTORY = os.getenv("COLLECTOR_INVENTORY")
 shutdown_event = Event()
+_host_facts = None
 
 
 def handle_shutdown(signum, frame):
@@ -29,7 +34,8 @@ def handle_shutdown(signum, frame):
 
 def get_hardware_metrics():
     """Captures real hardware metrics from the host machine."""
-    cpu_usage = psutil.cpu_percent(interval=0.5)
+    # Non-blocking: usage since the previous call (the first call primes the counter)
+    cpu_usage = psutil.cpu_percent(interval=None)
     ram_usage = psutil.virtual_memory().percent
     
     metrics = [
@@ -48,7 +54,7 @@ def get_hardware_metrics():
     ]
     
     # Try to get battery if available
-    battery = psutil.sensors_battery()
+    battery = psutil.sensors_battery() if host_facts().has_battery else None
     if battery:
         metrics.append({
             "id": "HOST-BATTERY",
@@ -59,25 +65,29 @@ def get_hardware_metrics():
         
     return metrics
 
+def host_facts() -> HostFacts:
+    """Static host facts, probed once per process."""
+    global _host_facts
+    if _host_facts is None:
+        _host_facts = HostFacts()
+    return _host_facts
+
 def detect_device_type():
     """Detects if the current machine is a Notebook, PC, or Data Center node."""
     try:
-        # Check for battery (Notebook indicator)
-        battery = psutil.sensors_battery()
-        has_battery = battery is not None
-        
-        # Check CPU core count (Server indicator)
-        cpu_count = psutil.cpu_count(logical=True)
-        
-        if has_battery:
-            return "Notebook"
-        elif cpu_count > 16:
-            return "Data Center Node"
-        else:
-            return "Professional PC"
+        # The device type never changes at runtime, so it comes from the cached host facts
+        return host_facts().device_type
     except Exception:
         return "Unknown Node"
 
+def build_metadata(device_type: str) -> dict:
+    return {
+        "site": "DC-ALPHA-01",
+        "version": "0.3.0",
+        "mode": "hardware" if HARDWARE_MODE else "simulated",
+        "device_type": device_type
+    }
+
 def generate_telemetry():
     """Simulates or captures data center sensor readings."""
     device_type = detect_device_type()
@@ -117,48 +127,96 @@ def generate_telemetry():
     return {
         "timestamp": time.time(),
         "sensors": sensors,
-        "metadata": {
-            "site": "DC-ALPHA-01",
-            "version": "0.3.0",
-            "mode": "hardware" if HARDWARE_MODE else "simulated",
-            "device_type": device_type
-        }
+        "metadata": build_metadata(device_type)
     }
 
+def execute_action(action: dict, sensors: list):
+    """Applies one mitigation action decided by the brain for `sensors`."""
+    logger.warning(f"AUTONOMOUS ACTION RECEIVED for {', '.join(sensors)}: {action['action']} (Intensity: {action['intensity']})")
+    logger.info(f"REASON: {action['reason']}")
+    # In a real hardware scenario, we would call a local GPIO/API here
+    # to actually increase fan speed or shed load.
+
+def handle_feedback(report: dict):
+    """Handles Autonomous Feedback (Closed-Loop Control) from a bulk ingestion report."""
+    for packet in report.get("packets", []):
+        for item in packet.get("intelligence_report", []):
+            action = item.get("action")
+            if action:
+                execute_action(action, [item["sensor_id"]])
+
+def handle_pushed_action(message: dict):
+    """Actions pushed on the control channel, already deduplicated and debounced by the brain."""
+    execute_action(message, message.get("sensors", []))
+
+def send(transmitter: TelemetryTransmitter, channel, packets: list):
+    """Ships packets over the control channel when it is up, otherwise (or behind a spooled backlog or a deferral) over HTTP."""
+    if channel and channel.connected and not transmitter.spool and not transmitter.deferred and channel.send_packets(packets):
+        report = None
+    else:
+        report = transmitter.submit_many(packets)
+    if report:
+        handle_feedback(report)
+    if channel:
+        # Unconfirmed channel telemetry, with its seq so the brain ingests it at most once
+        for resent in transmitter.resend(channel.reclaim()):
+            handle_feedback(resent)
+
 def stream_data():
     """Streams telemetry to the Brain service and handles autonomous feedback."""
-    logger.info(f"Starting telemetry stream to {BRAIN_API_URL}")
-    
-    while not shutdown_event.is_set():
-        data = generate_telemetry()
-        try:
-            # In a real scenario, we would use a message broker like Kafka.
-            # For this phase, we use direct HTTP ingestion.
-            response = requests.post(BRAIN_API_URL, json=data, timeout=5)
-            if response.status_code == 200:
-                report = response.json()
-                logger.info(f"Telemetry sent successfully: {len(data['sensors'])} sensors reported.")
-                
-                # Handle Autonomous Feedback (Closed-Loop Control)
-                for item in report.get("intelligence_report", []):
-                    action = item.get("action")
-                    if action:
-                        logger.warning(f"AUTONOMOUS ACTION RECEIVED for {item['sensor_id']}: {action['action']} (Intensity: {action['intensity']})")
-                        logger.info(f"REASON: {action['reason']}")
-                        # In a real hardware scenario, we would call a local GPIO/API here
-                        # to actually increase fan speed or shed load.
-            else:
-                logger.error(f"Failed to send telemetry. Status: {response.status_code}")
-        except Exception as e:
-            logger.error(f"Connection error: {str(e)}")
-        
-        shutdown_event.wait(5)  # Send data every 5 seconds or exit on shutdown
+    transmitter = TelemetryTransmitter.from_env(BRAIN_API_URL)
+    logger.info(f"Starting telemetry stream to {transmitter.bulk_url} (batch size {transmitter.batch_size})")
+    # Persistent channel: telemetry upstream, actions pushed the moment the brain decides them
+    channel = ControlChannel.from_env(BRAIN_API_URL, handle_pushed_action, on_defer=transmitter.defer)
+    if channel:
+        channel.start()
+
+    sampler = None
+    if HARDWARE_MODE:
+        # Collectors run on their own schedules; this loop only drains and transmits
+        sampler = Sampler(collectors_from_env(host_facts()), build_metadata(detect_device_type()))
+        sampler.start()
+
+    try:
+        while not shutdown_event.is_set():
+            # HTTP fallback: pooled keep-alive session with batching; undeliverable data is spooled to disk
+            send(transmitter, channel, sampler.drain() if sampler else [generate_telemetry()])
+
+            shutdown_event.wait(SEND_INTERVAL)  # Send data every SEND_INTERVAL seconds or exit on shutdown
+    finally:
+        if sampler:
+            sampler.stop()
+            transmitter.submit_many(sampler.drain())
+        if channel:
+            channel.stop()
+            transmitter.resend(channel.reclaim())
+        transmitter.close()
+
+def run_collector():
+    """Multi-host collector mode: one process polls every target of the inventory concurrently."""
+    import asyncio
+    from collector import FleetCollector, load_inventory
+
+    inventory = load_inventory(COLLECTOR_INVENTORY)
+    fleet = FleetCollector(
+        inventory["targets"],
+        concurrency=int(os.getenv("COLLECTOR_CONCURRENCY", 64)),
+    )
+    transmitter = TelemetryTransmitter.from_env(BRAIN_API_URL)
+    interval = float(os.getenv("COLLECTOR_INTERVAL", SEND_INTERVAL))
+    try:
+        asyncio.run(fleet.run(transmitter, interval, shutdown_event, on_report=handle_feedback))
+    finally:
+        transmitter.close()
 
 if __name__ == "__main__":
     signal.signal(signal.SIGTERM, handle_shutdown)
     signal.signal(signal.SIGINT, handle_shutdown)
 
     try:
-        stream_data()
+        if COLLECTOR_INVENTORY:
+            run_collector()
+        else:
+            stream_data()
     finally:
         logger.info("Telemetry stream halted.")
@@ -0,0 +1,230 @@
+import os
+import time
+import heapq
+import queue
+import socket
+import logging
+import threading
+import psutil
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("Helixa-Sampling")
+
+
+class HostFacts:
+    """Static host facts, probed once at startup instead of on every sample."""
+
+    def __init__(self):
+        self.hostname = socket.gethostname()
+        self.cpu_count = psutil.cpu_count(logical=True) or 1
+        try:
+            self.has_battery = psutil.sensors_battery() is not None
+        except Exception:
+            self.has_battery = False
+        self.device_type = self._classify()
+
+    def _classify(self) -> str:
+        """Detects if the current machine is a Notebook, PC, or Data Center node."""
+        if self.has_battery:
+            return "Notebook"
+        elif self.cpu_count > 16:
+            return "Data Center Node"
+        return "Professional PC"
+
+
+class Collector:
+    """
+    A metric source sampled on its own schedule. collect() must never block:
+    rate metrics are derived from counter deltas between consecutive calls.
+    """
+
+    name = "collector"
+
+    def __init__(self, interval: float):
+        self.interval = interval
+
+    def collect(self) -> List[dict]:
+        raise NotImplementedError
+
+
+class CPUCollector(Collector):
+    name = "cpu"
+
+    def __init__(self, interval: float):
+        super().__init__(interval)
+        psutil.cpu_percent(interval=None)  # Prime the delta so the first sample is meaningful
+
+    def collect(self) -> List[dict]:
+        return [{"id": "HOST-CPU-LOAD", "type": "power", "value": psutil.cpu_percent(interval=None), "unit": "%"}]
+
+
+class PerCoreCollector(Collector):
+    name = "percpu"
+
+    def __init__(self, interval: float):
+        super().__init__(interval)
+        psutil.cpu_percent(interval=None, percpu=True)
+
+    def collect(self) -> List[dict]:
+        return [
+            {"id": f"HOST-CPU{core}-LOAD", "type": "power", "value": load, "unit": "%"}
+            for core, load in enumerate(psutil.cpu_percent(interval=None, percpu=True))
+        ]
+
+
+class MemoryCollector(Collector):
+    name = "memory"
+
+    def collect(self) -> List[dict]:
+        return [{"id": "HOST-RAM-USAGE", "type": "temperature", "value": psutil.virtual_memory().percent, "unit": "%"}]
+
+
+class _RateCollector(Collector):
+    """Turns monotonically increasing counters into per-second rates."""
+
+    def __init__(self, interval: float):
+        super().__init__(interval)
+        self._last: Optional[Dict[str, float]] = None
+        self._last_at = 0.0
+
+    def counters(self) -> Dict[str, float]:
+        raise NotImplementedError
+
+    def collect(self) -> List[dict]:
+        now = time.monotonic()
+        current = self.counters()
+        previous, elapsed = self._last, now - self._last_at
+        self._last, self._last_at = current, now
+        if previous is None or elapsed <= 0:
+            return []
+        return [
+            {"id": sensor_id, "type": self.sensor_type, "value": round(max(0.0, value - previous[sensor_id]) / elapsed, 2), "unit": "B/s"}
+            for sensor_id, value in current.items()
+            if sensor_id in previous
+        ]
+
+
+class DiskIOCollector(_RateCollector):
+    name = "disk"
+    sensor_type = "io"
+
+    def counters(self) -> Dict[str, float]:
+        io = psutil.disk_io_counters()
+        if io is None:
+            return {}
+        return {"HOST-DISK-READ": io.read_bytes, "HOST-DISK-WRITE": io.write_bytes}
+
+
+class NetworkCollector(_RateCollector):
+    name = "network"
+    sensor_type = "network"
+
+    def counters(self) -> Dict[str, float]:
+        net = psutil.net_io_counters()
+        return {"HOST-NET-RX": net.bytes_recv, "HOST-NET-TX": net.bytes_sent}
+
+
+class BatteryCollector(Collector):
+    name = "battery"
+
+    def collect(self) -> List[dict]:
+        battery = psutil.sensors_battery()
+        if not battery:
+            return []
+        return [{"id": "HOST-BATTERY", "type": "power", "value": battery.percent, "unit": "%"}]
+
+
+COLLECTORS = {c.name: c for c in (CPUCollector, PerCoreCollector, MemoryCollector, DiskIOCollector, NetworkCollector, BatteryCollector)}
+
+
+def collectors_from_env(facts: HostFacts) -> List[Collector]:
+    """
+    Builds collectors from SAMPLE_INTERVAL (default seconds for every collector) and
+    SAMPLE_INTERVALS overrides such as "cpu=1,percpu=1,battery=60"; an interval of 0 disables one.
+    """
+    default = float(os.getenv("SAMPLE_INTERVAL", 5))
+    intervals = {name: default for name in COLLECTORS}
+    intervals["battery"] = max(default, 60.0)
+    for item in filter(None, os.getenv("SAMPLE_INTERVALS", "").split(",")):
+        name, _, value = item.partition("=")
+        if name.strip() not in COLLECTORS:
+            logger.warning(f"Unknown collector '{name.strip()}' in SAMPLE_INTERVALS")
+            continue
+        intervals[name.strip()] = float(value)
+    if not facts.has_battery:
+        intervals["battery"] = 0
+    return [COLLECTORS[name](interval) for name, interval in intervals.items() if interval > 0]
+
+
+class Sampler:
+    """
+    Runs collectors on their own schedules in one background thread and publishes
+    each tick as a telemetry packet onto an in-process queue, decoupling sampling
+    from transmission. When the queue is full the oldest packet is discarded.
+    """
+
+    def __init__(self, collectors: List[Collector], metadata: dict, max_packets: int = 3600):
+        self.collectors = collectors
+        self.metadata = metadata
+        self.packets: queue.Queue = queue.Queue(maxsize=max_packets)
+        self.dropped = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="helixa-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        logger.info("Sampler started: " + ", ".join(f"{c.name}@{c.interval}s" for c in self.collectors))
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=2)
+
+    def drain(self) -> List[dict]:
+        """Returns every packet sampled since the previous drain."""
+        packets = []
+        while True:
+            try:
+                packets.append(self.packets.get_nowait())
+            except queue.Empty:
+                return packets
+
+    def _run(self):
+        start = time.monotonic()
+        # Min-heap of (next due time, position); fixed-rate scheduling avoids drift
+        schedule = [(start, i) for i in range(len(self.collectors))]
+        heapq.heapify(schedule)
+
+        while schedule and not self._stop.is_set():
+            due = schedule[0][0]
+            if self._stop.wait(max(0.0, due - time.monotonic())):
+                break
+
+            now = time.monotonic()
+            sensors = []
+            while schedule and schedule[0][0] <= now:
+                due, i = heapq.heappop(schedule)
+                collector = self.collectors[i]
+                try:
+                    sensors.extend(collector.collect())
+                except Exception as e:
+                    logger.error(f"Collector {collector.name} failed: {str(e)}")
+                # Skip missed ticks rather than bursting to catch up
+                next_due = due + collector.interval
+                if next_due <= now:
+                    next_due = now + collector.interval
+                heapq.heappush(schedule, (next_due, i))
+
+            if sensors:
+                self._publish({"timestamp": time.time(), "sensors": sensors, "metadata": self.metadata})
+
+    def _publish(self, packet: dict):
+        while True:
+            try:
+                self.packets.put_nowait(packet)
+                return
+            except queue.Full:
+                try:
+                    self.packets.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
@@ -0,0 +1,310 @@
+import os
+import sys
+import json
+import time
+import queue
+import random
+import logging
+import argparse
+import threading
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Optional
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("Helixa-Simulator")
+
+
+class Fault:
+    """
+    A scheduled fault scenario. Spec format: "kind:site=0,rack=3,start=30,duration=120".
+    Kinds: cooling_failure (site CRAC loss), hotspot (rack airflow blockage),
+    pdu_overload (rack load surge), sensor_stuck and sensor_spike (faulty sensor on a rack).
+    """
+
+    KINDS = ("cooling_failure", "hotspot", "pdu_overload", "sensor_stuck", "sensor_spike")
+
+    def __init__(self, kind: str, site: int = 0, rack: int = 0, sensor: int = 0, start: float = 30.0, duration: float = 120.0):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown fault '{kind}', expected one of {', '.join(self.KINDS)}")
+        self.kind = kind
+        self.site = site
+        self.rack = rack
+        self.sensor = sensor
+        self.start = start
+        self.duration = duration
+
+    @classmethod
+    def parse(cls, spec: str) -> "Fault":
+        kind, _, params = spec.partition(":")
+        kwargs = {}
+        for item in filter(None, params.split(",")):
+            key, _, value = item.partition("=")
+            kwargs[key.strip()] = float(value) if key.strip() in ("start", "duration") else int(value)
+        return cls(kind.strip(), **kwargs)
+
+    def active(self, t: float) -> bool:
+        return self.start <= t < self.start + self.duration
+
+    def __repr__(self) -> str:
+        return f"{self.kind}(site={self.site}, rack={self.rack}, t={self.start}+{self.duration}s)"
+
+
+class FleetModel:
+    """
+    Vectorized thermal/power model of N sites x M racks x K sensors.
+    Rack IT load follows a shared diurnal curve plus AR(1) noise; each site's CRAC
+    supply temperature and airflow respond to the site load; rack inlet temperature
+    tracks supply temperature plus load-driven recirculation through a first-order lag.
+    Sensors observe their rack (inlet temperatures at different heights, A/B PDU feeds,
+    humidity), so readings within a rack and a site are physically correlated.
+    """
+
+    SENSOR_PATTERN = ("temperature", "power", "temperature", "power", "humidity", "temperature")
+
+    def __init__(self, sites: int, racks: int, sensors: int, faults: Optional[List[Fault]] = None, seed: int = 7):
+        self.sites, self.racks, self.sensors = sites, racks, sensors
+        self.faults = faults or []
+        self.rng = np.random.default_rng(seed)
+        self.t = 0.0
+
+        self.base_load = self.rng.uniform(4.0, 12.0, (sites, racks))  # kW per rack
+        self.load = self.base_load.copy()
+        self.noise = np.zeros((sites, racks))
+        self.supply_temp = np.full(sites, 18.0)
+        self.inlet = np.full((sites, racks), 22.0) + self.rng.normal(0, 0.5, (sites, racks))
+        self.nominal_flow = self.base_load.sum(axis=1) * 2.5  # L/m per site at nominal load
+
+        kinds = [self.SENSOR_PATTERN[k % len(self.SENSOR_PATTERN)] for k in range(sensors)]
+        self.kinds = np.array(kinds)
+        self.height = np.cumsum(self.kinds == "temperature") - 1  # nth temperature probe = rack height
+        self.stuck_values: Dict[tuple, float] = {}
+
+        tags = {"temperature": "TEMP", "power": "PDU", "humidity": "HUM"}
+        self.ids = [
+            [[f"S{s:02d}-RACK-{r:03d}-{tags[kinds[k]]}-{k:02d}" for k in range(sensors)] for r in range(racks)]
+            for s in range(sites)
+        ]
+        self.units = {"temperature": "C", "power": "kW", "humidity": "%"}
+
+    def step(self, dt: float) -> np.ndarray:
+        """Advances the model by dt seconds and returns readings shaped (sites, racks, sensors)."""
+        self.t += dt
+        diurnal = 0.75 + 0.25 * np.sin(2 * np.pi * self.t / 86400.0)
+        phi = np.exp(-dt / 300.0)
+        self.noise = phi * self.noise + np.sqrt(1 - phi ** 2) * self.rng.normal(0, 0.08, self.noise.shape)
+
+        surge = np.ones((self.sites, self.racks))
+        blockage = np.ones((self.sites, self.racks))
+        cooling_loss = np.zeros(self.sites)
+        for fault in self.faults:
+            if not fault.active(self.t):
+                continue
+            if fault.kind == "pdu_overload":
+                surge[fault.site, fault.rack] = 1.8
+            elif fault.kind == "hotspot":
+                blockage[fault.site, fault.rack] = 3.0
+            elif fault.kind == "cooling_failure":
+                cooling_loss[fault.site] = min(1.0, (self.t - fault.start) / 120.0)
+
+        self.load = np.clip(self.base_load * diurnal * (1 + self.noise) * surge, 0.0, None)
+        site_load = self.load.sum(axis=1)
+        flow = self.nominal_flow * (site_load / self.base_load.sum(axis=1)) * (1 - 0.7 * cooling_loss)
+
+        # CRAC supply drifts up as cooling capacity is lost, and recovers afterwards
+        supply_target = 18.0 + 12.0 * cooling_loss
+        self.supply_temp += (supply_target - self.supply_temp) * min(1.0, dt / 90.0)
+
+        recirculation = 0.45 * self.load * blockage * (self.nominal_flow / np.maximum(flow, 1e-3))[:, None] / self.racks ** 0.5
+        inlet_target = self.supply_temp[:, None] + 2.0 + recirculation
+        self.inlet += (inlet_target - self.inlet) * min(1.0, dt / 60.0)
+
+        readings = np.empty((self.sites, self.racks, self.sensors))
+        temp = self.kinds == "temperature"
+        power = self.kinds == "power"
+        humidity = self.kinds == "humidity"
+        feeds = max(1, int(power.sum()))
+        readings[:, :, temp] = self.inlet[:, :, None] + 0.6 * self.height[temp]
+        readings[:, :, power] = (self.load / feeds)[:, :, None]
+        readings[:, :, humidity] = 45.0 - 0.4 * (self.inlet[:, :, None] - 22.0)
+        readings += self.rng.normal(0, 0.15, readings.shape)
+
+        for fault in self.faults:
+            key = (fault.site, fault.rack, fault.sensor)
+            if fault.kind == "sensor_stuck":
+                if fault.active(self.t):
+                    readings[key] = self.stuck_values.setdefault(key, float(readings[key]))
+                else:
+                    self.stuck_values.pop(key, None)
+            elif fault.kind == "sensor_spike" and fault.active(self.t) and self.rng.random() < 0.2:
+                readings[key] *= self.rng.choice([0.2, 3.0])
+        return np.round(readings, 2)
+
+    def packets(self, readings: np.ndarray, timestamp: float) -> List[dict]:
+        """One packet per rack (the rack's virtual agent)."""
+        values = readings.tolist()
+        kinds = self.kinds.tolist()
+        units = [self.units[k] for k in kinds]
+        out = []
+        for s in range(self.sites):
+            for r in range(self.racks):
+                ids = self.ids[s][r]
+                out.append({
+                    "timestamp": timestamp,
+                    "sensors": [
+                        {"id": ids[k], "type": kinds[k], "value": values[s][r][k], "unit": units[k]}
+                        for k in range(self.sensors)
+                    ],
+                    "metadata": {
+                        "site": f"SIM-SITE-{s:02d}",
+                        "rack": f"RACK-{r:03d}",
+                        "agent_id": f"sim-agent-{s:02d}-{r:03d}",
+                        "version": "0.3.0",
+                        "mode": "simulated",
+                        "device_type": "datacenter",
+                    },
+                })
+        return out
+
+
+class LoadGenerator:
+    """
+    Drives the brain with the fleet model at a fixed packet rate from concurrent
+    virtual agents. Latency is measured from each packet's scheduled send time, so
+    client-side queueing under overload is included (no coordinated omission).
+    """
+
+    def __init__(self, model: FleetModel, url: str, rate: float, duration: float, workers: int, bulk: int = 1):
+        self.model = model
+        self.url = url
+        self.rate = rate
+        self.duration = duration
+        self.workers = workers
+        self.bulk = max(1, bulk)
+        self.queue: queue.Queue = queue.Queue(maxsize=workers * 64)
+        self.latencies: List[float] = []
+        self.errors: Dict[str, int] = {}
+        self.sent_packets = 0
+        self.skipped_packets = 0
+        self._lock = threading.Lock()
+
+    def _worker(self):
+        session = requests.Session()
+        session.mount("http://", HTTPAdapter(pool_maxsize=1, max_retries=0))
+        session.mount("https://", HTTPAdapter(pool_maxsize=1, max_retries=0))
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            scheduled, packets = item
+            try:
+                if self.bulk > 1:
+                    body = "".join(json.dumps(p, separators=(",", ":")) + "\n" for p in packets)
+                    response = session.post(self.url, data=body, params={"report": "none"},
+                                            headers={"Content-Type": "application/x-ndjson"}, timeout=30)
+                else:
+                    response = session.post(self.url, json=packets[0], timeout=30)
+                error = None if response.status_code == 200 else f"HTTP {response.status_code}"
+            except requests.RequestException as e:
+                error = type(e).__name__
+            latency = time.perf_counter() - scheduled
+            with self._lock:
+                if error:
+                    self.errors[error] = self.errors.get(error, 0) + 1
+                else:
+                    self.latencies.append(latency)
+                    self.sent_packets += len(packets)
+
+    def run(self) -> dict:
+        agents = self.model.sites * self.model.racks
+        tick = agents / self.rate  # every agent sends one packet per model tick
+        threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+
+        logger.info(f"Driving {self.url}: {agents} agents, {self.model.sensors} sensors each, "
+                    f"{self.rate:.0f} packets/s for {self.duration:.0f}s with {self.workers} workers")
+        start = time.perf_counter()
+        ticks = 0
+        while True:
+            tick_start = start + ticks * tick
+            if tick_start - start >= self.duration:
+                break
+            delay = tick_start - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            packets = self.model.packets(self.model.step(tick), time.time())
+            # Spread the tick's packets evenly across the tick interval
+            for i in range(0, len(packets), self.bulk):
+                scheduled = tick_start + tick * i / len(packets)
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                try:
+                    self.queue.put_nowait((scheduled, packets[i:i + self.bulk]))
+                except queue.Full:
+                    self.skipped_packets += len(packets[i:i + self.bulk])
+            ticks += 1
+
+        for _ in threads:
+            self.queue.put(None)
+        for thread in threads:
+            thread.join()
+        return self.report(time.perf_counter() - start)
+
+    def report(self, elapsed: float) -> dict:
+        latencies = np.array(self.latencies) * 1000
+        percentiles = np.percentile(latencies, [50, 90, 99, 99.9]) if len(latencies) else [float("nan")] * 4
+        return {
+            "target_packets_per_s": self.rate,
+            "achieved_packets_per_s": round(self.sent_packets / elapsed, 1),
+            "achieved_readings_per_s": round(self.sent_packets * self.model.sensors / elapsed, 1),
+            "requests_ok": len(self.latencies),
+            "errors": self.errors,
+            "client_saturated_packets": self.skipped_packets,
+            "latency_ms": {
+                "p50": round(float(percentiles[0]), 2),
+                "p90": round(float(percentiles[1]), 2),
+                "p99": round(float(percentiles[2]), 2),
+                "p999": round(float(percentiles[3]), 2),
+                "max": round(float(latencies.max()), 2) if len(latencies) else None,
+            },
+            "elapsed_s": round(elapsed, 2),
+        }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Helixa-One fleet simulator and brain load generator")
+    parser.add_argument("--sites", type=int, default=2)
+    parser.add_argument("--racks", type=int, default=20, help="racks per site (one virtual agent per rack)")
+    parser.add_argument("--sensors", type=int, default=6, help="sensors per rack")
+    parser.add_argument("--rate", type=float, default=100.0, help="total packets per second")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds")
+    parser.add_argument("--workers", type=int, default=16, help="concurrent HTTP connections")
+    parser.add_argument("--bulk", type=int, default=1, help="packets per request (>1 uses /telemetry/bulk)")
+    parser.add_argument("--fault", action="append", default=[], help='e.g. "hotspot:site=0,rack=3,start=30,duration=120"')
+    parser.add_argument("--url", default=os.getenv("BRAIN_API_URL", "http://localhost:8000/telemetry"))
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    faults = [Fault.parse(spec) for spec in args.fault]
+    if faults:
+        logger.info(f"Injected faults: {faults}")
+    random.seed(args.seed)
+    model = FleetModel(args.sites, args.racks, args.sensors, faults=faults, seed=args.seed)
+    url = args.url.rstrip("/") + "/bulk" if args.bulk > 1 and not args.url.rstrip("/").endswith("/bulk") else args.url
+    report = LoadGenerator(model, url, args.rate, args.duration, args.workers, bulk=args.bulk).run()
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+import os
+import json
+import logging
+import threading
+from typing import List, Optional
+
+logger = logging.getLogger("Helixa-Spool")
+
+
+class DiskSpool:
+    """
+    Append-only on-disk buffer for telemetry the brain could not receive.
+    Packets are written as NDJSON lines into numbered segment files; segments are
+    replayed oldest-first and deleted once the brain acknowledges them. When the
+    spool exceeds its size cap, the oldest segments are discarded first.
+    """
+
+    SUFFIX = ".ndjson"
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024, segment_bytes: int = 4 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        existing = self.segments()
+        self._next_seq = self._seq(existing[-1]) + 1 if existing else 1
+        self._current: Optional[str] = None
+        if existing:
+            logger.warning(f"Found {len(existing)} spooled segment(s) from a previous run; they will be replayed")
+
+    def _seq(self, path: str) -> int:
+        return int(os.path.basename(path)[len("segment-"):-len(self.SUFFIX)])
+
+    def segments(self) -> List[str]:
+        names = [n for n in os.listdir(self.directory) if n.startswith("segment-") and n.endswith(self.SUFFIX)]
+        return [os.path.join(self.directory, n) for n in sorted(names)]
+
+    def size_bytes(self) -> int:
+        return sum(os.path.getsize(p) for p in self.segments())
+
+    def __bool__(self) -> bool:
+        return bool(self.segments())
+
+    def append(self, packets: List[dict]):
+        """Appends packets to the open segment, rotating and enforcing the size cap."""
+        if not packets:
+            return
+        payload = "".join(json.dumps(p, separators=(",", ":")) + "\n" for p in packets).encode()
+        with self._lock:
+            if self._current is None or os.path.getsize(self._current) >= self.segment_bytes:
+                self._current = os.path.join(self.directory, f"segment-{self._next_seq:010d}{self.SUFFIX}")
+                self._next_seq += 1
+            with open(self._current, "ab") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            self._enforce_cap()
+
+    def _enforce_cap(self):
+        segments = self.segments()
+        total = sum(os.path.getsize(p) for p in segments)
+        while total > self.max_bytes and len(segments) > 1:
+            oldest = segments.pop(0)
+            total -= os.path.getsize(oldest)
+            os.remove(oldest)
+            logger.error(f"Spool over {self.max_bytes} bytes, discarded oldest segment {os.path.basename(oldest)}")
+
+    def oldest(self) -> Optional[str]:
+        """Returns the oldest segment, sealing it first if it is the one being written."""
+        with self._lock:
+            segments = self.segments()
+            if not segments:
+                return None
+            if segments[0] == self._current:
+                self._current = None
+            return segments[0]
+
+    def read(self, path: str) -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+
+    def ack(self, path: str):
+        """Deletes a segment the brain has accepted."""
+        with self._lock:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def quarantine(self, path: str):
+        """Moves aside a segment the brain rejects as malformed so replay can make progress."""
+        with self._lock:
+            os.replace(path, path + ".rejected")
+        logger.error(f"Spool segment {os.path.basename(path)} was rejected by the brain and quarantined")
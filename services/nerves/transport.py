@@ -0,0 +1,220 @@
+import os
+import gzip
+import json
+import time
+import socket
+import logging
+import requests
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+from typing import List, Optional, Tuple
+
+from spool import DiskSpool
+
+logger = logging.getLogger("Helixa-Transport")
+
+# Admission control (429) and start-up warm-up (503) on the brain: resend after Retry-After
+DEFERRED = (429, 503)
+
+
+class TelemetryTransmitter:
+    """
+    Ships telemetry to the Brain over a pooled keep-alive HTTP session.
+    Packets are accumulated into batches and posted as gzip-compressed NDJSON to the
+    bulk ingestion endpoint. Batches that cannot be delivered are spilled to a DiskSpool
+    and replayed in order, ahead of any new data, once the brain is reachable again.
+    A 429 (admission control) or 503 (warming up) from the brain defers all sends until its
+    Retry-After has passed; batches produced meanwhile wait in the spool.
+    Telemetry the control channel could not confirm goes through resend(), tagged with its seq.
+    """
+
+    # Unconfirmed control channel messages kept in memory, with their seq, until the brain takes them
+    MAX_RESENDS = 64
+
+    def __init__(self, bulk_url: str, spool: DiskSpool, batch_size: int = 1, timeout: float = 5.0, pool_size: int = 4,
+                 agent_id: Optional[str] = None):
+        self.bulk_url = bulk_url
+        self.spool = spool
+        self.batch_size = max(1, batch_size)
+        self.timeout = timeout
+        self._pending: List[dict] = []
+        # monotonic time before which the brain asked not to be sent anything
+        self._retry_at = 0.0
+        self._resends: "OrderedDict[str, List[dict]]" = OrderedDict()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Content-Type": "application/x-ndjson",
+            "Content-Encoding": "gzip",
+        })
+        if agent_id:
+            # Key of the brain's per-agent rate limit
+            self.session.headers["X-Agent-Id"] = agent_id
+
+    @classmethod
+    def from_env(cls, brain_api_url: str) -> "TelemetryTransmitter":
+        bulk_url = os.getenv("BRAIN_BULK_URL") or brain_api_url.rstrip("/") + "/bulk"
+        spool = DiskSpool(
+            directory=os.getenv("SPOOL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "spool")),
+            max_bytes=int(float(os.getenv("SPOOL_MAX_MB", 256)) * 1024 * 1024),
+            segment_bytes=int(float(os.getenv("SPOOL_SEGMENT_MB", 4)) * 1024 * 1024),
+        )
+        return cls(bulk_url, spool, batch_size=int(os.getenv("TELEMETRY_BATCH_SIZE", 1)),
+                   agent_id=os.getenv("AGENT_ID") or socket.gethostname())
+
+    @property
+    def deferred(self) -> bool:
+        return time.monotonic() < self._retry_at
+
+    def defer(self, seconds: float):
+        """Holds every send for `seconds` (the brain's Retry-After)."""
+        self._retry_at = max(self._retry_at, time.monotonic() + seconds)
+
+    @staticmethod
+    def retry_after(response: requests.Response, default: float = 1.0) -> float:
+        """Seconds from a Retry-After header, given as a delay or as an HTTP date."""
+        value = response.headers.get("Retry-After", "")
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return default
+
+    def _throttled(self, response: requests.Response):
+        seconds = self.retry_after(response)
+        self.defer(seconds)
+        logger.warning(f"Brain deferred telemetry ({response.status_code}); holding it for {seconds:.0f}s")
+
+    def submit(self, packet: dict) -> Optional[dict]:
+        """Queues a packet; once a batch is full it is sent and the brain's report returned."""
+        self._pending.append(packet)
+        if len(self._pending) < self.batch_size:
+            return None
+        return self.flush()
+
+    def submit_many(self, packets: List[dict]) -> Optional[dict]:
+        """Queues several packets at once (e.g. one send interval of samples) and sends full batches."""
+        self._pending.extend(packets)
+        if not self._pending or len(self._pending) < self.batch_size:
+            return None
+        return self.flush()
+
+    def flush(self) -> Optional[dict]:
+        """Sends pending packets, replaying any spooled backlog first to preserve order."""
+        batch, self._pending = self._pending, []
+        if not batch:
+            return None
+        if self.deferred or (self.spool and not self.replay()):
+            # Older data is still waiting on disk, or the brain asked us to back off: queue behind it
+            self.spool.append(batch)
+            return None
+
+        body = "".join(json.dumps(p, separators=(",", ":")) + "\n" for p in batch).encode()
+        try:
+            response = self._post(body)
+        except requests.RequestException as e:
+            logger.error(f"Brain unreachable ({str(e)}); spooling {len(batch)} packet(s) to disk")
+            self.spool.append(batch)
+            return None
+
+        if response.status_code == 200:
+            logger.info(f"Telemetry sent successfully: {len(batch)} packet(s), {sum(len(p['sensors']) for p in batch)} sensors reported.")
+            report = response.json()
+            if report.get("shed_readings"):
+                logger.warning(f"Brain shed {report['shed_readings']} low-priority reading(s) under load")
+            return report
+        if response.status_code in DEFERRED:
+            self._throttled(response)
+            self.spool.append(batch)
+        elif 400 <= response.status_code < 500:
+            logger.error(f"Brain rejected telemetry batch. Status: {response.status_code} {response.text[:200]}")
+        else:
+            logger.error(f"Failed to send telemetry. Status: {response.status_code}; spooling batch")
+            self.spool.append(batch)
+        return None
+
+    def resend(self, groups: List[Tuple[str, List[dict]]]) -> List[dict]:
+        """
+        Posts (seq, packets) the control channel could not confirm, one request per message with
+        its seq in X-Control-Seq, so the brain answers "duplicate" for what it did ingest before the
+        receipt was lost. Messages the brain cannot take yet stay queued for the next call; past
+        MAX_RESENDS the oldest are spooled, without their seq. Returns the brain's reports.
+        """
+        self._resends.update(groups)
+        while len(self._resends) > self.MAX_RESENDS:
+            self.spool.append(self._resends.popitem(last=False)[1])
+        reports = []
+        for seq, packets in list(self._resends.items()):
+            if self.deferred:
+                break
+            body = "".join(json.dumps(p, separators=(",", ":")) + "\n" for p in packets).encode()
+            try:
+                response = self._post(body, headers={"X-Control-Seq": seq})
+            except requests.RequestException as e:
+                logger.warning(f"Resend of unconfirmed telemetry deferred, brain still unreachable: {str(e)}")
+                break
+            if response.status_code in DEFERRED:
+                self._throttled(response)
+                break
+            if response.status_code >= 500:
+                logger.warning(f"Resend of unconfirmed telemetry deferred. Status: {response.status_code}")
+                break
+            del self._resends[seq]
+            if response.status_code == 200:
+                reports.append(response.json())
+            else:
+                logger.error(f"Brain rejected resent telemetry. Status: {response.status_code} {response.text[:200]}")
+        return reports
+
+    def replay(self) -> bool:
+        """Replays spooled segments oldest-first; returns True once the spool is empty."""
+        while True:
+            segment = self.spool.oldest()
+            if segment is None:
+                return True
+            if self.deferred:
+                return False
+            try:
+                response = self._post(self.spool.read(segment), report="none")
+            except requests.RequestException as e:
+                logger.warning(f"Spool replay deferred, brain still unreachable: {str(e)}")
+                return False
+            if response.status_code == 200:
+                self.spool.ack(segment)
+                logger.info(f"Replayed spooled segment {os.path.basename(segment)}")
+            elif response.status_code in DEFERRED:
+                self._throttled(response)
+                return False
+            elif 400 <= response.status_code < 500:
+                self.spool.quarantine(segment)
+            else:
+                logger.warning(f"Spool replay deferred. Status: {response.status_code}")
+                return False
+
+    def _post(self, ndjson: bytes, report: str = "actions", headers: Optional[dict] = None) -> requests.Response:
+        start = time.perf_counter()
+        response = self.session.post(
+            self.bulk_url,
+            params={"report": report},
+            data=gzip.compress(ndjson, compresslevel=5),
+            headers=headers,
+            timeout=self.timeout,
+        )
+        logger.debug(f"POST {self.bulk_url} -> {response.status_code} in {(time.perf_counter() - start) * 1000:.1f}ms")
+        return response
+
+    def close(self):
+        """Flushes what is still pending (spooling it if needed) and releases pooled connections."""
+        if self._pending:
+            self.flush()
+        for packets in self._resends.values():
+            self.spool.append(packets)
+        self._resends.clear()
+        self.session.close()